@@ -1,486 +1,129 @@
-import sqlite3
+import argparse
+import csv
+import functools
 import os
+import shutil
 import sys
-from datetime import datetime, date  # Importando date também
+from datetime import date
 import platform  # Já estava sendo importado, mas movido para os imports gerais
 
-# === ReportLab Imports (Sem alterações na versão, pois é a padrão e consolidada) ===
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import cm
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-except ImportError:
-    print("⚠️ ReportLab não está instalado. Execute: pip install reportlab")
-    sys.exit(1)
+# Dados, validação e relatórios vêm do núcleo compartilhado com a aplicação web;
+# este arquivo cuida apenas da interação pelo terminal
+from rodamotriz import analise, faturamento, pregeracao, processos_pdf, validacao
+from rodamotriz.caminhos import CAMINHO_ANALISE
+from rodamotriz.sistema import COLUNAS_EXPORTACAO, RENDERIZADOR_PADRAO, RENDERIZADORES, SistemaRodamotriz
 
 # Para o atalho no Windows, se você não tem certeza que a biblioteca win32com.client está instalada,
 # é melhor mantê-la como um import local dentro de 'criar_atalho_desktop'
 
 
-class SistemaRodamotriz:
-    def __init__(self):
-        # Usando 'rodamotriz.db' no diretório do script
-        self.conn = sqlite3.connect(os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), 'rodamotriz.db'))
-        self.cursor = self.conn.cursor()
-        self.criar_tabelas()
-
-    def criar_tabelas(self):
-        """Cria as tabelas necessárias no banco de dados"""
-        # Tabela de clientes
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clientes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                cnpj_cpf TEXT NOT NULL,
-                endereco TEXT NOT NULL,
-                data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Tabela de máquinas
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS maquinas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                marca TEXT NOT NULL,
-                modelo TEXT NOT NULL,
-                ano INTEGER NOT NULL,
-                data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Tabela de registros de trabalho
-        # data_inicio e data_final são TEXT no formato 'dd/mm/yyyy'
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS registros_trabalho (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                cliente_id INTEGER NOT NULL,
-                maquina_id INTEGER NOT NULL,
-                local_trabalho TEXT NOT NULL,
-                data_inicio TEXT NOT NULL, 
-                data_final TEXT NOT NULL,
-                horimetro_inicial REAL NOT NULL,
-                horimetro_final REAL NOT NULL,
-                horas_trabalhadas REAL NOT NULL,
-                data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (cliente_id) REFERENCES clientes(id),
-                FOREIGN KEY (maquina_id) REFERENCES maquinas(id)
-            )
-        ''')
-
-        self.conn.commit()
-
-    def cadastrar_cliente(self, nome, cnpj_cpf, endereco):
-        """Cadastra um novo cliente no banco de dados"""
-        try:
-            self.cursor.execute('''
-                INSERT INTO clientes (nome, cnpj_cpf, endereco)
-                VALUES (?, ?, ?)
-            ''', (nome, cnpj_cpf, endereco))
-            self.conn.commit()
-            print(
-                f"\n✅ Cliente cadastrado com sucesso! ID: {self.cursor.lastrowid}")
-            return self.cursor.lastrowid
-        except sqlite3.IntegrityError as e:
-            print(
-                f"\n❌ Erro de integridade ao cadastrar cliente (dados duplicados ou faltantes): {e}")
-            return None
-        except Exception as e:
-            print(f"\n❌ Erro inesperado ao cadastrar cliente: {e}")
-            return None
-
-    def listar_clientes(self):
-        """Lista todos os clientes cadastrados"""
-        self.cursor.execute(
-            'SELECT id, nome, cnpj_cpf, endereco FROM clientes ORDER BY id')
-        clientes = self.cursor.fetchall()
-
-        if not clientes:
-            print("\n⚠️ Nenhum cliente cadastrado.")
-            return []
-
-        # Debug: mostrar dados brutos
-        print(f"\n🔍 DEBUG - Dados brutos do banco:")
-        for i, cliente in enumerate(clientes):
-            print(f"Cliente {i+1}: {cliente}")
-
-        print("\n" + "="*120)
-        print("CLIENTES CADASTRADOS".center(120))
-        print("="*120)
-        print(f"{'ID':<5} {'NOME':<35} {'CNPJ/CPF':<25} {'ENDEREÇO':<50}")
-        print("-"*120)
-
-        for cliente in clientes:
-            # Garantir que os dados não sejam None
-            id_cliente = cliente[0] if cliente[0] is not None else "N/A"
-            nome = cliente[1] if cliente[1] is not None else "N/A"
-            cnpj_cpf = cliente[2] if cliente[2] is not None else "N/A"
-            endereco = cliente[3] if cliente[3] is not None else "N/A"
-
-            # Truncar strings muito longas para exibição
-            nome_display = nome[:32] + "..." if len(nome) > 35 else nome
-            cnpj_cpf_display = cnpj_cpf[:22] + \
-                "..." if len(cnpj_cpf) > 25 else cnpj_cpf
-            endereco_display = endereco[:47] + \
-                "..." if len(endereco) > 50 else endereco
-
-            print(
-                f"{id_cliente:<5} {nome_display:<35} {cnpj_cpf_display:<25} {endereco_display:<50}")
-
-        print("="*120)
-        return clientes
-
-    def cadastrar_maquina(self, marca, modelo, ano):
-        """Cadastra uma nova máquina no banco de dados"""
-        try:
-            self.cursor.execute('''
-                INSERT INTO maquinas (marca, modelo, ano)
-                VALUES (?, ?, ?)
-            ''', (marca, modelo, ano))
-            self.conn.commit()
-            print(
-                f"\n✅ Máquina cadastrada com sucesso! ID: {self.cursor.lastrowid}")
-            return self.cursor.lastrowid
-        except sqlite3.IntegrityError as e:
-            print(
-                f"\n❌ Erro de integridade ao cadastrar máquina (dados duplicados ou faltantes): {e}")
-            return None
-        except Exception as e:
-            print(f"\n❌ Erro inesperado ao cadastrar máquina: {e}")
-            return None
-
-    def listar_maquinas(self):
-        """Lista todas as máquinas cadastradas"""
-        self.cursor.execute(
-            'SELECT id, marca, modelo, ano FROM maquinas ORDER BY id')
-        maquinas = self.cursor.fetchall()
-
-        if not maquinas:
-            print("\n⚠️ Nenhuma máquina cadastrada.")
-            return []
-
-        print("\n" + "="*100)
-        print("MÁQUINAS CADASTRADAS".center(100))
-        print("="*100)
-        print(f"{'ID':<5} {'MARCA':<30} {'MODELO':<40} {'ANO':<10}")
-        print("-"*100)
-
-        for maquina in maquinas:
-            # Garantir que os dados não sejam None
-            id_maquina = maquina[0] if maquina[0] is not None else "N/A"
-            marca = maquina[1] if maquina[1] is not None else "N/A"
-            modelo = maquina[2] if maquina[2] is not None else "N/A"
-            ano = maquina[3] if maquina[3] is not None else "N/A"
-
-            # Truncar strings muito longas para exibição
-            marca_display = marca[:27] + "..." if len(marca) > 30 else marca
-            modelo_display = modelo[:37] + \
-                "..." if len(modelo) > 40 else modelo
-
-            print(
-                f"{id_maquina:<5} {marca_display:<30} {modelo_display:<40} {ano:<10}")
-
-        print("="*100)
-        return maquinas
-
-    def validar_data(self, data_str):
-        """Valida e converte data no formato dd/mm/yyyy"""
-        # CORREÇÃO: Usando %Y (ano com 4 dígitos) para robustez
-        try:
-            datetime.strptime(data_str, '%d/%m/%Y')
-            return True
-        except ValueError:
-            return False
-
-    def registrar_trabalho(self, cliente_id, maquina_id, local_trabalho,
-                           data_inicio, data_final, horimetro_inicial, horimetro_final):
-        """Registra um trabalho realizado"""
-
-        # 1. Validação de Horímetro
-        if horimetro_final <= horimetro_inicial:
-            print("\n❌ Erro: O horímetro final deve ser **maior** que o inicial!")
-            return None
-
-        # 2. Validação de Data (formato dd/mm/yyyy)
-        if not self.validar_data(data_inicio) or not self.validar_data(data_final):
-            print("\n❌ Erro: Data inválida! Use o formato **dd/mm/yyyy**")
-            return None
-
-        # 3. Validação de Cliente e Máquina (melhoria)
-        self.cursor.execute(
-            'SELECT 1 FROM clientes WHERE id = ?', (cliente_id,))
-        if self.cursor.fetchone() is None:
-            print(f"\n❌ Erro: Cliente com ID **{cliente_id}** não encontrado.")
-            return None
-
-        self.cursor.execute(
-            'SELECT 1 FROM maquinas WHERE id = ?', (maquina_id,))
-        if self.cursor.fetchone() is None:
-            print(f"\n❌ Erro: Máquina com ID **{maquina_id}** não encontrada.")
-            return None
-
-        # Cálculo
-        horas_trabalhadas = horimetro_final - horimetro_inicial
+# (título, largura) das colunas de cada listagem; textos maiores são truncados
+COLUNAS_CLIENTES = (('ID', 5), ('NOME', 35), ('CNPJ/CPF', 25), ('ENDEREÇO', 50))
+COLUNAS_MAQUINAS = (('ID', 5), ('MARCA', 30), ('MODELO', 40), ('ANO', 10))
+COLUNAS_LOCAIS = (('ID', 5), ('LOCAL', 50), ('REGISTROS', 10), ('HORAS', 12))
 
-        try:
-            self.cursor.execute('''
-                INSERT INTO registros_trabalho 
-                (cliente_id, maquina_id, local_trabalho, data_inicio, data_final,
-                 horimetro_inicial, horimetro_final, horas_trabalhadas)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (cliente_id, maquina_id, local_trabalho, data_inicio, data_final,
-                  horimetro_inicial, horimetro_final, horas_trabalhadas))
-
-            self.conn.commit()
-
-            print("\n" + "="*80)
-            print("REGISTRO DE TRABALHO CONCLUÍDO".center(80))
-            print("="*80)
-            print(f"Local de Trabalho:      {local_trabalho}")
-            print(f"Período:                {data_inicio} a {data_final}")
-            print(f"Horímetro Inicial:      {horimetro_inicial:.2f} horas")
-            print(f"Horímetro Final:        {horimetro_final:.2f} horas")
-            print(f"**Horas Trabalhadas:** **{horas_trabalhadas:.2f} horas**")
-            print("="*80)
-
-            return self.cursor.lastrowid
-        except sqlite3.IntegrityError as e:
-            print(
-                f"\n❌ Erro de integridade (Verifique se cliente/máquina existem): {e}")
-            return None
-        except Exception as e:
-            print(f"\n❌ Erro ao registrar trabalho: {e}")
-            return None
-
-    def gerar_relatorio_pdf(self, registro_id):
-        """Gera relatório em PDF do registro de trabalho"""
-        try:
-            # Buscar dados do registro
-            self.cursor.execute('''
-                SELECT r.id, c.nome, c.cnpj_cpf, c.endereco,
-                       m.marca, m.modelo, m.ano,
-                       r.local_trabalho, r.data_inicio, r.data_final,
-                       r.horimetro_inicial, r.horimetro_final, r.horas_trabalhadas,
-                       r.data_registro
-                FROM registros_trabalho r
-                JOIN clientes c ON r.cliente_id = c.id
-                JOIN maquinas m ON r.maquina_id = m.id
-                WHERE r.id = ?
-            ''', (registro_id,))
-
-            dados = self.cursor.fetchone()
-
-            if not dados:
-                print("\n❌ Registro não encontrado!")
-                return None
-
-            # Criar diretório para relatórios se não existir
-            caminho_relatorios = os.path.join(os.path.dirname(
-                os.path.abspath(__file__)), 'relatorios')
-            if not os.path.exists(caminho_relatorios):
-                os.makedirs(caminho_relatorios)
-
-            # Nome do arquivo PDF
-            nome_arquivo = f"{caminho_relatorios}/relatorio_{registro_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-
-            # Criar documento PDF
-            doc = SimpleDocTemplate(nome_arquivo, pagesize=A4,
-                                    rightMargin=cm, leftMargin=cm,
-                                    topMargin=cm, bottomMargin=cm)
-            elementos = []
-
-            # Estilos
-            styles = getSampleStyleSheet()
-
-            # Estilo Título (melhoria na cor)
-            estilo_titulo = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=18,
-                textColor=colors.HexColor('#0d47a1'),  # Azul mais escuro
-                spaceAfter=12,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold'
-            )
-
-            # Estilo Subtítulo
-            estilo_subtitulo = ParagraphStyle(
-                'CustomSubtitle',
-                parent=styles['Heading2'],
-                fontSize=12,
-                textColor=colors.HexColor('#1976d2'),
-                spaceAfter=16,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold'
-            )
-
-            estilo_cabecalho_tabela = ParagraphStyle(
-                'CabecalhoTabela',
-                parent=styles['Heading3'],
-                fontSize=11,
-                textColor=colors.HexColor('#1a237e'),
-                spaceAfter=6,
-                fontName='Helvetica-Bold'
-            )
-
-            # Cabeçalho
-            elementos.append(
-                Paragraph("RODAMOTRIZ COM. DE MÁQUINAS E PEÇAS LTDA", estilo_titulo))
-            elementos.append(
-                Paragraph("RELATÓRIO DE HORA MÁQUINA TRABALHADA", estilo_subtitulo))
-            elementos.append(Spacer(1, 0.5*cm))
-
-            # Informações do relatório
-            elementos.append(Paragraph(
-                f"<b>Relatório Nº:</b> <font color='#c62828'>{dados[0]:05d}</font>", styles['Normal']))
-            elementos.append(Paragraph(
-                f"<b>Data de Emissão:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-            elementos.append(Spacer(1, 0.5*cm))
-
-            # Dados do Cliente
-            elementos.append(
-                Paragraph("DADOS DO CLIENTE", estilo_cabecalho_tabela))
-            dados_cliente = [
-                ['Nome:', dados[1]],
-                ['CNPJ/CPF:', dados[2]],
-                ['Endereço:', dados[3]]
-            ]
-
-            tabela_cliente = Table(dados_cliente, colWidths=[
-                                   4*cm, 13*cm])  # Ajuste na largura
-            tabela_cliente.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),  # Reduzido padding
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-            ]))
-            elementos.append(tabela_cliente)
-            elementos.append(Spacer(1, 0.5*cm))
-
-            # Dados da Máquina
-            elementos.append(
-                Paragraph("DADOS DA MÁQUINA", estilo_cabecalho_tabela))
-            dados_maquina = [
-                ['Marca:', dados[4]],
-                ['Modelo:', dados[5]],
-                ['Ano:', str(dados[6])]
-            ]
-
-            tabela_maquina = Table(dados_maquina, colWidths=[
-                                   4*cm, 13*cm])  # Ajuste na largura
-            tabela_maquina.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),  # Reduzido padding
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-            ]))
-            elementos.append(tabela_maquina)
-            elementos.append(Spacer(1, 0.5*cm))
-
-            # Dados do Trabalho
-            elementos.append(
-                Paragraph("DADOS DO TRABALHO", estilo_cabecalho_tabela))
-            dados_trabalho = [
-                ['Local de Trabalho:', dados[7]],
-                ['Data Início:', dados[8]],
-                ['Data Final:', dados[9]],
-                ['Horímetro Inicial:', f"{dados[10]:.2f} horas"],
-                ['Horímetro Final:', f"{dados[11]:.2f} horas"]
-                # A última linha vazia foi removida, pois não é necessária
-            ]
-
-            tabela_trabalho = Table(dados_trabalho, colWidths=[
-                                    4*cm, 13*cm])  # Ajuste na largura
-            tabela_trabalho.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),  # Reduzido padding
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-            ]))
-            elementos.append(tabela_trabalho)
-            elementos.append(Spacer(1, 0.8*cm))
-
-            # Total de Horas (Destaque)
-            dados_total = [
-                ['TOTAL DE HORAS TRABALHADAS:', f"{dados[12]:.2f} HORAS"]
-            ]
-
-            tabela_total = Table(dados_total, colWidths=[
-                                 11*cm, 6*cm])  # Ajuste na largura
-            tabela_total.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#1a237e')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-                ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 14),  # Aumentado fonte
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 14),  # Aumentado padding
-                ('TOPPADDING', (0, 0), (-1, -1), 14),
-            ]))
-            elementos.append(tabela_total)
-            elementos.append(Spacer(1, 1*cm))
-
-            # Rodapé (Assinatura)
-            elementos.append(Spacer(1, 2*cm))
-
-            # Linha da assinatura (centralizada manualmente por espacamento)
-            assinatura_data = [
-                ['', '', '']
-            ]
-            tabela_assinatura = Table(
-                assinatura_data, colWidths=[6*cm, 5*cm, 6*cm])
-            tabela_assinatura.setStyle(TableStyle([
-                ('LINEBELOW', (0, 0), (0, 0), 0.5, colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('TOPPADDING', (0, 0), (-1, -1), 0),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 0)
-            ]))
-            elementos.append(tabela_assinatura)
-
-            # Texto da assinatura
-            elementos.append(Paragraph(
-                "Assinatura Autorizada (Rodamotriz)",
-                ParagraphStyle(
-                    'Left', parent=styles['Normal'], alignment=TA_CENTER, spaceBefore=0)
-            ))
-
-            # Construir PDF
-            doc.build(elementos)
-
-            print(f"\n✅ Relatório gerado com sucesso!")
-            print(f"📄 Arquivo: {os.path.abspath(nome_arquivo)}")
-
-            return nome_arquivo
-
-        except Exception as e:
-            print(f"\n❌ Erro ao gerar relatório: {e}")
-            # Mantido o traceback para debug em caso de erro no PDF
-            import traceback
-            traceback.print_exc()
-            return None
-
-    def fechar(self):
-        """Fecha a conexão com o banco de dados"""
-        self.conn.close()
+
+def celula(valor, largura):
+    """Texto da célula: None vira N/A e textos longos terminam em '...'"""
+    texto = "N/A" if valor is None else str(valor)
+    return texto[:largura - 3] + "..." if len(texto) > largura else texto
+
+
+def exibir_tabela(titulo, colunas, linhas, vazio, verbose=False, tamanho_pagina=None):
+    """Exibe as linhas à medida que chegam, pausando a cada página no terminal
+
+    Retorna quantas linhas foram exibidas. Com a saída redirecionada (ou
+    tamanho_pagina=0) não há pausas.
+    """
+    # Formato e larguras calculados uma vez para toda a listagem
+    larguras = [largura for _, largura in colunas]
+    formato = ' '.join(f'{{:<{largura}}}' for largura in larguras)
+    largura_total = sum(larguras) + len(larguras) - 1
+    if tamanho_pagina is None:
+        tamanho_pagina = max(5, shutil.get_terminal_size().lines - 8)
+    pausar = tamanho_pagina > 0 and sys.stdin.isatty() and sys.stdout.isatty()
+
+    exibidas = 0
+    try:
+        for linha in linhas:
+            if exibidas == 0:
+                print("\n" + "=" * largura_total)
+                print(titulo.center(largura_total))
+                print("=" * largura_total)
+                print(formato.format(*(nome for nome, _ in colunas)))
+                print("-" * largura_total)
+            if verbose:
+                print(f"🔍 DEBUG - Dados brutos do banco: {linha}")
+            print(formato.format(*map(celula, linha, larguras)))
+            exibidas += 1
+
+            if pausar and exibidas % tamanho_pagina == 0:
+                resposta = input(f"-- {exibidas} exibidos: ENTER para continuar, q para parar -- ")
+                if resposta.strip().lower() == 'q':
+                    break
+    finally:
+        # Encerra a leitura do banco caso a listagem seja interrompida
+        if hasattr(linhas, 'close'):
+            linhas.close()
+
+    if not exibidas:
+        print(f"\n⚠️ {vazio}")
+    else:
+        print("=" * largura_total)
+    return exibidas
+
+
+def exibir_clientes(clientes, verbose=False, tamanho_pagina=None,
+                    vazio="Nenhum cliente cadastrado."):
+    """Exibe a tabela de clientes cadastrados; retorna quantos foram exibidos"""
+    clientes = ((c[0], c[1], validacao.formatar_documento(c[2]), *c[3:]) for c in clientes)
+    return exibir_tabela("CLIENTES CADASTRADOS", COLUNAS_CLIENTES, clientes,
+                         vazio, verbose, tamanho_pagina)
+
+
+def exibir_maquinas(maquinas, verbose=False, tamanho_pagina=None,
+                    vazio="Nenhuma máquina cadastrada."):
+    """Exibe a tabela de máquinas cadastradas; retorna quantas foram exibidas"""
+    return exibir_tabela("MÁQUINAS CADASTRADAS", COLUNAS_MAQUINAS, maquinas,
+                         vazio, verbose, tamanho_pagina)
+
+
+def registrar_trabalho(sistema, cliente_id, maquina_id, local_trabalho,
+                       data_inicio, data_final, horimetro_inicial, horimetro_final):
+    """Registra o trabalho e exibe o resumo; retorna o ID ou None em caso de erro"""
+    try:
+        registro_id = sistema.registrar_trabalho(
+            cliente_id, maquina_id, local_trabalho,
+            data_inicio, data_final, horimetro_inicial, horimetro_final
+        )
+    except Exception as e:
+        print(f"\n❌ Erro: {e}")
+        return None
+
+    horas_trabalhadas = horimetro_final - horimetro_inicial
+    print("\n" + "="*80)
+    print("REGISTRO DE TRABALHO CONCLUÍDO".center(80))
+    print("="*80)
+    print(f"Local de Trabalho:      {local_trabalho}")
+    print(f"Período:                {data_inicio} a {data_final}")
+    print(f"Horímetro Inicial:      {horimetro_inicial:.2f} horas")
+    print(f"Horímetro Final:        {horimetro_final:.2f} horas")
+    print(f"**Horas Trabalhadas:** **{horas_trabalhadas:.2f} horas**")
+    print("="*80)
+    return registro_id
+
+
+def gerar_relatorio_pdf(sistema, registro_id):
+    """Gera o PDF do registro e informa o caminho do arquivo"""
+    try:
+        nome_arquivo = sistema.gerar_relatorio_pdf(registro_id)
+    except Exception as e:
+        print(f"\n❌ {e}")
+        return None
+
+    print(f"\n✅ Relatório gerado com sucesso!")
+    print(f"📄 Arquivo: {os.path.abspath(nome_arquivo)}")
+    return nome_arquivo
 
 
 def criar_atalho_desktop():
@@ -568,9 +211,8 @@ def menu_principal():
     print("="*80)
 
 
-def main():
-    sistema = SistemaRodamotriz()
-
+def modo_interativo(sistema):
+    """Menu interativo (modo padrão quando nenhum subcomando é informado)"""
     while True:
         limpar_tela()  # Limpa a tela a cada iteração do loop
         menu_principal()
@@ -585,15 +227,19 @@ def main():
             cnpj_cpf = input("CNPJ/CPF: ").strip()
             endereco = input("Endereço: ").strip()
 
-            if nome and cnpj_cpf and endereco:
-                sistema.cadastrar_cliente(nome, cnpj_cpf, endereco)
+            if validacao.campos_preenchidos(nome, cnpj_cpf, endereco):
+                try:
+                    cliente_id = sistema.cadastrar_cliente(nome, cnpj_cpf, endereco)
+                    print(f"\n✅ Cliente cadastrado com sucesso! ID: {cliente_id}")
+                except Exception as e:
+                    print(f"\n❌ {e}")
             else:
                 print("\n❌ Todos os campos são obrigatórios!")
 
             input("\nPressione ENTER para continuar...")
 
         elif opcao == '2':
-            sistema.listar_clientes()
+            exibir_clientes(sistema.iterar_clientes())
             input("\nPressione ENTER para continuar...")
 
         elif opcao == '3':
@@ -608,7 +254,7 @@ def main():
                 # CORREÇÃO: Usando o ano atual como limite para validação
                 ano_atual = date.today().year
                 ano = int(input(f"Ano (entre 1900 e {ano_atual+1}): ").strip())
-                if ano < 1900 or ano > ano_atual + 1:
+                if not validacao.validar_ano(ano):
                     print("\n❌ Ano inválido!")
                     input("\nPressione ENTER para continuar...")
                     continue
@@ -617,15 +263,19 @@ def main():
                 input("\nPressione ENTER para continuar...")
                 continue
 
-            if marca and modelo:
-                sistema.cadastrar_maquina(marca, modelo, ano)
+            if validacao.campos_preenchidos(marca, modelo):
+                try:
+                    maquina_id = sistema.cadastrar_maquina(marca, modelo, ano)
+                    print(f"\n✅ Máquina cadastrada com sucesso! ID: {maquina_id}")
+                except Exception as e:
+                    print(f"\n❌ {e}")
             else:
                 print("\n❌ Todos os campos são obrigatórios!")
 
             input("\nPressione ENTER para continuar...")
 
         elif opcao == '4':
-            sistema.listar_maquinas()
+            exibir_maquinas(sistema.iterar_maquinas())
             input("\nPressione ENTER para continuar...")
 
         elif opcao == '5':
@@ -634,8 +284,7 @@ def main():
             print("-"*80)
 
             # Selecionar cliente
-            clientes = sistema.listar_clientes()
-            if not clientes:
+            if not exibir_clientes(sistema.iterar_clientes()):
                 input("\nPressione ENTER para continuar...")
                 continue
 
@@ -647,8 +296,7 @@ def main():
                 continue
 
             # Selecionar máquina
-            maquinas = sistema.listar_maquinas()
-            if not maquinas:
+            if not exibir_maquinas(sistema.iterar_maquinas()):
                 input("\nPressione ENTER para continuar...")
                 continue
 
@@ -671,8 +319,8 @@ def main():
                 horimetro_final = float(
                     input("Horímetro Final (horas): ").replace(',', '.').strip())
 
-                registro_id = sistema.registrar_trabalho(
-                    cliente_id, maquina_id, local_trabalho,
+                registro_id = registrar_trabalho(
+                    sistema, cliente_id, maquina_id, local_trabalho,
                     data_inicio, data_final, horimetro_inicial, horimetro_final
                 )
 
@@ -680,7 +328,7 @@ def main():
                     gerar = input(
                         "\nDeseja gerar o relatório PDF agora? (s/n): ").strip().lower()
                     if gerar == 's':
-                        sistema.gerar_relatorio_pdf(registro_id)
+                        gerar_relatorio_pdf(sistema, registro_id)
 
             except ValueError:
                 print("\n❌ Valores inválidos! Digite apenas números para horímetro.")
@@ -691,7 +339,7 @@ def main():
             try:
                 registro_id = int(
                     input("\nDigite o ID do registro para gerar o PDF: ").strip())
-                sistema.gerar_relatorio_pdf(registro_id)
+                gerar_relatorio_pdf(sistema, registro_id)
             except ValueError:
                 print("\n❌ ID inválido!")
 
@@ -703,7 +351,6 @@ def main():
 
         elif opcao == '8':
             print("\n👋 Encerrando sistema...")
-            sistema.fechar()
             break
 
         else:
@@ -711,5 +358,515 @@ def main():
             input("\nPressione ENTER para continuar...")
 
 
+# ============================================================================
+# Modo não interativo: subcomandos para scripts e operações em lote
+# ============================================================================
+
+# Colunas esperadas no CSV de importação de cada cadastro
+COLUNAS_IMPORTACAO = {
+    'clientes': ('nome', 'cnpj_cpf', 'endereco'),
+    'maquinas': ('marca', 'modelo', 'ano'),
+    'trabalhos': ('cliente_id', 'maquina_id', 'local_trabalho', 'data_inicio', 'data_final',
+                  'horimetro_inicial', 'horimetro_final'),
+}
+
+# Conversão dos campos numéricos lidos do CSV
+CONVERSOES_IMPORTACAO = {
+    'ano': int,
+    'cliente_id': int,
+    'maquina_id': int,
+    'horimetro_inicial': lambda valor: float(valor.replace(',', '.')),
+    'horimetro_final': lambda valor: float(valor.replace(',', '.')),
+}
+
+def data_iso(texto):
+    """Tipo do argparse para datas AAAA-MM-DD"""
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {texto} (use AAAA-MM-DD)")
+
+
+def horimetro(texto):
+    """Tipo do argparse para horímetros (aceita vírgula decimal)"""
+    try:
+        return float(texto.replace(',', '.'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"horímetro inválido: {texto}")
+
+
+def faixa(texto):
+    """Tipo do argparse para faixas de contrato HORAS:VALOR (ex.: 100:90)"""
+    try:
+        a_partir_de, valor = texto.replace(',', '.').split(':')
+        return float(a_partir_de), float(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"faixa inválida: {texto} (use HORAS:VALOR)")
+
+
+def abrir_arquivo(caminho, modo):
+    """Abre o arquivo CSV; '-' usa a entrada/saída padrão"""
+    if caminho == '-':
+        return open((sys.stdin if modo == 'r' else sys.stdout).fileno(), modo,
+                    encoding='utf-8', newline='', closefd=False)
+    return open(caminho, modo, encoding='utf-8-sig' if modo == 'r' else 'utf-8', newline='')
+
+
+def ler_csv(caminho, colunas):
+    """Lê o CSV com cabeçalho e retorna as linhas na ordem das colunas pedidas"""
+    with abrir_arquivo(caminho, 'r') as arquivo:
+        leitor = csv.DictReader(arquivo)
+        faltando = [c for c in colunas if c not in (leitor.fieldnames or [])]
+        if faltando:
+            raise Exception(f"Colunas ausentes no arquivo: {', '.join(faltando)}")
+        linhas = []
+        for registro in leitor:
+            try:
+                linhas.append(tuple(
+                    CONVERSOES_IMPORTACAO.get(c, str)((registro[c] or '').strip())
+                    for c in colunas))
+            except ValueError as e:
+                raise Exception(f"Linha {leitor.line_num}: valor inválido ({e})")
+        return linhas
+
+
+def gerar_relatorios_lote(sistema, registro_ids, processos, renderizador=None):
+    """Gera os PDFs em sequência ou distribuídos entre vários processos"""
+    return processos_pdf.gerar_lote(processos_pdf.gerar, registro_ids, processos, sistema,
+                                    renderizador=renderizador)
+
+
+def cmd_menu(sistema, args):
+    modo_interativo(sistema)
+    return 0
+
+
+def cmd_clientes_listar(sistema, args):
+    filtrado = args.nome or args.cnpj_cpf or args.offset
+    exibir_clientes(sistema.iterar_clientes(args.nome, args.cnpj_cpf, args.offset),
+                    args.verbose, args.pagina,
+                    *(["Nenhum cliente encontrado."] if filtrado else []))
+    return 0
+
+
+def cmd_clientes_adicionar(sistema, args):
+    if not validacao.campos_preenchidos(args.nome, args.cnpj_cpf, args.endereco):
+        print("❌ Todos os campos são obrigatórios!")
+        return 1
+    cliente_id = sistema.cadastrar_cliente(args.nome, args.cnpj_cpf, args.endereco, args.atualizar)
+    print(f"✅ Cliente {'salvo' if args.atualizar else 'cadastrado'} com sucesso! ID: {cliente_id}")
+    return 0
+
+
+def cmd_clientes_deduplicar(sistema, args):
+    resumo = sistema.deduplicar_clientes(args.simular)
+    prefixo = "🔍 Simulação: " if args.simular else "✅ "
+    print(f"{prefixo}{resumo['mesclados']} cliente(s) repetido(s) mesclado(s) em {resumo['mantidos']}, "
+          f"{resumo['normalizados']} CNPJ/CPF normalizado(s).")
+    if not args.simular:
+        print(f"   {resumo['registros']} registro(s) de trabalho e {resumo['faturas']} fatura(s) "
+              f"passaram para o cliente mantido.")
+    if resumo['invalidos']:
+        print(f"⚠️ CNPJ/CPF inválido nos clientes {', '.join(map(str, resumo['invalidos']))}; "
+              f"corrija-os manualmente.")
+    if resumo['indice'] is False:
+        print("❌ Ainda há CNPJ/CPF repetidos entre os inválidos; o índice único não foi criado.")
+        return 1
+    return 0
+
+
+def cmd_maquinas_listar(sistema, args):
+    filtrado = args.marca or args.modelo or args.ano is not None or args.offset
+    exibir_maquinas(sistema.iterar_maquinas(args.marca, args.modelo, args.ano, args.offset),
+                    args.verbose, args.pagina,
+                    *(["Nenhuma máquina encontrada."] if filtrado else []))
+    return 0
+
+
+def cmd_maquinas_adicionar(sistema, args):
+    if not validacao.validar_ano(args.ano):
+        print("❌ Ano inválido!")
+        return 1
+    if not validacao.campos_preenchidos(args.marca, args.modelo):
+        print("❌ Todos os campos são obrigatórios!")
+        return 1
+    maquina_id = sistema.cadastrar_maquina(args.marca, args.modelo, args.ano)
+    print(f"✅ Máquina cadastrada com sucesso! ID: {maquina_id}")
+    return 0
+
+
+def cmd_locais_listar(sistema, args):
+    exibir_tabela("HORAS POR LOCAL DE TRABALHO", COLUNAS_LOCAIS,
+                  ((i, nome, registros, f"{horas:.2f}") for i, nome, registros, horas in sistema.horas_por_local()),
+                  "Nenhum trabalho registrado.", tamanho_pagina=args.pagina)
+    return 0
+
+
+def cmd_trabalho_adicionar(sistema, args):
+    registro_id = registrar_trabalho(
+        sistema, args.cliente, args.maquina, args.local,
+        args.inicio, args.fim, args.horimetro_inicial, args.horimetro_final
+    )
+    if registro_id is None:
+        return 1
+    if args.pdf and gerar_relatorio_pdf(sistema, registro_id) is None:
+        return 1
+    return 0
+
+
+def cmd_trabalho_editar(sistema, args):
+    campos = {
+        'cliente_id': args.cliente, 'maquina_id': args.maquina, 'local_trabalho': args.local,
+        'data_inicio': args.inicio, 'data_final': args.fim,
+        'horimetro_inicial': args.horimetro_inicial, 'horimetro_final': args.horimetro_final,
+    }
+    if all(valor is None for valor in campos.values()):
+        print("❌ Informe ao menos um campo a corrigir.", file=sys.stderr)
+        return 1
+    resumo = sistema.editar_trabalho(args.id, **campos)
+    arquivado = f" (arquivo de {resumo['ano_arquivado']})" if resumo['ano_arquivado'] else ""
+    print(f"✅ Registro {args.id} atualizado{arquivado}: "
+          f"{resumo['horas_antes']:.2f} → {resumo['horas']:.2f} horas.")
+    if resumo['pdfs_apagados']:
+        print(f"   {resumo['pdfs_apagados']} PDF(s) antigo(s) apagado(s).")
+    return 0
+
+
+def cmd_relatorio_gerar(sistema, args):
+    registro_ids = list(args.ids)
+    if args.desde or args.ate:
+        registro_ids += [t[0] for t in sistema.listar_trabalhos(args.desde, args.ate)]
+    if not registro_ids:
+        print("⚠️ Nenhum registro para gerar (informe IDs ou um período com --desde/--ate).")
+        return 1
+
+    resultados = gerar_relatorios_lote(sistema, registro_ids, args.processos, args.renderizador)
+    erros = 0
+    for registro_id, arquivo, erro in resultados:
+        if erro:
+            erros += 1
+            print(f"❌ Registro {registro_id}: {erro}")
+        else:
+            print(f"✅ Registro {registro_id}: {os.path.abspath(arquivo)}")
+    print(f"\n📄 {len(resultados) - erros} relatório(s) gerado(s), {erros} erro(s).")
+    return 1 if erros else 0
+
+
+def cmd_relatorio_pregerar(sistema, args):
+    resumo = pregeracao.executar(sistema, args.competencia, args.processos, args.faturar, args.renderizador)
+    for erro in resumo['erros']:
+        print(f"❌ {erro}")
+    print(f"📄 {resumo['competencia']}: {resumo['faturas']} demonstrativo(s) e {resumo['relatorios']} "
+          f"relatório(s) em {resumo['segundos']:.1f} s ({resumo['processos']} processo(s)), "
+          f"{len(resumo['erros'])} erro(s).")
+    return 1 if resumo['erros'] else 0
+
+
+def cmd_importar(sistema, args):
+    if args.atualizar and args.tipo != 'clientes':
+        print("❌ --atualizar vale apenas para clientes (pelo CNPJ/CPF).", file=sys.stderr)
+        return 1
+    linhas = ler_csv(args.arquivo, COLUNAS_IMPORTACAO[args.tipo])
+    importar = {
+        'clientes': functools.partial(sistema.importar_clientes, atualizar=args.atualizar),
+        'maquinas': sistema.importar_maquinas,
+        'trabalhos': sistema.importar_trabalhos,
+    }[args.tipo]
+    print(f"✅ {importar(linhas)} registro(s) de {args.tipo} importado(s).", file=sys.stderr)
+    return 0
+
+
+def cmd_exportar(sistema, args):
+    with abrir_arquivo(args.saida, 'w') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(COLUNAS_EXPORTACAO[args.tipo])
+        total = 0
+        for linha in sistema.exportar(args.tipo, args.desde, args.ate):
+            escritor.writerow(linha)
+            total += 1
+    print(f"✅ {total} registro(s) de {args.tipo} exportado(s).", file=sys.stderr)
+    return 0
+
+
+def cmd_contrato_adicionar(sistema, args):
+    contrato_id = sistema.cadastrar_contrato(
+        args.cliente, args.maquina, args.valor_hora, args.inicio,
+        args.fim, args.minimo, args.faixa)
+    print(f"✅ Contrato cadastrado com sucesso! ID: {contrato_id}")
+    return 0
+
+
+def cmd_contrato_listar(sistema, args):
+    contratos = sistema.listar_contratos(args.cliente)
+    if not contratos:
+        print("📭 Nenhum contrato cadastrado.")
+        return 0
+    for contrato_id, cliente, marca, modelo, valor_hora, minimo, inicio, fim, faixas in contratos:
+        maquina = f'{marca} {modelo}' if marca else 'todas as máquinas'
+        vigencia = f"{inicio} a {fim or 'indeterminado'}"
+        faixas = ''.join(f'; acima de {h:g} h: {faturamento.moeda(v)}/h' for h, v in faixas)
+        print(f"{contrato_id:>5}  {cliente} — {maquina} ({vigencia}): "
+              f"{faturamento.moeda(valor_hora)}/h, mínimo {minimo:g} h{faixas}")
+    return 0
+
+
+def cmd_faturamento_gerar(sistema, args):
+    resumo = sistema.faturar_mes(args.competencia)
+    print(f"✅ {resumo['faturas']} fatura(s) de {resumo['competencia']}, "
+          f"total {faturamento.moeda(resumo['valor'])}")
+    for cliente_id, maquina_id, horas in resumo['sem_contrato']:
+        print(f"⚠️ Sem contrato vigente: cliente {cliente_id}, máquina {maquina_id} ({horas:.2f} h)")
+    if args.pdf:
+        for fatura in sistema.listar_faturas(args.competencia):
+            print(f"📄 {os.path.abspath(sistema.gerar_fatura_pdf(fatura[0]))}")
+    return 0
+
+
+def cmd_faturamento_listar(sistema, args):
+    faturas = sistema.listar_faturas(args.competencia)
+    if not faturas:
+        print("📭 Nenhuma fatura gerada.")
+        return 0
+    for fatura_id, competencia, cliente, horas, valor, _ in faturas:
+        print(f"{fatura_id:>5}  {competencia}  {celula(cliente, 35):<35} "
+              f"{horas:>9.2f} h  {faturamento.moeda(valor):>16}")
+    return 0
+
+
+def cmd_analise_exportar(sistema, args):
+    resumo = sistema.exportar_analise(args.destino, args.completa)
+    tipo = 'completa' if resumo['completa'] else 'incremental'
+    print(f"✅ Exportação {tipo} até a alteração {resumo['seq']}: "
+          f"{resumo['regravados']} registro(s) ativo(s) regravado(s) em {resumo['segundos']:.1f} s.")
+    if resumo['anos_arquivados']:
+        print(f"   Anos arquivados recarregados: {', '.join(map(str, resumo['anos_arquivados']))}.")
+    print(f"📊 {resumo['registros']} registro(s) na cópia {os.path.abspath(args.destino)}")
+    if args.parquet:
+        conn = analise.abrir(args.destino)
+        try:
+            total = analise.gravar_parquet(conn, args.parquet)
+        finally:
+            conn.close()
+        print(f"📄 {total} registro(s) gravado(s) em {os.path.abspath(args.parquet)}")
+    return 0
+
+
+def _abrir_analise(args):
+    """Conexão com a cópia analítica, avisando (no stderr) de quando ela é"""
+    conn = analise.abrir(args.origem)
+    registros, exportado_em = analise.situacao(conn)
+    print(f"📊 Cópia analítica de {exportado_em or 'data desconhecida'} ({registros} registro(s))",
+          file=sys.stderr)
+    return conn
+
+
+def cmd_analise_modelos(sistema, args):
+    conn = _abrir_analise(args)
+    try:
+        linhas = analise.horas_por_modelo(conn, args.desde, args.ate)
+    finally:
+        conn.close()
+    if not linhas:
+        print("📭 Nenhum registro no período.")
+        return 0
+    print(f"{'Trimestre':<10} {'Máquina':<35} {'Registros':>9} {'Horas':>12}")
+    for ano, trimestre, marca, modelo, registros, horas in linhas:
+        print(f"{f'{ano}-T{trimestre}':<10} {celula(f'{marca} {modelo}', 35):<35} {registros:>9} {horas:>12.2f}")
+    return 0
+
+
+def cmd_analise_sazonalidade(sistema, args):
+    conn = _abrir_analise(args)
+    try:
+        linhas = analise.sazonalidade(conn, args.cliente)
+    finally:
+        conn.close()
+    if not linhas:
+        print("📭 Nenhum registro encontrado.")
+        return 0
+    anterior = None
+    for cliente_id, cliente, mes, registros, horas, participacao in linhas:
+        if cliente_id != anterior:
+            print(f"\n👤 {cliente} (ID {cliente_id})")
+            anterior = cliente_id
+        print(f"   mês {mes:>2}: {registros:>6} registro(s) {horas:>12.2f} h  {participacao:5.1f}%")
+    return 0
+
+
+def criar_parser():
+    """Subcomandos da linha de comando; sem subcomando, abre o menu interativo"""
+    parser = argparse.ArgumentParser(
+        prog='app.py', description='Rodamotriz - Controle de Horas de Máquinas')
+    comandos = parser.add_subparsers(dest='comando', metavar='COMANDO')
+
+    # Opções comuns às listagens de cadastros
+    opcoes_listagem = argparse.ArgumentParser(add_help=False)
+    opcoes_listagem.add_argument('--offset', type=int, default=0, help='pula os N primeiros')
+    opcoes_listagem.add_argument('--pagina', type=int, metavar='N',
+                                 help='linhas por página (padrão: altura do terminal; 0 = sem pausa)')
+    opcoes_listagem.add_argument('-v', '--verbose', action='store_true',
+                                 help='mostra também os dados brutos de cada linha')
+
+    menu = comandos.add_parser('menu', help='menu interativo (padrão)')
+    menu.set_defaults(funcao=cmd_menu)
+
+    clientes = comandos.add_parser('clientes', help='clientes cadastrados')
+    acoes = clientes.add_subparsers(dest='acao', metavar='AÇÃO', required=True)
+    listar = acoes.add_parser('list', help='lista os clientes', parents=[opcoes_listagem])
+    listar.add_argument('--nome', help='nome começando com')
+    listar.add_argument('--cnpj-cpf', help='CNPJ/CPF começando com')
+    listar.set_defaults(funcao=cmd_clientes_listar)
+    adicionar = acoes.add_parser('add', help='cadastra um cliente')
+    adicionar.add_argument('--nome', required=True)
+    adicionar.add_argument('--cnpj-cpf', required=True)
+    adicionar.add_argument('--endereco', required=True)
+    adicionar.add_argument('--atualizar', action='store_true',
+                           help='se o CNPJ/CPF já existir, atualiza nome e endereço do cliente')
+    adicionar.set_defaults(funcao=cmd_clientes_adicionar)
+    deduplicar = acoes.add_parser('dedup', help='mescla clientes com o mesmo CNPJ/CPF')
+    deduplicar.add_argument('--simular', action='store_true', help='só mostra o que seria feito')
+    deduplicar.set_defaults(funcao=cmd_clientes_deduplicar)
+
+    maquinas = comandos.add_parser('maquinas', help='máquinas cadastradas')
+    acoes = maquinas.add_subparsers(dest='acao', metavar='AÇÃO', required=True)
+    listar = acoes.add_parser('list', help='lista as máquinas', parents=[opcoes_listagem])
+    listar.add_argument('--marca', help='marca começando com')
+    listar.add_argument('--modelo', help='modelo começando com')
+    listar.add_argument('--ano', type=int)
+    listar.set_defaults(funcao=cmd_maquinas_listar)
+    adicionar = acoes.add_parser('add', help='cadastra uma máquina')
+    adicionar.add_argument('--marca', required=True)
+    adicionar.add_argument('--modelo', required=True)
+    adicionar.add_argument('--ano', type=int, required=True)
+    adicionar.set_defaults(funcao=cmd_maquinas_adicionar)
+
+    locais = comandos.add_parser('locais', help='locais de trabalho')
+    acoes = locais.add_subparsers(dest='acao', metavar='AÇÃO', required=True)
+    listar = acoes.add_parser('list', help='horas por local (registros ativos)')
+    listar.add_argument('--pagina', type=int, metavar='N',
+                        help='linhas por página (padrão: altura do terminal; 0 = sem pausa)')
+    listar.set_defaults(funcao=cmd_locais_listar)
+
+    trabalho = comandos.add_parser('trabalho', help='registros de trabalho')
+    acoes = trabalho.add_subparsers(dest='acao', metavar='AÇÃO', required=True)
+    adicionar = acoes.add_parser('add', help='registra um trabalho')
+    adicionar.add_argument('--cliente', type=int, required=True, help='ID do cliente')
+    adicionar.add_argument('--maquina', type=int, required=True, help='ID da máquina')
+    adicionar.add_argument('--local', required=True, help='local de trabalho')
+    adicionar.add_argument('--inicio', required=True, help='data de início (dd/mm/yyyy)')
+    adicionar.add_argument('--fim', required=True, help='data final (dd/mm/yyyy)')
+    adicionar.add_argument('--horimetro-inicial', type=horimetro, required=True)
+    adicionar.add_argument('--horimetro-final', type=horimetro, required=True)
+    adicionar.add_argument('--pdf', action='store_true', help='gera o relatório em seguida')
+    adicionar.set_defaults(funcao=cmd_trabalho_adicionar)
+    editar = acoes.add_parser('edit', help='corrige um registro (só os campos informados)')
+    editar.add_argument('id', type=int, help='ID do registro')
+    editar.add_argument('--cliente', type=int, help='ID do cliente')
+    editar.add_argument('--maquina', type=int, help='ID da máquina')
+    editar.add_argument('--local', help='local de trabalho')
+    editar.add_argument('--inicio', help='data de início (dd/mm/yyyy)')
+    editar.add_argument('--fim', help='data final (dd/mm/yyyy)')
+    editar.add_argument('--horimetro-inicial', type=horimetro)
+    editar.add_argument('--horimetro-final', type=horimetro)
+    editar.set_defaults(funcao=cmd_trabalho_editar)
+
+    relatorio = comandos.add_parser('relatorio', help='relatórios em PDF')
+    acoes = relatorio.add_subparsers(dest='acao', metavar='AÇÃO', required=True)
+    gerar = acoes.add_parser('gerar', help='gera os PDFs dos registros informados ou do período')
+    gerar.add_argument('ids', nargs='*', type=int, metavar='ID', help='IDs dos registros')
+    gerar.add_argument('--desde', type=data_iso, help='data final a partir de (AAAA-MM-DD)')
+    gerar.add_argument('--ate', type=data_iso, help='data final até (AAAA-MM-DD)')
+    gerar.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                       help='processos em paralelo (padrão: número de CPUs)')
+    gerar.add_argument('--renderizador', choices=sorted(RENDERIZADORES),
+                       help=f'como desenhar o PDF (padrão: {RENDERIZADOR_PADRAO})')
+    gerar.set_defaults(funcao=cmd_relatorio_gerar)
+    pregerar = acoes.add_parser('pregerar', help='gera de madrugada os PDFs do mês (cron); ver pregeracao.py')
+    pregerar.add_argument('--competencia', metavar='AAAA-MM', help='mês (padrão: o de ontem)')
+    pregerar.add_argument('--faturar', action='store_true', help='recalcula as faturas do mês antes')
+    pregerar.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                          help='processos em paralelo (padrão: número de CPUs)')
+    pregerar.add_argument('--renderizador', choices=sorted(RENDERIZADORES),
+                          help=f'como desenhar os relatórios (padrão: {RENDERIZADOR_PADRAO})')
+    pregerar.set_defaults(funcao=cmd_relatorio_pregerar)
+
+    importar = comandos.add_parser('import', help='importa um cadastro de um CSV')
+    importar.add_argument('tipo', choices=sorted(COLUNAS_IMPORTACAO))
+    importar.add_argument('arquivo', help="arquivo CSV com cabeçalho ('-' para a entrada padrão)")
+    importar.add_argument('--atualizar', action='store_true',
+                          help='clientes: atualiza os já cadastrados com o mesmo CNPJ/CPF')
+    importar.set_defaults(funcao=cmd_importar)
+
+    exportar = comandos.add_parser('export', help='exporta um cadastro para CSV')
+    exportar.add_argument('tipo', choices=sorted(COLUNAS_EXPORTACAO))
+    exportar.add_argument('-o', '--saida', default='-', help="arquivo de saída (padrão: '-', saída padrão)")
+    exportar.add_argument('--desde', type=data_iso, help='trabalhos: data final a partir de (AAAA-MM-DD)')
+    exportar.add_argument('--ate', type=data_iso, help='trabalhos: data final até (AAAA-MM-DD)')
+    exportar.set_defaults(funcao=cmd_exportar)
+
+    contrato = comandos.add_parser('contrato', help='contratos de valor por hora')
+    acoes = contrato.add_subparsers(dest='acao', metavar='AÇÃO', required=True)
+    adicionar = acoes.add_parser('add', help='cadastra um contrato')
+    adicionar.add_argument('--cliente', type=int, required=True, help='ID do cliente')
+    adicionar.add_argument('--maquina', type=int, help='ID da máquina (padrão: todas do cliente)')
+    adicionar.add_argument('--valor-hora', type=horimetro, required=True, help='valor base por hora')
+    adicionar.add_argument('--minimo', type=horimetro, default=0, help='mínimo de horas faturadas no mês')
+    adicionar.add_argument('--inicio', required=True, help='primeiro mês de vigência (AAAA-MM)')
+    adicionar.add_argument('--fim', help='último mês de vigência (AAAA-MM)')
+    adicionar.add_argument('--faixa', type=faixa, action='append', default=[], metavar='HORAS:VALOR',
+                           help='acima de HORAS no mês, cada hora vale VALOR (repetível)')
+    adicionar.set_defaults(funcao=cmd_contrato_adicionar)
+    listar = acoes.add_parser('list', help='lista os contratos')
+    listar.add_argument('--cliente', type=int, help='apenas do cliente informado')
+    listar.set_defaults(funcao=cmd_contrato_listar)
+
+    fatura = comandos.add_parser('faturamento', help='faturamento mensal')
+    acoes = fatura.add_subparsers(dest='acao', metavar='AÇÃO', required=True)
+    gerar = acoes.add_parser('gerar', help='calcula (ou recalcula) as faturas do mês')
+    gerar.add_argument('competencia', metavar='AAAA-MM')
+    gerar.add_argument('--pdf', action='store_true', help='gera o demonstrativo de cada cliente')
+    gerar.set_defaults(funcao=cmd_faturamento_gerar)
+    listar = acoes.add_parser('list', help='lista as faturas geradas')
+    listar.add_argument('competencia', nargs='?', metavar='AAAA-MM')
+    listar.set_defaults(funcao=cmd_faturamento_listar)
+
+    analises = comandos.add_parser('analise', help='consultas pesadas numa cópia à parte; ver analise.py')
+    acoes = analises.add_subparsers(dest='acao', metavar='AÇÃO', required=True)
+    exportar = acoes.add_parser('exportar', help='atualiza a cópia com o que mudou desde a última vez (cron)')
+    exportar.add_argument('--completa', action='store_true', help='refaz a cópia do zero')
+    exportar.add_argument('--destino', default=CAMINHO_ANALISE, help='arquivo da cópia (padrão: analise.db)')
+    exportar.add_argument('--parquet', metavar='ARQUIVO', help='grava também a cópia em Parquet (pyarrow)')
+    exportar.set_defaults(funcao=cmd_analise_exportar)
+    modelos = acoes.add_parser('modelos', help='horas por modelo de máquina e trimestre')
+    modelos.add_argument('--desde', type=int, metavar='AAAA', help='a partir do ano')
+    modelos.add_argument('--ate', type=int, metavar='AAAA', help='até o ano')
+    modelos.add_argument('--origem', default=CAMINHO_ANALISE, help='arquivo da cópia (padrão: analise.db)')
+    modelos.set_defaults(funcao=cmd_analise_modelos)
+    sazonalidade = acoes.add_parser('sazonalidade', help='horas de cada cliente por mês do ano')
+    sazonalidade.add_argument('--cliente', type=int, metavar='ID', help='só este cliente')
+    sazonalidade.add_argument('--origem', default=CAMINHO_ANALISE, help='arquivo da cópia (padrão: analise.db)')
+    sazonalidade.set_defaults(funcao=cmd_analise_sazonalidade)
+
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    funcao = getattr(args, 'funcao', cmd_menu)
+
+    sistema = SistemaRodamotriz()
+    try:
+        return funcao(sistema, args)
+    except BrokenPipeError:
+        # Saída encerrada antes do fim (ex.: "| head"); não é um erro
+        sys.stdout = open(os.devnull, 'w')
+        return 0
+    except Exception as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        sistema.fechar()
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
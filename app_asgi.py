@@ -0,0 +1,388 @@
+"""
+Variante ASGI da aplicação web Rodamotriz (modo assíncrono)
+
+Uso: uvicorn app_asgi:app --host 0.0.0.0 --port 5000
+
+Serve as mesmas rotas do app_web.py. As rotas que passam a maior parte do tempo
+esperando são atendidas direto no laço de eventos, sem ocupar uma thread por
+conexão:
+
+- /eventos (SSE): cada ouvinte é uma corrotina com uma asyncio.Queue, então o
+  limite de ouvintes por processo pode ser bem maior que no gunicorn;
+- /api/clientes e /api/maquinas (autocompletar): consultas pelo aiosqlite, num
+  pool de conexões somente leitura;
+- /gerar_pdf/<id>: o PDF pré-gerado (pregeracao.py) é entregue direto; senão é
+  renderizado num pool de processos (processos_pdf.py) e o laço só espera o
+  resultado, com o mesmo controle de admissão do Flask (admissao.py).
+
+As demais rotas (formulários, listagens, telemetria etc.) são repassadas ao
+Flask num pool de threads, com o corpo da requisição já lido. Com o backend
+PostgreSQL o autocompletar também vai para o Flask (o aiosqlite só fala SQLite).
+
+Configuração:
+    RODAMOTRIZ_ASGI_THREADS     threads para as rotas do Flask (padrão: 8)
+    RODAMOTRIZ_ASGI_LEITORES    conexões aiosqlite de leitura (padrão: 4)
+    RODAMOTRIZ_ASGI_PROCESSOS   processos que geram PDFs (padrão: CPUs)
+    RODAMOTRIZ_ASGI_SSE_MAX     ouvintes SSE por processo (padrão: 1000)
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from multiprocessing import get_context
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import app_web
+from rodamotriz import admissao, alteracoes, eventos, manutencao, pregeracao, processos_pdf
+
+THREADS = int(os.environ.get('RODAMOTRIZ_ASGI_THREADS', 8))
+LEITORES = int(os.environ.get('RODAMOTRIZ_ASGI_LEITORES', 4))
+PROCESSOS = int(os.environ.get('RODAMOTRIZ_ASGI_PROCESSOS', os.cpu_count() or 1))
+MAX_OUVINTES = int(os.environ.get('RODAMOTRIZ_ASGI_SSE_MAX', 1000))
+
+
+class DifusorAssincrono(eventos.Difusor):
+    """Difusor cujas filas são asyncio.Queue, alimentadas pela thread do difusor"""
+
+    def __init__(self, sistema, laco, **kwargs):
+        super().__init__(sistema, **kwargs)
+        self.laco = laco
+
+    def _nova_fila(self):
+        return asyncio.Queue(eventos.TAMANHO_FILA)
+
+    def _entregar(self, fila, lote):
+        # asyncio.Queue não é thread-safe: a entrega acontece dentro do laço de eventos
+        self.laco.call_soon_threadsafe(self._entregar_no_laco, fila, lote)
+
+    def _entregar_no_laco(self, fila, lote):
+        try:
+            for evento in lote:
+                fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Ouvinte lento: é desligado e o navegador reconecta recuperando o que perdeu
+            self.cancelar(fila)
+            while not fila.empty():
+                fila.get_nowait()
+            fila.put_nowait(None)
+
+
+class Leitores:
+    """Pool de conexões aiosqlite somente leitura"""
+
+    def __init__(self, caminho, quantidade, perfil):
+        self.caminho = caminho
+        self.quantidade = quantidade
+        self.perfil = perfil
+        self.livres = asyncio.Queue()
+
+    async def abrir(self):
+        import aiosqlite
+        for _ in range(self.quantidade):
+            conn = await aiosqlite.connect(self.caminho)
+            for pragma, valor in manutencao.PERFIS[self.perfil]:
+                await conn.execute(f'PRAGMA {pragma} = {valor}')
+            await conn.execute('PRAGMA query_only = 1')
+            self.livres.put_nowait(conn)
+
+    async def fechar(self):
+        for _ in range(self.quantidade):
+            conn = await self.livres.get()
+            await conn.close()
+
+    async def consultar(self, consulta, parametros):
+        conn = await self.livres.get()
+        try:
+            async with conn.execute(consulta, parametros) as cursor:
+                return await cursor.fetchall()
+        finally:
+            self.livres.put_nowait(conn)
+
+
+# Estado do processo, criado no lifespan
+_threads = None
+_fila_pdf = None
+_processos = None
+_leitores = None
+difusor = None
+
+
+async def _em_thread(funcao, *args):
+    return await asyncio.get_running_loop().run_in_executor(_threads, funcao, *args)
+
+
+async def _responder(send, status, corpo, tipo, cabecalhos=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', tipo.encode()),
+                            (b'content-length', str(len(corpo)).encode()),
+                            *[(nome.encode(), valor.encode()) for nome, valor in cabecalhos]]})
+    await send({'type': 'http.response.body', 'body': corpo})
+
+
+async def _json(send, dados, status=200):
+    await _responder(send, status, json.dumps(dados).encode(), 'application/json')
+
+
+# === PONTE PARA O FLASK ===
+
+def _ambiente(scope, corpo):
+    """Environ WSGI da requisição ASGI"""
+    servidor = scope.get('server') or ('localhost', 80)
+    ambiente = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': servidor[0],
+        'SERVER_PORT': str(servidor[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(corpo)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(corpo),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for nome, valor in scope['headers']:
+        nome, valor = nome.decode('latin-1'), valor.decode('latin-1')
+        if nome == 'content-length':
+            continue
+        chave = 'CONTENT_TYPE' if nome == 'content-type' else 'HTTP_' + nome.upper().replace('-', '_')
+        ambiente[chave] = f'{ambiente[chave]},{valor}' if chave in ambiente else valor
+    return ambiente
+
+
+def _chamar_flask(ambiente):
+    """Executa a requisição no Flask (numa thread do pool); retorna (status, cabeçalhos, corpo)"""
+    inicio = {}
+
+    def start_response(status, cabecalhos, exc_info=None):
+        inicio['status'] = int(status.split(' ', 1)[0])
+        inicio['cabecalhos'] = [(nome.lower().encode('latin-1'), valor.encode('latin-1'))
+                                for nome, valor in cabecalhos]
+
+    resposta = app_web.app(ambiente, start_response)
+    try:
+        corpo = b''.join(resposta)
+    finally:
+        if hasattr(resposta, 'close'):
+            resposta.close()
+    return inicio['status'], inicio['cabecalhos'], corpo
+
+
+async def _flask(scope, receive, send, corpo=None):
+    if corpo is None:
+        partes = []
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'http.disconnect':
+                return
+            partes.append(mensagem.get('body', b''))
+            if not mensagem.get('more_body'):
+                break
+        corpo = b''.join(partes)
+    status, cabecalhos, conteudo = await _em_thread(_chamar_flask, _ambiente(scope, corpo))
+    await send({'type': 'http.response.start', 'status': status, 'headers': cabecalhos})
+    await send({'type': 'http.response.body', 'body': conteudo})
+
+
+# === ROTAS ASSÍNCRONAS ===
+
+async def _autocompletar(scope, receive, send, cadastro, sugestao):
+    argumentos = parse_qs(scope['query_string'].decode('latin-1'))
+    try:
+        busca = app_web.sistema.consulta_busca(
+            cadastro, argumentos.get('q', [''])[0], argumentos.get('limite', [10])[0])
+    except ValueError:
+        return await _json(send, {'erro': 'Limite inválido'}, 400)
+    linhas = await _leitores.consultar(*busca) if busca else []
+    await _json(send, [sugestao(linha) for linha in linhas])
+
+
+async def api_clientes(scope, receive, send):
+    await _autocompletar(scope, receive, send, 'clientes', app_web.sugestao_cliente)
+
+
+async def api_maquinas(scope, receive, send):
+    await _autocompletar(scope, receive, send, 'maquinas', app_web.sugestao_maquina)
+
+
+async def gerar_pdf(scope, receive, send, registro_id):
+    laco = asyncio.get_running_loop()
+    renderizador = parse_qs(scope['query_string'].decode('latin-1')).get('renderizador', [None])[0]
+    # Pré-gerado e ainda válido: entregue sem passar pelo limitador (ver pregeracao.py)
+    pronto = None if renderizador else await _em_thread(pregeracao.relatorio_pronto, registro_id)
+    if pronto:
+        try:
+            conteudo = await _em_thread(Path(pronto).read_bytes)
+            return await _responder(send, 200, conteudo, 'application/pdf', [
+                ('content-disposition', f'attachment; filename=relatorio_{registro_id}.pdf')])
+        except FileNotFoundError:
+            pass
+    usuario = admissao.identificar((scope.get('client') or ('', 0))[0],
+                                   dict(scope['headers']).get(b'x-forwarded-for', b'').decode('latin-1'))
+    # A espera na fila do limitador fica em threads próprias, fora das do Flask
+    try:
+        await laco.run_in_executor(_fila_pdf, app_web.limitador_pdf.adquirir, usuario)
+    except admissao.Recusado as e:
+        return await _responder(send, e.status, str(e).encode(), 'text/plain; charset=utf-8',
+                                [('retry-after', str(e.retry_after))])
+    inicio = time.monotonic()
+    try:
+        _, arquivo, erro = await laco.run_in_executor(
+            _processos, processos_pdf.gerar, registro_id, None, renderizador)
+    finally:
+        app_web.limitador_pdf.liberar(time.monotonic() - inicio)
+    if erro:
+        # O Flask refaz a tentativa e mostra o erro na lista de trabalhos
+        return await _flask(scope, receive, send, b'')
+    conteudo = await _em_thread(Path(arquivo).read_bytes)
+    await _responder(send, 200, conteudo, 'application/pdf', [
+        ('content-disposition', f'attachment; filename=relatorio_{registro_id}.pdf')])
+
+
+async def _aguardar_desconexao(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def eventos_ao_vivo(scope, receive, send):
+    """Stream SSE com trabalhos incluídos/removidos e totais atualizados"""
+    inscricao = await _em_thread(difusor.inscrever)
+    if inscricao is None:
+        return await _responder(send, 503, 'Limite de conexões ao vivo atingido'.encode(),
+                                'text/plain; charset=utf-8', [('retry-after', '30')])
+    fila, inicio = inscricao
+    cabecalhos = dict(scope['headers'])
+    ultimo_id = cabecalhos.get(b'last-event-id', b'').decode('latin-1')
+    desconexao = asyncio.ensure_future(_aguardar_desconexao(receive))
+
+    async def enviar(texto):
+        await send({'type': 'http.response.body', 'body': texto.encode(), 'more_body': True})
+
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]})
+        await enviar('retry: 5000\n\n')
+        visto = inicio
+        if ultimo_id.isdigit():
+            # Reconexão: envia o que mudou desde o último evento recebido
+            try:
+                atrasados, visto = await _em_thread(
+                    eventos.montar_eventos, app_web.sistema, int(ultimo_id))
+            except alteracoes.LogTruncado:
+                atrasados = [(inicio, 'recarregar', {})]
+            for evento in atrasados:
+                await enviar(app_web._evento_sse(*evento))
+        else:
+            totais = await _em_thread(app_web.sistema.estatisticas)
+            await enviar(app_web._evento_sse(inicio, 'totais', totais))
+
+        laco = asyncio.get_running_loop()
+        fim = laco.time() + app_web.DURACAO_SSE
+        while laco.time() < fim:
+            proximo = asyncio.ensure_future(fila.get())
+            await asyncio.wait({proximo, desconexao}, timeout=app_web.BATIMENTO_SSE,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if desconexao.done():
+                proximo.cancel()
+                return
+            if not proximo.done():
+                proximo.cancel()
+                await enviar(': ping\n\n')
+                continue
+            evento = proximo.result()
+            if evento is None:
+                break
+            # Já enviado na recuperação da reconexão
+            if evento[0] > visto:
+                await enviar(app_web._evento_sse(*evento))
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        desconexao.cancel()
+        difusor.cancelar(fila)
+
+
+# Rotas (método, partes fixas do caminho) atendidas no laço; o restante vai para o Flask
+ROTAS_SQLITE = {
+    ('GET', '/api/clientes'): api_clientes,
+    ('GET', '/api/maquinas'): api_maquinas,
+}
+ROTAS = {
+    ('GET', '/eventos'): eventos_ao_vivo,
+}
+
+
+def _rota(scope):
+    chave = (scope['method'], scope['path'])
+    if chave in ROTAS:
+        return ROTAS[chave], ()
+    if _leitores is not None and chave in ROTAS_SQLITE:
+        return ROTAS_SQLITE[chave], ()
+    prefixo, _, registro_id = scope['path'].rpartition('/')
+    if scope['method'] == 'GET' and prefixo == '/gerar_pdf' and registro_id.isdigit():
+        return gerar_pdf, (int(registro_id),)
+    return None, ()
+
+
+# === CICLO DE VIDA ===
+
+@asynccontextmanager
+async def _recursos():
+    global _threads, _fila_pdf, _processos, _leitores, difusor
+    _threads = ThreadPoolExecutor(THREADS, thread_name_prefix='flask')
+    limitador = app_web.limitador_pdf
+    _fila_pdf = ThreadPoolExecutor(limitador.simultaneos + limitador.tamanho_fila,
+                                   thread_name_prefix='fila-pdf')
+    # spawn: não copia o laço de eventos nem as threads deste processo para os filhos
+    _processos = ProcessPoolExecutor(PROCESSOS, mp_context=get_context('spawn'),
+                                     initializer=processos_pdf.iniciar)
+    # As gravações feitas pelo Flask (after_request) acordam este difusor
+    difusor = app_web.difusor = DifusorAssincrono(
+        app_web.sistema, asyncio.get_running_loop(), max_ouvintes=MAX_OUVINTES)
+    banco = app_web.sistema.banco
+    if banco.tipo == 'sqlite':
+        _leitores = Leitores(banco.caminho, LEITORES, banco.perfil)
+        await _leitores.abrir()
+    await _em_thread(app_web.preaquecer)
+    try:
+        yield
+    finally:
+        if _leitores is not None:
+            await _leitores.fechar()
+            _leitores = None
+        _processos.shutdown(cancel_futures=True)
+        _threads.shutdown(wait=False, cancel_futures=True)
+        _fila_pdf.shutdown(wait=False, cancel_futures=True)
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await receive()
+        contexto = _recursos()
+        try:
+            await contexto.__aenter__()
+        except Exception as e:
+            await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+            return
+        await send({'type': 'lifespan.startup.complete'})
+        await receive()
+        await contexto.__aexit__(None, None, None)
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+    if scope['type'] != 'http':
+        return
+    rota, argumentos = _rota(scope)
+    if rota is None:
+        return await _flask(scope, receive, send)
+    await rota(scope, receive, send, *argumentos)
@@ -1,471 +1,116 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
-import sqlite3
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, Response, abort
+from datetime import date, timedelta
+import functools
+import hmac
+import json
 import os
-from datetime import datetime, date
-import platform
-import threading
-
-# === ReportLab Imports ===
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import cm
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-except ImportError:
-    print("⚠️ ReportLab não está instalado. Execute: pip install reportlab")
-    exit(1)
+import queue
+import time
+
+from rodamotriz import (admissao, alteracoes, backup, eventos, faturamento, perfilador, pregeracao,
+                        reservas, telemetria, validacao)
+from rodamotriz.sistema import SistemaRodamotriz
 
 app = Flask(__name__)
 app.secret_key = 'rodamotriz_secret_key_2024'
 
-class SistemaRodamotriz:
-    def __init__(self):
-        # Permitir uso da conexão em threads diferentes (Flask pode servir em threads)
-        self.conn = sqlite3.connect(os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), 'rodamotriz.db'), check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        # Lock para serializar acessos ao cursor/commit
-        self.lock = threading.Lock()
-        self.criar_tabelas()
-
-    def criar_tabelas(self):
-        """Cria as tabelas necessárias no banco de dados"""
-        # Tabela de clientes
-        with self.lock:
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS clientes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    cnpj_cpf TEXT NOT NULL,
-                    endereco TEXT NOT NULL,
-                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Tabela de máquinas
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS maquinas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    marca TEXT NOT NULL,
-                    modelo TEXT NOT NULL,
-                    ano INTEGER NOT NULL,
-                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Tabela de registros de trabalho
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS registros_trabalho (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cliente_id INTEGER NOT NULL,
-                    maquina_id INTEGER NOT NULL,
-                    local_trabalho TEXT NOT NULL,
-                    data_inicio TEXT NOT NULL, 
-                    data_final TEXT NOT NULL,
-                    horimetro_inicial REAL NOT NULL,
-                    horimetro_final REAL NOT NULL,
-                    horas_trabalhadas REAL NOT NULL,
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (cliente_id) REFERENCES clientes(id),
-                    FOREIGN KEY (maquina_id) REFERENCES maquinas(id)
-                )
-            ''')
-
-            self.conn.commit()
-
-    def cadastrar_cliente(self, nome, cnpj_cpf, endereco):
-        """Cadastra um novo cliente no banco de dados"""
-        try:
-            with self.lock:
-                self.cursor.execute('''
-                    INSERT INTO clientes (nome, cnpj_cpf, endereco)
-                    VALUES (?, ?, ?)
-                ''', (nome, cnpj_cpf, endereco))
-                self.conn.commit()
-                return self.cursor.lastrowid
-        except sqlite3.IntegrityError as e:
-            raise Exception(f"Erro de integridade ao cadastrar cliente: {e}")
-        except Exception as e:
-            raise Exception(f"Erro inesperado ao cadastrar cliente: {e}")
-
-    def listar_clientes(self):
-        """Lista todos os clientes cadastrados"""
-        with self.lock:
-            self.cursor.execute(
-                'SELECT id, nome, cnpj_cpf, endereco FROM clientes ORDER BY id')
-            return self.cursor.fetchall()
-
-    def cadastrar_maquina(self, marca, modelo, ano):
-        """Cadastra uma nova máquina no banco de dados"""
-        try:
-            with self.lock:
-                self.cursor.execute('''
-                    INSERT INTO maquinas (marca, modelo, ano)
-                    VALUES (?, ?, ?)
-                ''', (marca, modelo, ano))
-                self.conn.commit()
-                return self.cursor.lastrowid
-        except sqlite3.IntegrityError as e:
-            raise Exception(f"Erro de integridade ao cadastrar máquina: {e}")
-        except Exception as e:
-            raise Exception(f"Erro inesperado ao cadastrar máquina: {e}")
-
-    def listar_maquinas(self):
-        """Lista todas as máquinas cadastradas"""
-        with self.lock:
-            self.cursor.execute(
-                'SELECT id, marca, modelo, ano FROM maquinas ORDER BY id')
-            return self.cursor.fetchall()
-
-    def validar_data(self, data_str):
-        """Valida e converte data no formato dd/mm/yyyy"""
-        try:
-            datetime.strptime(data_str, '%d/%m/%Y')
-            return True
-        except ValueError:
-            return False
-
-    def registrar_trabalho(self, cliente_id, maquina_id, local_trabalho,
-                           data_inicio, data_final, horimetro_inicial, horimetro_final):
-        """Registra um trabalho realizado"""
-        
-        # Validação de Horímetro
-        if horimetro_final <= horimetro_inicial:
-            raise Exception("O horímetro final deve ser maior que o inicial!")
+# CNPJ/CPF é gravado sem pontuação; os templates exibem formatado
+app.jinja_env.filters['documento'] = validacao.formatar_documento
 
-        # Validação de Data
-        if not self.validar_data(data_inicio) or not self.validar_data(data_final):
-            raise Exception("Data inválida! Use o formato dd/mm/yyyy")
-
-        # Validação de Cliente e Máquina
-        with self.lock:
-            self.cursor.execute('SELECT 1 FROM clientes WHERE id = ?', (cliente_id,))
-            if self.cursor.fetchone() is None:
-                raise Exception(f"Cliente com ID {cliente_id} não encontrado.")
-
-            self.cursor.execute('SELECT 1 FROM maquinas WHERE id = ?', (maquina_id,))
-            if self.cursor.fetchone() is None:
-                raise Exception(f"Máquina com ID {maquina_id} não encontrada.")
-
-        # Cálculo
-        horas_trabalhadas = horimetro_final - horimetro_inicial
+# Inicializar sistema
+sistema = SistemaRodamotriz()
 
+# Eventos ao vivo (SSE) do painel e da lista de trabalhos
+difusor = eventos.Difusor(sistema)
+
+# Geração de PDFs com vagas limitadas, fila de espera e taxa por usuário
+limitador_pdf = admissao.Limitador()
+
+# Conexões SSE são renovadas periodicamente (o navegador reconecta sozinho e
+# recupera o que perdeu), para não segurar a reciclagem dos workers
+DURACAO_SSE = 300
+BATIMENTO_SSE = 15
+
+def preaquecer():
+    """Compila os templates e carrega o gerador de PDF antes do fork dos workers"""
+    for nome in app.jinja_env.list_templates():
+        app.jinja_env.get_template(nome)
+    # O renderizador de canvas calcula as coordenadas do layout na importação
+    from rodamotriz import relatorio_canvas, relatorio_pdf  # noqa: F401
+    relatorio_pdf.estilos()
+
+# Rotas /admin exigem o cabeçalho X-Admin-Token igual a RODAMOTRIZ_ADMIN_TOKEN;
+# sem o token configurado elas nem existem (404)
+TOKEN_ADMIN = os.environ.get('RODAMOTRIZ_ADMIN_TOKEN')
+
+# Ingestão de telemetria: as máquinas enviam X-Telemetria-Token igual a
+# RODAMOTRIZ_TELEMETRIA_TOKEN; sem o token configurado a rota não existe (404)
+TOKEN_TELEMETRIA = os.environ.get('RODAMOTRIZ_TELEMETRIA_TOKEN')
+
+def tokens_iguais(recebido, esperado):
+    # Em bytes: com str, compare_digest levanta TypeError para caracteres não ASCII
+    return hmac.compare_digest(recebido.encode(), esperado.encode())
+
+def token_admin_valido(token):
+    return bool(TOKEN_ADMIN) and tokens_iguais(token, TOKEN_ADMIN)
+
+def exigir_admin(rota):
+    @functools.wraps(rota)
+    def verificada(*args, **kwargs):
+        if not TOKEN_ADMIN:
+            abort(404)
+        if not token_admin_valido(request.headers.get('X-Admin-Token', '')):
+            abort(403)
+        return rota(*args, **kwargs)
+    return verificada
+
+# Perfis sob demanda: requisições com X-Perfil: 1 e o token de admin (ou amostradas)
+app.wsgi_app = perfilador.Perfilador(app.wsgi_app, token_admin_valido)
+
+def limitar_pdf(rota):
+    """Só renderiza com vaga no limitador_pdf; saturado, responde 429/503 com Retry-After"""
+    @functools.wraps(rota)
+    def admitida(*args, **kwargs):
+        usuario = admissao.identificar(request.remote_addr, request.headers.get('X-Forwarded-For'))
         try:
-            with self.lock:
-                self.cursor.execute('''
-                    INSERT INTO registros_trabalho 
-                    (cliente_id, maquina_id, local_trabalho, data_inicio, data_final,
-                     horimetro_inicial, horimetro_final, horas_trabalhadas)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (cliente_id, maquina_id, local_trabalho, data_inicio, data_final,
-                      horimetro_inicial, horimetro_final, horas_trabalhadas))
-
-                self.conn.commit()
-                return self.cursor.lastrowid
-        except sqlite3.IntegrityError as e:
-            raise Exception(f"Erro de integridade: {e}")
-        except Exception as e:
-            raise Exception(f"Erro ao registrar trabalho: {e}")
-
-    def listar_trabalhos(self):
-        """Lista todos os registros de trabalho"""
-        with self.lock:
-            self.cursor.execute('''
-                SELECT r.id, c.nome, m.marca, m.modelo, r.local_trabalho, 
-                       r.data_inicio, r.data_final, r.horas_trabalhadas, r.data_registro
-                FROM registros_trabalho r
-                JOIN clientes c ON r.cliente_id = c.id
-                JOIN maquinas m ON r.maquina_id = m.id
-                ORDER BY r.data_registro DESC
-            ''')
-            return self.cursor.fetchall()
-
-    def gerar_relatorio_pdf(self, registro_id):
-        """Gera relatório em PDF do registro de trabalho"""
+            limitador_pdf.adquirir(usuario)
+        except admissao.Recusado as e:
+            return Response(str(e), status=e.status, headers={'Retry-After': str(e.retry_after)},
+                            mimetype='text/plain')
+        inicio = time.monotonic()
         try:
-            # Buscar dados do registro
-            with self.lock:
-                self.cursor.execute('''
-                    SELECT r.id, c.nome, c.cnpj_cpf, c.endereco,
-                           m.marca, m.modelo, m.ano,
-                           r.local_trabalho, r.data_inicio, r.data_final,
-                           r.horimetro_inicial, r.horimetro_final, r.horas_trabalhadas,
-                           r.data_registro
-                    FROM registros_trabalho r
-                    JOIN clientes c ON r.cliente_id = c.id
-                    JOIN maquinas m ON r.maquina_id = m.id
-                    WHERE r.id = ?
-                ''', (registro_id,))
-
-                dados = self.cursor.fetchone()
-
-            if not dados:
-                raise Exception("Registro não encontrado!")
-
-            # Criar diretório para relatórios se não existir
-            caminho_relatorios = os.path.join(os.path.dirname(
-                os.path.abspath(__file__)), 'relatorios')
-            if not os.path.exists(caminho_relatorios):
-                os.makedirs(caminho_relatorios)
-
-            # Nome do arquivo PDF
-            nome_arquivo = f"{caminho_relatorios}/relatorio_{registro_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-
-            # Criar documento PDF
-            doc = SimpleDocTemplate(nome_arquivo, pagesize=A4,
-                                    rightMargin=cm, leftMargin=cm,
-                                    topMargin=cm, bottomMargin=cm)
-            elementos = []
-
-            # Estilos
-            styles = getSampleStyleSheet()
-
-            # Estilo Título
-            estilo_titulo = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=18,
-                textColor=colors.HexColor('#0d47a1'),
-                spaceAfter=12,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold'
-            )
-
-            # Estilo Subtítulo
-            estilo_subtitulo = ParagraphStyle(
-                'CustomSubtitle',
-                parent=styles['Heading2'],
-                fontSize=12,
-                textColor=colors.HexColor('#1976d2'),
-                spaceAfter=16,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold'
-            )
-
-            estilo_cabecalho_tabela = ParagraphStyle(
-                'CabecalhoTabela',
-                parent=styles['Heading3'],
-                fontSize=11,
-                textColor=colors.HexColor('#1a237e'),
-                spaceAfter=6,
-                fontName='Helvetica-Bold'
-            )
-
-            # Cabeçalho
-            elementos.append(
-                Paragraph("RODAMOTRIZ COM. DE MÁQUINAS E PEÇAS LTDA", estilo_titulo))
-            elementos.append(
-                Paragraph("RELATÓRIO DE HORA MÁQUINA TRABALHADA", estilo_subtitulo))
-            elementos.append(Spacer(1, 0.5*cm))
-
-            # Informações do relatório
-            elementos.append(Paragraph(
-                f"<b>Relatório Nº:</b> <font color='#c62828'>{dados[0]:05d}</font>", styles['Normal']))
-            elementos.append(Paragraph(
-                f"<b>Data de Emissão:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-            elementos.append(Spacer(1, 0.5*cm))
-
-            # Dados do Cliente
-            elementos.append(
-                Paragraph("DADOS DO CLIENTE", estilo_cabecalho_tabela))
-            dados_cliente = [
-                ['Nome:', dados[1]],
-                ['CNPJ/CPF:', dados[2]],
-                ['Endereço:', dados[3]]
-            ]
-
-            tabela_cliente = Table(dados_cliente, colWidths=[4*cm, 13*cm])
-            tabela_cliente.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-            ]))
-            elementos.append(tabela_cliente)
-            elementos.append(Spacer(1, 0.5*cm))
-
-            # Dados da Máquina
-            elementos.append(
-                Paragraph("DADOS DA MÁQUINA", estilo_cabecalho_tabela))
-            dados_maquina = [
-                ['Marca:', dados[4]],
-                ['Modelo:', dados[5]],
-                ['Ano:', str(dados[6])]
-            ]
-
-            tabela_maquina = Table(dados_maquina, colWidths=[4*cm, 13*cm])
-            tabela_maquina.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-            ]))
-            elementos.append(tabela_maquina)
-            elementos.append(Spacer(1, 0.5*cm))
-
-            # Dados do Trabalho
-            elementos.append(
-                Paragraph("DADOS DO TRABALHO", estilo_cabecalho_tabela))
-            dados_trabalho = [
-                ['Local de Trabalho:', dados[7]],
-                ['Data Início:', dados[8]],
-                ['Data Final:', dados[9]],
-                ['Horímetro Inicial:', f"{dados[10]:.2f} horas"],
-                ['Horímetro Final:', f"{dados[11]:.2f} horas"]
-            ]
-
-            tabela_trabalho = Table(dados_trabalho, colWidths=[4*cm, 13*cm])
-            tabela_trabalho.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-            ]))
-            elementos.append(tabela_trabalho)
-            elementos.append(Spacer(1, 0.8*cm))
-            # Verificar horas totais acumuladas para o mesmo modelo de máquina e gerar alarmes
-            marca = dados[4]
-            modelo = dados[5]
-            with self.lock:
-                self.cursor.execute('''
-                    SELECT SUM(r.horas_trabalhadas)
-                    FROM registros_trabalho r
-                    JOIN maquinas m ON r.maquina_id = m.id
-                    WHERE m.marca = ? AND m.modelo = ?
-                ''', (marca, modelo))
-                soma = self.cursor.fetchone()
-
-            total_acumulado = float(soma[0]) if soma and soma[0] is not None else float(dados[12])
-
-            # Gerar seção de alarmes (500,1000,1500,2000)
-            thresholds = [500, 1000, 1500, 2000]
-            alarmes_reached = [t for t in thresholds if total_acumulado >= t]
-
-            elementos.append(Paragraph('ALARMES / MANUTENÇÃO (por modelo)', estilo_cabecalho_tabela))
-            alarm_rows = []
-            for t in thresholds:
-                status = 'ATENDIDO' if t in alarmes_reached else 'PENDENTE'
-                alarm_rows.append([f'{t} HORAS', status])
-
-            tabela_alarmes = Table(alarm_rows, colWidths=[11*cm, 6*cm])
-            tabela_alarmes.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), colors.whitesmoke),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 0.3, colors.grey),
-            ]))
-
-            # Destacar em vermelho as linhas atendidas
-            for i, t in enumerate(thresholds):
-                if t in alarmes_reached:
-                    tabela_alarmes.setStyle(TableStyle([
-                        ('BACKGROUND', (0, i), (0, i), colors.HexColor('#ffebee')),
-                        ('TEXTCOLOR', (1, i), (1, i), colors.HexColor('#c62828')),
-                        ('FONTNAME', (0, i), (-1, i), 'Helvetica-Bold')
-                    ]))
-
-            elementos.append(tabela_alarmes)
-            elementos.append(Spacer(1, 0.6*cm))
-
-            # Total de Horas (exibido abaixo dos alarmes)
-            dados_total = [
-                ['TOTAL DE HORAS TRABALHADAS (modelo):', f"{total_acumulado:.2f} HORAS"]
-            ]
-
-            tabela_total = Table(dados_total, colWidths=[11*cm, 6*cm])
-            tabela_total.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#1a237e')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-                ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 14),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 14),
-                ('TOPPADDING', (0, 0), (-1, -1), 14),
-            ]))
-            elementos.append(tabela_total)
-            elementos.append(Spacer(1, 1*cm))
-
-            # Rodapé
-            elementos.append(Spacer(1, 2*cm))
-            assinatura_data = [['', '', '']]
-            tabela_assinatura = Table(
-                assinatura_data, colWidths=[6*cm, 5*cm, 6*cm])
-            tabela_assinatura.setStyle(TableStyle([
-                ('LINEBELOW', (0, 0), (0, 0), 0.5, colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('TOPPADDING', (0, 0), (-1, -1), 0),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 0)
-            ]))
-            elementos.append(tabela_assinatura)
-
-            elementos.append(Paragraph(
-                "Assinatura Autorizada (Rodamotriz)",
-                ParagraphStyle(
-                    'Left', parent=styles['Normal'], alignment=TA_CENTER, spaceBefore=0)
-            ))
-
-            # Construir PDF
-            doc.build(elementos)
-            return nome_arquivo
-
-        except Exception as e:
-            raise Exception(f"Erro ao gerar relatório: {e}")
-
-    def fechar(self):
-        """Fecha a conexão com o banco de dados"""
-        # Fechar com proteção de lock
-        try:
-            with self.lock:
-                self.conn.close()
-        except Exception:
-            # Se não for possível obter o lock, tentar fechar de qualquer forma
-            try:
-                self.conn.close()
-            except Exception:
-                pass
-
-# Inicializar sistema
-sistema = SistemaRodamotriz()
+            return rota(*args, **kwargs)
+        finally:
+            limitador_pdf.liberar(time.monotonic() - inicio)
+    return admitida
+
+def sugestao_cliente(c):
+    """Item do autocompletar de clientes (id, nome, cnpj_cpf)"""
+    return {'id': c[0], 'texto': f'{c[1]} ({validacao.formatar_documento(c[2])})'}
+
+def sugestao_maquina(m):
+    """Item do autocompletar de máquinas (id, marca, modelo, ano)"""
+    return {'id': m[0], 'texto': f'{m[1]} {m[2]} ({m[3]})'}
+
+@app.after_request
+def avisar_difusor(resposta):
+    """Gravações deste processo entram no log; os ouvintes não esperam a próxima consulta"""
+    if request.method == 'POST':
+        difusor.notificar()
+    return resposta
 
 # === ROTAS FLASK ===
 
 @app.route('/')
 def index():
     """Página inicial"""
-    # Buscar estatísticas
-    clientes_count = len(sistema.listar_clientes())
-    maquinas_count = len(sistema.listar_maquinas())
-    trabalhos = sistema.listar_trabalhos()
-    trabalhos_count = len(trabalhos)
-    
-    # Calcular horas totais
-    horas_totais = sum(trabalho[7] for trabalho in trabalhos) if trabalhos else 0
-    
-    return render_template('index.html', 
-                         clientes_count=clientes_count,
-                         maquinas_count=maquinas_count,
-                         trabalhos_count=trabalhos_count,
-                         horas_totais=f"{horas_totais:.1f}")
+    # Contagens e somas calculadas no banco, sem carregar as tabelas
+    totais = sistema.estatisticas()
+    return render_template('index.html',
+                         clientes_count=totais['clientes'],
+                         maquinas_count=totais['maquinas'],
+                         trabalhos_count=totais['trabalhos'],
+                         horas_totais=f"{totais['horas']:.1f}")
 
 @app.route('/clientes')
 def clientes():
@@ -473,13 +118,21 @@ def clientes():
     clientes = sistema.listar_clientes()
     return render_template('clientes.html', clientes=clientes)
 
+@app.route('/clientes/<int:cliente_id>')
+def cliente_detalhe(cliente_id):
+    """Histórico do cliente: totais e registros em páginas (?antes=<id do último registro>)"""
+    try:
+        historico = sistema.historico_cliente(cliente_id, request.args.get('antes', type=int))
+    except Exception as e:
+        flash(str(e), 'error')
+        return redirect(url_for('clientes'))
+    return render_template('cliente.html', **historico)
+
 # Rota para deletar cliente
 @app.route('/deletar_cliente/<int:cliente_id>', methods=['POST'])
 def deletar_cliente(cliente_id):
     try:
-        with sistema.lock:
-            sistema.cursor.execute('DELETE FROM clientes WHERE id = ?', (cliente_id,))
-            sistema.conn.commit()
+        sistema.deletar_cliente(cliente_id)
         flash(f'Cliente {cliente_id} removido com sucesso.', 'success')
     except Exception as e:
         flash(f'Erro ao remover cliente: {e}', 'error')
@@ -494,7 +147,7 @@ def cadastrar_cliente():
             cnpj_cpf = request.form['cnpj_cpf']
             endereco = request.form['endereco']
             
-            if not nome or not cnpj_cpf or not endereco:
+            if not validacao.campos_preenchidos(nome, cnpj_cpf, endereco):
                 flash('Todos os campos são obrigatórios!', 'error')
             else:
                 sistema.cadastrar_cliente(nome, cnpj_cpf, endereco)
@@ -511,13 +164,21 @@ def maquinas():
     maquinas = sistema.listar_maquinas()
     return render_template('maquinas.html', maquinas=maquinas)
 
+@app.route('/maquinas/<int:maquina_id>')
+def maquina_detalhe(maquina_id):
+    """Histórico da máquina: totais, horímetro, manutenção e registros em páginas"""
+    try:
+        historico = sistema.historico_maquina(maquina_id, request.args.get('antes', type=int))
+    except Exception as e:
+        flash(str(e), 'error')
+        return redirect(url_for('maquinas'))
+    return render_template('maquina.html', **historico)
+
 # Rota para deletar máquina
 @app.route('/deletar_maquina/<int:maquina_id>', methods=['POST'])
 def deletar_maquina(maquina_id):
     try:
-        with sistema.lock:
-            sistema.cursor.execute('DELETE FROM maquinas WHERE id = ?', (maquina_id,))
-            sistema.conn.commit()
+        sistema.deletar_maquina(maquina_id)
         flash(f'Máquina {maquina_id} removida com sucesso.', 'success')
     except Exception as e:
         flash(f'Erro ao remover máquina: {e}', 'error')
@@ -534,7 +195,7 @@ def cadastrar_maquina():
             
             if not marca or not modelo:
                 flash('Todos os campos são obrigatórios!', 'error')
-            elif ano < 1900 or ano > date.today().year + 1:
+            elif not validacao.validar_ano(ano):
                 flash('Ano inválido!', 'error')
             else:
                 sistema.cadastrar_maquina(marca, modelo, ano)
@@ -551,8 +212,15 @@ def cadastrar_maquina():
 @app.route('/trabalhos')
 def trabalhos():
     """Lista de trabalhos"""
-    trabalhos = sistema.listar_trabalhos()
-    return render_template('trabalhos.html', trabalhos=trabalhos)
+    # Período opcional (yyyy-mm-dd); anos arquivados só entram quando o período os cobre
+    try:
+        desde = date.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+        ate = date.fromisoformat(request.args['ate']) if request.args.get('ate') else None
+    except ValueError:
+        flash('Período inválido!', 'error')
+        desde = ate = None
+    trabalhos = sistema.listar_trabalhos(desde, ate)
+    return render_template('trabalhos.html', trabalhos=trabalhos, desde=desde, ate=ate)
 
 @app.route('/registrar_trabalho', methods=['GET', 'POST'])
 def registrar_trabalho():
@@ -580,16 +248,368 @@ def registrar_trabalho():
         except Exception as e:
             flash(f'Erro ao registrar trabalho: {str(e)}', 'error')
     
-    # Buscar clientes e máquinas para o formulário
-    clientes = sistema.listar_clientes()
-    maquinas = sistema.listar_maquinas()
-    return render_template('registrar_trabalho.html', clientes=clientes, maquinas=maquinas)
+    # Clientes e máquinas são buscados sob demanda pelo formulário (/api/clientes, /api/maquinas)
+    return render_template('registrar_trabalho.html')
+
+@app.route('/trabalhos/<int:registro_id>/editar', methods=['GET', 'POST'])
+def editar_trabalho(registro_id):
+    """Correção de um registro de trabalho (horas recalculadas, PDFs antigos apagados)"""
+    if request.method == 'POST':
+        try:
+            resumo = sistema.editar_trabalho(
+                registro_id,
+                cliente_id=int(request.form['cliente_id']),
+                maquina_id=int(request.form['maquina_id']),
+                local_trabalho=request.form['local_trabalho'],
+                data_inicio=request.form['data_inicio'],
+                data_final=request.form['data_final'],
+                horimetro_inicial=float(request.form['horimetro_inicial']),
+                horimetro_final=float(request.form['horimetro_final']),
+            )
+            flash(f"Registro {registro_id} atualizado: {resumo['horas_antes']:.2f} → "
+                  f"{resumo['horas']:.2f} horas.", 'success')
+            return redirect(url_for('trabalhos'))
+        except ValueError:
+            flash('Valores inválidos! Verifique os dados inseridos.', 'error')
+        except Exception as e:
+            flash(f'Erro ao editar trabalho: {str(e)}', 'error')
+
+    try:
+        registro = sistema.registro_trabalho(registro_id)
+    except Exception as e:
+        flash(str(e), 'error')
+        return redirect(url_for('trabalhos'))
+    # Após um erro, o formulário volta com o que foi digitado
+    registro.update(request.form.items())
+    return render_template('editar_trabalho.html', registro_id=registro_id, registro=registro)
+
+def _mes(texto):
+    """Primeiro e último dia do mês AAAA-MM (padrão: mês atual)"""
+    inicio = date.fromisoformat(f'{texto}-01') if texto else date.today().replace(day=1)
+    proximo = (inicio + timedelta(days=31)).replace(day=1)
+    return inicio, proximo - timedelta(days=1)
+
+@app.route('/reservas')
+def reservas_calendario():
+    """Calendário do mês: uma linha por máquina reservada, uma coluna por dia"""
+    try:
+        inicio, fim = _mes(request.args.get('mes'))
+    except ValueError:
+        flash('Mês inválido!', 'error')
+        inicio, fim = _mes(None)
+    dias = [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+
+    # Cada máquina vira uma sequência de trechos (dias, reserva ou None) cobrindo o mês
+    linhas = {}
+    for reserva in sistema.listar_reservas(inicio, fim):
+        maquina, trechos, proximo = linhas.setdefault(reserva[1], [reserva[2], [], inicio])
+        de = max(date.fromisoformat(reserva[6]), inicio)
+        ate = min(date.fromisoformat(reserva[7]), fim)
+        if de > proximo:
+            trechos.append(((de - proximo).days, None))
+        trechos.append(((ate - de).days + 1, reserva))
+        linhas[reserva[1]][2] = ate + timedelta(days=1)
+    for maquina, trechos, proximo in linhas.values():
+        if proximo <= fim:
+            trechos.append(((fim - proximo).days + 1, None))
+
+    return render_template('reservas.html', dias=dias, linhas=list(linhas.values()),
+                           mes=inicio.strftime('%Y-%m'),
+                           anterior=(inicio - timedelta(days=1)).strftime('%Y-%m'),
+                           seguinte=(fim + timedelta(days=1)).strftime('%Y-%m'))
+
+@app.route('/reservas', methods=['POST'])
+def reservar():
+    """Nova reserva de máquina"""
+    try:
+        inicio = date.fromisoformat(request.form['inicio'])
+        reserva_id = sistema.reservar_maquina(
+            int(request.form['maquina_id']), int(request.form['cliente_id']),
+            request.form['local_trabalho'], inicio, date.fromisoformat(request.form['fim']))
+        flash(f'Reserva {reserva_id} registrada com sucesso!', 'success')
+        return redirect(url_for('reservas_calendario', mes=inicio.strftime('%Y-%m')))
+    except (KeyError, ValueError):
+        flash('Valores inválidos! Verifique os dados inseridos.', 'error')
+    except Exception as e:
+        flash(f'Erro ao reservar: {str(e)}', 'error')
+    return redirect(url_for('reservas_calendario'))
+
+@app.route('/reservas/<int:reserva_id>/cancelar', methods=['POST'])
+def cancelar_reserva(reserva_id):
+    try:
+        sistema.cancelar_reserva(reserva_id)
+        flash(f'Reserva {reserva_id} cancelada.', 'success')
+    except Exception as e:
+        flash(f'Erro ao cancelar reserva: {str(e)}', 'error')
+    return redirect(request.referrer or url_for('reservas_calendario'))
+
+def _periodo_api():
+    """Período de/ate (AAAA-MM-DD) dos parâmetros da requisição"""
+    return date.fromisoformat(request.args['de']), date.fromisoformat(request.args['ate'])
+
+@app.route('/api/reservas')
+def api_reservas():
+    """Reservas que tocam o período ?de=AAAA-MM-DD&ate=AAAA-MM-DD (opcional: maquina_id)"""
+    try:
+        inicio, fim = _periodo_api()
+        maquina_id = int(request.args['maquina_id']) if request.args.get('maquina_id') else None
+        linhas = sistema.listar_reservas(inicio, fim, maquina_id)
+    except (KeyError, ValueError):
+        return jsonify({'erro': 'Informe de e ate no formato AAAA-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 400
+    return jsonify([dict(zip(reservas.COLUNAS, linha)) for linha in linhas])
+
+@app.route('/api/reservas/livres')
+def api_maquinas_livres():
+    """Máquinas sem reserva no período ?de=AAAA-MM-DD&ate=AAAA-MM-DD"""
+    try:
+        inicio, fim = _periodo_api()
+        maquinas = sistema.maquinas_livres(inicio, fim)
+    except (KeyError, ValueError):
+        return jsonify({'erro': 'Informe de e ate no formato AAAA-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 400
+    return jsonify([sugestao_maquina(m) for m in maquinas])
+
+@app.route('/locais')
+def locais():
+    """Horas trabalhadas por local (registros ativos)"""
+    return render_template('locais.html', locais=sistema.horas_por_local())
+
+@app.route('/faturas')
+def faturas():
+    """Faturas geradas, opcionalmente de uma competência (AAAA-MM)"""
+    competencia = request.args.get('competencia') or None
+    faturas = sistema.listar_faturas(competencia)
+    return render_template('faturas.html', faturas=faturas, competencia=competencia,
+                           moeda=faturamento.moeda)
+
+@app.route('/faturas/gerar', methods=['POST'])
+def gerar_faturas():
+    """Calcula (ou recalcula) as faturas do mês informado"""
+    competencia = request.form.get('competencia', '')
+    try:
+        resumo = sistema.faturar_mes(competencia)
+        flash(f"{resumo['faturas']} fatura(s) de {competencia} geradas: "
+              f"{faturamento.moeda(resumo['valor'])}", 'success')
+        if resumo['sem_contrato']:
+            horas = sum(h for _, _, h in resumo['sem_contrato'])
+            flash(f"{horas:.2f} hora(s) sem contrato vigente não foram faturadas.", 'error')
+    except Exception as e:
+        flash(f'Erro ao gerar faturas: {str(e)}', 'error')
+    return redirect(url_for('faturas', competencia=competencia or None))
+
+@app.route('/faturas/<int:fatura_id>/pdf')
+def fatura_pdf(fatura_id):
+    """Demonstrativo em PDF da fatura (o pré-gerado, se houver)"""
+    pronto = pregeracao.fatura_pronta(fatura_id)
+    if pronto:
+        try:
+            return send_file(pronto, as_attachment=True, download_name=os.path.basename(pronto))
+        except FileNotFoundError:
+            # Apagado ao faturar o mês de novo: gera na hora
+            pass
+    return _renderizar_fatura_pdf(fatura_id)
+
+@limitar_pdf
+def _renderizar_fatura_pdf(fatura_id):
+    try:
+        arquivo_pdf = sistema.gerar_fatura_pdf(fatura_id)
+        return send_file(arquivo_pdf, as_attachment=True, download_name=os.path.basename(arquivo_pdf))
+    except Exception as e:
+        flash(f'Erro ao gerar PDF: {str(e)}', 'error')
+        return redirect(url_for('faturas'))
+
+@app.route('/api/clientes')
+def api_clientes():
+    """Autocompletar de clientes por prefixo do nome ou CNPJ/CPF"""
+    try:
+        clientes = sistema.buscar_clientes(request.args.get('q', ''), request.args.get('limite', 10))
+    except ValueError:
+        return jsonify({'erro': 'Limite inválido'}), 400
+    return jsonify([sugestao_cliente(c) for c in clientes])
+
+@app.route('/api/maquinas')
+def api_maquinas():
+    """Autocompletar de máquinas por prefixo da marca ou modelo"""
+    try:
+        maquinas = sistema.buscar_maquinas(request.args.get('q', ''), request.args.get('limite', 10))
+    except ValueError:
+        return jsonify({'erro': 'Limite inválido'}), 400
+    return jsonify([sugestao_maquina(m) for m in maquinas])
+
+@app.route('/changes')
+def changes():
+    """Alterações desde o seq informado, para sincronização incremental de dispositivos"""
+    # Sem since: cópia completa dos cadastros (primeira sincronização ou log podado)
+    if 'since' not in request.args:
+        return jsonify(sistema.copia_completa())
+
+    try:
+        desde = int(request.args['since'])
+        limite = int(request.args.get('limite', alteracoes.LIMITE_PADRAO))
+    except ValueError:
+        return jsonify({'erro': 'Parâmetros inválidos'}), 400
+    if desde < 0:
+        return jsonify({'erro': 'since deve ser maior ou igual a zero'}), 400
+
+    try:
+        return jsonify(sistema.alteracoes_desde(desde, limite))
+    except alteracoes.LogTruncado as e:
+        # O dispositivo deve recomeçar com uma cópia completa (GET /changes sem since)
+        return jsonify({'erro': str(e)}), 410
+
+def _evento_sse(seq, nome, dados):
+    return f'id: {seq}\nevent: {nome}\ndata: {json.dumps(dados)}\n\n'
+
+@app.route('/eventos')
+def eventos_ao_vivo():
+    """Stream SSE com trabalhos incluídos/removidos e totais atualizados"""
+    inscricao = difusor.inscrever()
+    if inscricao is None:
+        return Response('Limite de conexões ao vivo atingido', status=503,
+                        headers={'Retry-After': '30'}, mimetype='text/plain')
+    fila, inicio = inscricao
+    ultimo_id = request.headers.get('Last-Event-ID', '')
+
+    def gerar():
+        try:
+            yield 'retry: 5000\n\n'
+            visto = inicio
+            if ultimo_id.isdigit():
+                # Reconexão: envia o que mudou desde o último evento recebido
+                try:
+                    atrasados, visto = eventos.montar_eventos(sistema, int(ultimo_id))
+                except alteracoes.LogTruncado:
+                    atrasados = [(inicio, 'recarregar', {})]
+                for evento in atrasados:
+                    yield _evento_sse(*evento)
+            else:
+                yield _evento_sse(inicio, 'totais', sistema.estatisticas())
+
+            fim = time.monotonic() + DURACAO_SSE
+            while time.monotonic() < fim:
+                try:
+                    evento = fila.get(timeout=BATIMENTO_SSE)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                if evento is None:
+                    return
+                # Já enviado na recuperação da reconexão
+                if evento[0] <= visto:
+                    continue
+                yield _evento_sse(*evento)
+        finally:
+            difusor.cancelar(fila)
+
+    return Response(gerar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/telemetria/leituras', methods=['POST'])
+def telemetria_leituras():
+    """Recebe lotes de leituras: [{"maquina_id": N, "leituras": [[instante, horimetro], ...]}]"""
+    if not TOKEN_TELEMETRIA:
+        abort(404)
+    if not tokens_iguais(request.headers.get('X-Telemetria-Token', ''), TOKEN_TELEMETRIA):
+        abort(403)
+    lotes = request.get_json(silent=True)
+    if isinstance(lotes, dict):
+        lotes = [lotes]
+    if not isinstance(lotes, list):
+        return jsonify({'erro': 'Envie um JSON com maquina_id e leituras'}), 400
+    total = sum(len(l['leituras']) for l in lotes
+                if isinstance(l, dict) and isinstance(l.get('leituras'), list))
+    if total > telemetria.MAX_LEITURAS_LOTE:
+        return jsonify({'erro': f'Máximo de {telemetria.MAX_LEITURAS_LOTE} leituras por envio'}), 413
+    try:
+        recebidas, novas = sistema.ingerir_leituras(lotes)
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 400
+    return jsonify({'recebidas': recebidas, 'novas': novas})
+
+@app.route('/api/telemetria/horimetro')
+def telemetria_horimetro():
+    """Horímetro inicial/final da máquina no período, para preencher o registro de trabalho"""
+    try:
+        maquina_id = int(request.args['maquina_id'])
+        medido = sistema.horimetros_telemetria(maquina_id, request.args['data_inicio'],
+                                               request.args['data_final'])
+    except (KeyError, ValueError):
+        return jsonify({'erro': 'Informe maquina_id, data_inicio e data_final'}), 400
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 400
+    if medido is None:
+        return jsonify({'erro': 'Sem leituras da máquina no período'}), 404
+    return jsonify(medido)
+
+@app.route('/api/telemetria/conferir/<int:registro_id>')
+def telemetria_conferir(registro_id):
+    """Compara os horímetros digitados no registro com os da telemetria"""
+    try:
+        return jsonify(sistema.conferir_trabalho_telemetria(registro_id))
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 404
+
+@app.route('/admin/backup')
+@exigir_admin
+def admin_backup():
+    """Último backup (início, duração, tamanho) e quantidade de cópias guardadas"""
+    if sistema.banco.tipo != 'sqlite':
+        return jsonify({'erro': 'Backups pelo sistema só existem com o backend SQLite (use pg_dump)'}), 404
+    return jsonify(backup.status())
+
+@app.route('/admin/pdf')
+@exigir_admin
+def admin_pdf():
+    """Vagas, fila e recusas da geração de PDFs neste processo e a última pré-geração"""
+    return jsonify(dict(limitador_pdf.metricas(), pregeracao=pregeracao.ultimo_resumo()))
+
+@app.route('/admin/perfis')
+@exigir_admin
+def admin_perfis():
+    """Perfis de requisição guardados, do mais recente ao mais antigo"""
+    return render_template('admin_perfis.html', perfis=perfilador.listar())
+
+@app.route('/admin/perfis/<nome>')
+@exigir_admin
+def admin_perfil(nome):
+    """Funções mais custosas do perfil (?ordem=cumulative|tottime|calls)"""
+    ordem = request.args.get('ordem', 'cumulative')
+    if ordem not in ('cumulative', 'tottime', 'calls'):
+        abort(400)
+    try:
+        return Response(perfilador.resumo(nome, ordem=ordem), mimetype='text/plain')
+    except Exception:
+        abort(404)
+
+@app.route('/admin/perfis/<nome>.prof')
+@exigir_admin
+def admin_perfil_arquivo(nome):
+    """Perfil no formato do pstats (snakeviz, flameprof, python -m pstats)"""
+    try:
+        return send_file(perfilador.caminho(nome), as_attachment=True, download_name=f'{nome}.prof')
+    except Exception:
+        abort(404)
 
 @app.route('/gerar_pdf/<int:registro_id>')
 def gerar_pdf(registro_id):
-    """Gera PDF do registro"""
+    """PDF do registro: o pré-gerado ainda válido ou um novo (?renderizador=canvas força um novo)"""
+    # Arquivo pronto não ocupa vaga do limitador de PDFs (ver pregeracao.py)
+    pronto = None if request.args.get('renderizador') else pregeracao.relatorio_pronto(registro_id)
+    if pronto:
+        try:
+            return send_file(pronto, as_attachment=True, download_name=f'relatorio_{registro_id}.pdf')
+        except FileNotFoundError:
+            # Apagado por uma correção do registro: gera na hora
+            pass
+    return _renderizar_pdf(registro_id)
+
+@limitar_pdf
+def _renderizar_pdf(registro_id):
     try:
-        arquivo_pdf = sistema.gerar_relatorio_pdf(registro_id)
+        arquivo_pdf = sistema.gerar_relatorio_pdf(registro_id, request.args.get('renderizador'))
         return send_file(arquivo_pdf, as_attachment=True, 
                        download_name=f'relatorio_{registro_id}.pdf')
     except Exception as e:
@@ -600,29 +620,17 @@ def gerar_pdf(registro_id):
 @app.route('/deletar_relatorio/<int:registro_id>', methods=['POST'])
 def deletar_relatorio(registro_id):
     """Deleta o arquivo PDF gerado para o registro informado"""
-    import glob
-    import os
-    caminho_relatorios = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'relatorios')
-    # Busca todos arquivos de relatório para o registro
-    padrao = os.path.join(caminho_relatorios, f'relatorio_{registro_id}_*.pdf')
-    arquivos = glob.glob(padrao)
-    if not arquivos:
+    deletados, erros = sistema.deletar_relatorios_pdf(registro_id)
+    for erro in erros:
+        flash(f'Erro ao deletar {erro}', 'error')
+    if not deletados and not erros:
         flash(f'Nenhum relatório PDF encontrado para o registro {registro_id}.', 'error')
     else:
-        deletados = 0
-        for arq in arquivos:
-            try:
-                os.remove(arq)
-                deletados += 1
-            except Exception as e:
-                flash(f'Erro ao deletar {arq}: {e}', 'error')
         flash(f'{deletados} relatório(s) PDF deletado(s) para o registro {registro_id}.', 'success')
 
     # Remover o registro de trabalho do banco de dados
     try:
-        with sistema.lock:
-            sistema.cursor.execute('DELETE FROM registros_trabalho WHERE id = ?', (registro_id,))
-            sistema.conn.commit()
+        sistema.deletar_registro(registro_id)
         flash(f'Registro de trabalho {registro_id} removido do sistema.', 'success')
     except Exception as e:
         flash(f'Erro ao remover registro do banco: {e}', 'error')
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark do modo assíncrono (uvicorn app_asgi) contra o gunicorn
+
+Sobre um banco temporário populado com dados de exemplo, sobe cada servidor,
+abre N conexões SSE em /eventos (supervisores com o painel aberto) e, com elas
+abertas, dispara requisições concorrentes numa rota comum (por padrão o
+autocompletar de clientes). Mede quantos ouvintes cada servidor aceitou e a
+vazão e latências (p50/p95) das demais requisições enquanto eles esperam.
+
+Uso: python benchmark_asgi.py [--ouvintes N] [--duracao S] [--clientes N] [--rota /api/clientes?q=Cliente+1]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+
+from benchmark_workers import DIRETORIO, aguardar_porta, gerar_carga, popular_banco, porta_livre
+
+GUNICORN = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '127.0.0.1:{porta}', 'app_web:app']
+UVICORN = [sys.executable, '-m', 'uvicorn', '--port', '{porta}', '--log-level', 'warning', 'app_asgi:app']
+
+# (nome, comando, variáveis de ambiente)
+CONFIGURACOES = [
+    ('gunicorn sync, 2xCPU+1 workers', GUNICORN, {'GUNICORN_WORKER_CLASS': 'sync'}),
+    ('gunicorn gthread, 2xCPU+1 x 4 threads', GUNICORN, {'GUNICORN_WORKER_CLASS': 'gthread'}),
+    ('uvicorn app_asgi, 1 processo', UVICORN, {}),
+]
+
+
+def abrir_ouvintes(porta, quantidade, timeout=3):
+    """Abre conexões SSE em paralelo; retorna (sockets aceitos, recusados, sem resposta)"""
+    aceitos, recusados, sem_resposta = [], [0], [0]
+    trava = threading.Lock()
+
+    def ouvinte():
+        conexao = socket.create_connection(('127.0.0.1', porta))
+        conexao.settimeout(timeout)
+        conexao.sendall(b'GET /eventos HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n')
+        try:
+            status = conexao.recv(64).split(b' ')[1]
+        except (OSError, IndexError):
+            conexao.close()
+            with trava:
+                sem_resposta[0] += 1
+            return
+        with trava:
+            if status == b'200':
+                aceitos.append(conexao)
+            else:
+                recusados[0] += 1
+                conexao.close()
+
+    threads = [threading.Thread(target=ouvinte) for _ in range(quantidade)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return aceitos, recusados[0], sem_resposta[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ouvintes', type=int, default=50, help='conexões SSE abertas durante a carga')
+    parser.add_argument('--duracao', type=float, default=10, help='segundos de carga por configuração')
+    parser.add_argument('--clientes', type=int, default=16, help='requisições simultâneas')
+    parser.add_argument('--rota', default='/api/clientes?q=Cliente+1', help='rota exercitada')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        banco = os.path.join(temporario, 'benchmark.db')
+        popular_banco(banco)
+
+        print("=" * 100)
+        print(f"GET {args.rota} COM {args.ouvintes} OUVINTES SSE ABERTOS".center(100))
+        print("=" * 100)
+        print(f"{os.cpu_count()} CPUs, {args.clientes} clientes simultâneos, {args.duracao:.0f}s por configuração\n")
+        print(f"{'CONFIGURAÇÃO':<40} {'SSE OK':>7} {'503':>5} {'S/RESP':>7} "
+              f"{'REQ/S':>9} {'P50 (ms)':>9} {'P95 (ms)':>9} {'ERROS':>6}")
+        print("-" * 100)
+
+        for nome, comando, variaveis in CONFIGURACOES:
+            porta = porta_livre()
+            ambiente = dict(os.environ, RODAMOTRIZ_DB=banco, PORT=str(porta), **variaveis)
+            processo = subprocess.Popen(
+                [parte.format(porta=porta) for parte in comando],
+                cwd=DIRETORIO, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            ouvintes = []
+            try:
+                if not aguardar_porta(porta):
+                    print(f"{nome:<40} ❌ servidor não iniciou")
+                    continue
+                # Aquecimento rápido antes da medição
+                gerar_carga(porta, args.rota, 2, 1)
+                ouvintes, recusados, sem_resposta = abrir_ouvintes(porta, args.ouvintes)
+                latencias, erros = gerar_carga(porta, args.rota, args.clientes, args.duracao, timeout=5)
+                colunas = f"{nome:<40} {len(ouvintes):>7} {recusados:>5} {sem_resposta:>7}"
+                if not latencias:
+                    print(f"{colunas}  ❌ nenhuma requisição concluída ({erros} erros)")
+                    continue
+                latencias.sort()
+                p95 = latencias[int(len(latencias) * 0.95) - 1]
+                print(f"{colunas} {len(latencias) / args.duracao:>9.1f} "
+                      f"{statistics.median(latencias) * 1000:>9.1f} {p95 * 1000:>9.1f} {erros:>6}")
+            finally:
+                for conexao in ouvintes:
+                    conexao.close()
+                processo.terminate()
+                processo.wait()
+
+        print("=" * 100)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicialização a frio do CLI e da aplicação web Rodamotriz
+
+Cada cenário roda em um interpretador novo (como um worker do gunicorn ou
+uma nova execução do CLI). Além do tempo total, uma execução com
+`python -X importtime` lista os módulos mais pesados importados.
+
+Uso: python benchmark_inicializacao.py [--repeticoes N] [--top N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Cada cenário imprime o próprio tempo decorrido (em segundos) na última linha
+CENARIOS = {
+    'CLI (import app + conexão)': (
+        "import time; t = time.perf_counter()\n"
+        "import app\n"
+        "app.SistemaRodamotriz().fechar()\n"
+        "print(time.perf_counter() - t)"
+    ),
+    'Flask (import app_web)': (
+        "import time; t = time.perf_counter()\n"
+        "import app_web\n"
+        "print(time.perf_counter() - t)"
+    ),
+    'Primeira requisição (GET /)': (
+        "import time; t = time.perf_counter()\n"
+        "import app_web\n"
+        "resposta = app_web.app.test_client().get('/')\n"
+        "assert resposta.status_code == 200, resposta.status_code\n"
+        "print(time.perf_counter() - t)"
+    ),
+}
+
+
+def executar(codigo, importtime=False):
+    """Roda o código em um interpretador novo e retorna (segundos, stderr)"""
+    comando = [sys.executable]
+    if importtime:
+        comando += ['-X', 'importtime']
+    comando += ['-c', codigo]
+    resultado = subprocess.run(comando, cwd=DIRETORIO, capture_output=True, text=True)
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1])
+    return float(resultado.stdout.strip().splitlines()[-1]), resultado.stderr
+
+
+def modulos_mais_pesados(stderr, top):
+    """Extrai da saída do -X importtime os módulos (até um nível de aninhamento) mais pesados"""
+    modulos = []
+    for linha in stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, _, resto = linha.partition(':')
+        partes = resto.split('|')
+        if len(partes) != 3:
+            continue
+        nome = partes[2].rstrip()
+        # Cada nível de aninhamento acrescenta dois espaços antes do nome
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        if nivel > 1:
+            continue
+        modulos.append((int(partes[1]), nome.strip()))
+    modulos.sort(reverse=True)
+    return modulos[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5,
+                        help='execuções a frio por cenário (padrão: 5)')
+    parser.add_argument('--top', type=int, default=8,
+                        help='quantos módulos mostrar no detalhamento (padrão: 8)')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("BENCHMARK DE INICIALIZAÇÃO A FRIO".center(80))
+    print("=" * 80)
+    print(f"Python {sys.version.split()[0]} - {args.repeticoes} execução(ões) por cenário\n")
+
+    for nome, codigo in CENARIOS.items():
+        try:
+            tempos = [executar(codigo)[0] for _ in range(args.repeticoes)]
+            inicio = time.perf_counter()
+            _, importtime = executar(codigo, importtime=True)
+            processo = time.perf_counter() - inicio
+        except RuntimeError as e:
+            print(f"❌ {nome}: {e}\n")
+            continue
+
+        print(f"{nome}")
+        print(f"  mínimo: {min(tempos) * 1000:8.1f} ms   "
+              f"mediana: {statistics.median(tempos) * 1000:8.1f} ms   "
+              f"processo completo: {processo * 1000:8.1f} ms")
+        carregou_reportlab = any('reportlab' in linha for linha in importtime.splitlines())
+        print(f"  ReportLab carregado: {'sim' if carregou_reportlab else 'não'}")
+        for micro, modulo in modulos_mais_pesados(importtime, args.top):
+            print(f"    {micro / 1000:8.1f} ms  {modulo}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos renderizadores do relatório de trabalho (platypus x canvas)
+
+Mede relatórios/s de cada renderizador em duas situações:
+
+- só o desenho: o mesmo registro renderizado N vezes, sem banco;
+- lote completo: python app.py relatorio gerar sobre um banco temporário com
+  vários registros (consultas, alarmes e gravação dos arquivos), em processos.
+
+Uso: python benchmark_relatorios.py [--relatorios N] [--registros N] [--processos P]
+"""
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_workers import DIRETORIO, popular_banco
+from rodamotriz.sistema import RENDERIZADORES
+
+DADOS = (123, 'Construtora Exemplo Ltda', '12.345.678/0001-90', 'Rua das Obras, 100 - Centro',
+         'Caterpillar', '320D', 2018, 'Obra Rodovia BR-101', '01/03/2026', '05/03/2026',
+         1520.5, 1560.25, 39.75, '2026-03-05 18:00:00')
+
+
+def medir_desenho(renderizador, quantidade, diretorio):
+    """Relatórios/s renderizando sempre o mesmo registro"""
+    modulo = importlib.import_module(RENDERIZADORES[renderizador])
+    # Primeiro relatório fora da medição (estilos, fontes, layout)
+    modulo.gerar_pdf(os.path.join(diretorio, 'aquecimento.pdf'), DADOS, 1200.0)
+    inicio = time.perf_counter()
+    for i in range(quantidade):
+        modulo.gerar_pdf(os.path.join(diretorio, f'{renderizador}_{i}.pdf'), DADOS, 1200.0)
+    return quantidade / (time.perf_counter() - inicio)
+
+
+def medir_lote(renderizador, banco, processos, diretorio):
+    """(relatórios gerados, relatórios/s) do comando de lote do CLI"""
+    ambiente = dict(os.environ, RODAMOTRIZ_DB=banco, RODAMOTRIZ_RELATORIOS=diretorio)
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, 'app.py', 'relatorio', 'gerar', '--desde', '2026-03-01',
+                    '--ate', '2026-03-31', '--processos', str(processos), '--renderizador', renderizador],
+                   cwd=DIRETORIO, env=ambiente, stdout=subprocess.DEVNULL, check=True)
+    duracao = time.perf_counter() - inicio
+    gerados = len(os.listdir(diretorio))
+    return gerados, gerados / duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--relatorios', type=int, default=200, help='relatórios na medição só do desenho')
+    parser.add_argument('--registros', type=int, default=1000, help='registros do lote completo')
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        banco = os.path.join(temporario, 'benchmark.db')
+        popular_banco(banco, registros=args.registros)
+        from rodamotriz.sistema import RENDERIZADORES
+
+        print("=" * 76)
+        print("RENDERIZADORES DO RELATÓRIO DE TRABALHO".center(76))
+        print("=" * 76)
+        print(f"{os.cpu_count()} CPUs; lote de {args.registros} registros em {args.processos} processo(s)\n")
+        print(f"{'RENDERIZADOR':<14} {'DESENHO (PDF/s)':>18} {'LOTE (PDF/s)':>16} {'GERADOS':>10}")
+        print("-" * 76)
+        resultados = {}
+        for renderizador in RENDERIZADORES:
+            desenho_dir = os.path.join(temporario, f'desenho_{renderizador}')
+            lote_dir = os.path.join(temporario, f'lote_{renderizador}')
+            os.makedirs(desenho_dir)
+            os.makedirs(lote_dir)
+            desenho = medir_desenho(renderizador, args.relatorios, desenho_dir)
+            gerados, lote = medir_lote(renderizador, banco, args.processos, lote_dir)
+            resultados[renderizador] = (desenho, lote)
+            print(f"{renderizador:<14} {desenho:>18.1f} {lote:>16.1f} {gerados:>10}")
+
+        if {'platypus', 'canvas'} <= set(resultados):
+            (d_plat, l_plat), (d_canvas, l_canvas) = resultados['platypus'], resultados['canvas']
+            print(f"\ncanvas/platypus: {d_canvas / d_plat:.1f}x no desenho, {l_canvas / l_plat:.1f}x no lote")
+        print("=" * 76)
+
+
+if __name__ == '__main__':
+    main()
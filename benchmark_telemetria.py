@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark da ingestão de leituras de horímetro (telemetria)
+
+Sobre um banco temporário com algumas máquinas, envia lotes de leituras a
+cada N segundos por máquina, como fariam os equipamentos, e mede leituras/s
+gravadas direto pelo sistema e pela rota POST /api/telemetria/leituras. No
+fim, confere a consulta de horímetro de um período pelo resumo por hora.
+
+Uso: python benchmark_telemetria.py [--maquinas N] [--dias D] [--intervalo S] [--lote L]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def gerar_lotes(maquinas, dias, intervalo, lote, inicio):
+    """Lotes [{'maquina_id', 'leituras'}] com o horímetro de cada máquina avançando"""
+    lotes = []
+    for maquina_id in range(1, maquinas + 1):
+        instantes = range(inicio, inicio + dias * 86400, intervalo)
+        # Horímetro = horas desde a época, mais um deslocamento por máquina
+        leituras = [[t, round(1000 * maquina_id + t / 3600, 3)] for t in instantes]
+        for i in range(0, len(leituras), lote):
+            lotes.append({'maquina_id': maquina_id, 'leituras': leituras[i:i + lote]})
+    return lotes
+
+
+def medir(nome, enviar, lotes):
+    inicio = time.perf_counter()
+    total = 0
+    for lote in lotes:
+        total += enviar(lote)
+    duracao = time.perf_counter() - inicio
+    print(f"{nome:<38} {total:>10} {duracao:>10.2f} {total / duracao:>14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--maquinas', type=int, default=10)
+    parser.add_argument('--dias', type=int, default=7, help='dias de leituras por máquina')
+    parser.add_argument('--intervalo', type=int, default=60, help='segundos entre leituras')
+    parser.add_argument('--lote', type=int, default=1000, help='leituras por envio')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        os.environ['RODAMOTRIZ_DB'] = os.path.join(temporario, 'benchmark.db')
+        os.environ['RODAMOTRIZ_TELEMETRIA_TOKEN'] = 'benchmark'
+        sys.path.insert(0, DIRETORIO)
+        import app_web
+        sistema = app_web.sistema
+        for i in range(args.maquinas):
+            sistema.cadastrar_maquina(f'Marca {i}', f'Modelo {i}', 2020)
+
+        inicio = int(time.time()) - (2 * args.dias + 1) * 86400
+        # Duas rodadas em períodos distintos, para as duas medirem gravações novas
+        direto = gerar_lotes(args.maquinas, args.dias, args.intervalo, args.lote, inicio)
+        web = gerar_lotes(args.maquinas, args.dias, args.intervalo, args.lote, inicio + args.dias * 86400)
+
+        cliente = app_web.app.test_client()
+
+        def pela_rota(lote):
+            resposta = cliente.post('/api/telemetria/leituras', data=json.dumps(lote),
+                                    content_type='application/json',
+                                    headers={'X-Telemetria-Token': 'benchmark'})
+            assert resposta.status_code == 200, resposta.get_json()
+            return resposta.get_json()['novas']
+
+        print("=" * 76)
+        print("INGESTÃO DE TELEMETRIA".center(76))
+        print("=" * 76)
+        print(f"{args.maquinas} máquinas, uma leitura a cada {args.intervalo}s, lotes de {args.lote}\n")
+        print(f"{'CAMINHO':<38} {'LEITURAS':>10} {'TEMPO (s)':>10} {'LEITURAS/S':>14}")
+        print("-" * 76)
+        medir('sistema.ingerir_leituras', lambda lote: sistema.ingerir_leituras([lote])[1], direto)
+        medir('POST /api/telemetria/leituras', pela_rota, web)
+        medir('reenvio (duplicadas, ignoradas)', lambda lote: sistema.ingerir_leituras([lote])[0],
+              direto[:max(1, len(direto) // 10)])
+
+        de = time.strftime('%d/%m/%Y', time.localtime(inicio + 86400))
+        ate = time.strftime('%d/%m/%Y', time.localtime(inicio + 2 * args.dias * 86400 - 86400))
+        comeco = time.perf_counter()
+        medido = sistema.horimetros_telemetria(1, de, ate)
+        print(f"\nHorímetro da máquina 1 de {de} a {ate}: {medido['horimetro_inicial']:.2f} → "
+              f"{medido['horimetro_final']:.2f} ({medido['leituras']} leituras) "
+              f"em {(time.perf_counter() - comeco) * 1000:.1f} ms")
+        print("=" * 76)
+        sistema.fechar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark de vazão do gunicorn com diferentes modelos de worker
+
+Para cada configuração, sobe o gunicorn com gunicorn.conf.py sobre um banco
+temporário populado com dados de exemplo, dispara requisições concorrentes
+por alguns segundos e mede requisições/s e latências (p50/p95).
+
+Uso: python benchmark_workers.py [--duracao S] [--clientes N] [--rota /trabalhos]
+"""
+
+import argparse
+import http.client
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# (nome, variáveis de ambiente repassadas ao gunicorn.conf.py)
+CONFIGURACOES = [
+    ('sync, 1 worker (Procfile antigo)', {'GUNICORN_WORKER_CLASS': 'sync', 'WEB_CONCURRENCY': '1'}),
+    ('sync, 2xCPU+1 workers', {'GUNICORN_WORKER_CLASS': 'sync'}),
+    ('gthread, 2 workers x 4 threads', {'GUNICORN_WORKER_CLASS': 'gthread', 'WEB_CONCURRENCY': '2'}),
+    ('gthread, 2xCPU+1 workers x 4 threads', {'GUNICORN_WORKER_CLASS': 'gthread'}),
+]
+
+
+def popular_banco(caminho, clientes=200, maquinas=50, registros=2000):
+    """Cria um banco de exemplo para o benchmark"""
+    # Importar app_web criaria o banco padrão; as tabelas vêm do próprio sistema
+    os.environ['RODAMOTRIZ_DB'] = caminho
+    sys.path.insert(0, DIRETORIO)
+    import app_web
+    app_web.sistema.fechar()
+
+    conn = sqlite3.connect(caminho)
+    conn.executemany('INSERT INTO clientes (nome, cnpj_cpf, endereco) VALUES (?, ?, ?)',
+                     [(f'Cliente {i}', f'{i:014d}', f'Rua {i}') for i in range(clientes)])
+    conn.executemany('INSERT INTO maquinas (marca, modelo, ano) VALUES (?, ?, ?)',
+                     [(f'Marca {i % 5}', f'Modelo {i}', 2015 + i % 10) for i in range(maquinas)])
+    conn.executemany('INSERT INTO locais (nome, chave) VALUES (?, ?)',
+                     [(f'Obra {i}', f'obra {i}') for i in range(30)])
+    linhas = []
+    for i in range(registros):
+        inicial = random.uniform(0, 5000)
+        horas = random.uniform(1, 40)
+        linhas.append((random.randint(1, clientes), random.randint(1, maquinas), i % 30 + 1,
+                       '01/03/2026', '05/03/2026', inicial, inicial + horas, horas))
+    conn.executemany('''
+        INSERT INTO registros_trabalho
+        (cliente_id, maquina_id, local_id, data_inicio, data_final,
+         horimetro_inicial, horimetro_final, horas_trabalhadas)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', linhas)
+    conn.commit()
+    conn.close()
+
+
+def porta_livre():
+    """Reserva uma porta TCP livre no localhost"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def aguardar_porta(porta, limite=20):
+    """Espera o gunicorn começar a aceitar conexões"""
+    fim = time.time() + limite
+    while time.time() < fim:
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def gerar_carga(porta, rota, clientes, duracao, timeout=30):
+    """Dispara requisições em paralelo e retorna (latências, erros)"""
+    latencias = []
+    erros = [0]
+    trava = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def cliente():
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=timeout)
+        locais = []
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                conexao.request('GET', rota)
+                resposta = conexao.getresponse()
+                resposta.read()
+                if resposta.status != 200:
+                    raise http.client.HTTPException(resposta.status)
+                locais.append(time.perf_counter() - inicio)
+            except (OSError, http.client.HTTPException):
+                with trava:
+                    erros[0] += 1
+                conexao.close()
+                conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=timeout)
+        conexao.close()
+        with trava:
+            latencias.extend(locais)
+
+    threads = [threading.Thread(target=cliente) for _ in range(clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, erros[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duracao', type=float, default=10, help='segundos de carga por configuração')
+    parser.add_argument('--clientes', type=int, default=16, help='conexões simultâneas')
+    parser.add_argument('--rota', default='/trabalhos', help='rota exercitada (padrão: /trabalhos)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        banco = os.path.join(temporario, 'benchmark.db')
+        popular_banco(banco)
+
+        print("=" * 90)
+        print(f"VAZÃO POR MODELO DE WORKER - GET {args.rota}".center(90))
+        print("=" * 90)
+        print(f"{os.cpu_count()} CPUs, {args.clientes} clientes simultâneos, {args.duracao:.0f}s por configuração\n")
+        print(f"{'CONFIGURAÇÃO':<40} {'REQ/S':>10} {'P50 (ms)':>10} {'P95 (ms)':>10} {'ERROS':>8}")
+        print("-" * 90)
+
+        for nome, variaveis in CONFIGURACOES:
+            porta = porta_livre()
+            ambiente = dict(os.environ, RODAMOTRIZ_DB=banco, PORT=str(porta), **variaveis)
+            processo = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                 '--bind', f'127.0.0.1:{porta}', 'app_web:app'],
+                cwd=DIRETORIO, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not aguardar_porta(porta):
+                    print(f"{nome:<40} ❌ gunicorn não iniciou")
+                    continue
+                # Aquecimento rápido antes da medição
+                gerar_carga(porta, args.rota, 2, 1)
+                latencias, erros = gerar_carga(porta, args.rota, args.clientes, args.duracao)
+                if not latencias:
+                    print(f"{nome:<40} ❌ nenhuma requisição concluída ({erros} erros)")
+                    continue
+                latencias.sort()
+                p95 = latencias[int(len(latencias) * 0.95) - 1]
+                print(f"{nome:<40} {len(latencias) / args.duracao:>10.1f} "
+                      f"{statistics.median(latencias) * 1000:>10.1f} {p95 * 1000:>10.1f} {erros:>8}")
+            finally:
+                processo.terminate()
+                processo.wait()
+
+        print("=" * 90)
+
+
+if __name__ == '__main__':
+    main()
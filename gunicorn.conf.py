@@ -0,0 +1,57 @@
+"""
+Configuração do gunicorn para produção (Render / Procfile)
+
+Uso: gunicorn -c gunicorn.conf.py app_web:app
+
+Todos os valores podem ser ajustados por variáveis de ambiente:
+    PORT                    porta HTTP (definida pelo Render)
+    WEB_CONCURRENCY         número de workers (padrão: 2 x CPUs + 1)
+    GUNICORN_WORKER_CLASS   sync ou gthread (padrão: gthread)
+    GUNICORN_THREADS        threads por worker gthread (padrão: 4)
+    GUNICORN_MAX_REQUESTS   requisições até reciclar o worker (padrão: 1000)
+    GUNICORN_TIMEOUT        segundos até matar um worker travado (padrão: 60)
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Processos: fórmula usual do gunicorn, baseada nos CPUs disponíveis
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# gthread permite que um worker atenda outras requisições enquanto um PDF é gerado
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Carrega a aplicação (imports, templates, ReportLab) uma única vez no master
+preload_app = True
+
+# Reciclagem gradual dos workers; o jitter evita que todos reiniciem juntos
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max(1, max_requests // 10)
+
+# Geração de PDF pode demorar; dar tempo para concluir antes de matar o worker
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Após o preload: pré-aquece templates/estilos e fecha a conexão do master"""
+    import app_web
+    app_web.preaquecer()
+    # Conexões (SQLite ou pool do PostgreSQL) não podem ser compartilhadas após o fork
+    app_web.sistema.fechar()
+    server.log.info("Aplicação pré-carregada; conexão do master fechada")
+
+
+def post_fork(server, worker):
+    """Cada worker abre a sua própria conexão com o banco"""
+    if server.cfg.preload_app:
+        import app_web
+        app_web.sistema.conectar()
+        server.log.info(f"Worker {worker.pid}: conexão com o banco aberta")
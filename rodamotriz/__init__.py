@@ -0,0 +1,8 @@
+"""
+Núcleo do sistema Rodamotriz: dados, validação e relatórios
+
+Usado pelo CLI (app.py) e pela aplicação web (app_web.py). Os módulos são
+importados diretamente (ex.: from rodamotriz.sistema import SistemaRodamotriz);
+o gerador de PDF (rodamotriz.relatorio_pdf) só é carregado quando um
+relatório é gerado, para não trazer o ReportLab na inicialização.
+"""
@@ -0,0 +1,161 @@
+"""
+Controle de admissão da geração de PDFs
+
+Renderizar um relatório ocupa o CPU por um bom tempo; sem limite, algumas
+pessoas clicando em "Gerar PDF" em várias linhas tomam todas as threads do
+worker e as páginas interativas param de responder. Por processo:
+
+- no máximo SIMULTANEOS renderizações ao mesmo tempo;
+- até FILA pedidos esperando a vez, em ordem de chegada, cada um por no
+  máximo ESPERA segundos;
+- cada usuário (IP do cliente) pode pedir POR_MINUTO relatórios por minuto,
+  com rajadas do mesmo tamanho (balde de fichas).
+
+Quem passa de um limite recebe Recusado na hora, com o status HTTP (429 para a
+taxa do usuário, 503 para o sistema saturado) e o Retry-After sugerido.
+
+Configuração:
+    RODAMOTRIZ_PDF_SIMULTANEOS   renderizações simultâneas por processo (padrão: 2)
+    RODAMOTRIZ_PDF_FILA          pedidos aguardando por processo (padrão: 8)
+    RODAMOTRIZ_PDF_ESPERA        segundos máximos na fila (padrão: 10)
+    RODAMOTRIZ_PDF_POR_MINUTO    relatórios por minuto por usuário (padrão: 30)
+    RODAMOTRIZ_PROXIES           proxies confiáveis na frente da aplicação, para
+                                 achar o IP do cliente no X-Forwarded-For (padrão: 0)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+
+SIMULTANEOS = int(os.environ.get('RODAMOTRIZ_PDF_SIMULTANEOS', 2))
+FILA = int(os.environ.get('RODAMOTRIZ_PDF_FILA', 8))
+ESPERA = float(os.environ.get('RODAMOTRIZ_PDF_ESPERA', 10))
+POR_MINUTO = int(os.environ.get('RODAMOTRIZ_PDF_POR_MINUTO', 30))
+PROXIES = int(os.environ.get('RODAMOTRIZ_PROXIES', 0))
+
+# Acima disso, os baldes de usuários parados (já cheios de novo) são descartados
+MAX_USUARIOS = 1000
+
+
+class Recusado(Exception):
+    """Pedido recusado pelo controle de admissão (status HTTP e Retry-After em segundos)"""
+
+    def __init__(self, mensagem, status, retry_after):
+        super().__init__(mensagem)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def identificar(endereco, encaminhado=None, proxies=PROXIES):
+    """Usuário do limite por usuário: o IP do cliente
+
+    Atrás de proxies, o IP do cliente é o que o proxy mais externo acrescentou ao
+    X-Forwarded-For; entradas anteriores vêm do próprio cliente e não são confiáveis.
+    """
+    if proxies and encaminhado:
+        enderecos = [e.strip() for e in encaminhado.split(',')]
+        if len(enderecos) >= proxies:
+            return enderecos[-proxies]
+    return endereco
+
+
+class Limitador:
+    """Limite de concorrência com fila de espera e taxa por usuário (por processo)"""
+
+    def __init__(self, simultaneos=SIMULTANEOS, fila=FILA, espera=ESPERA, por_minuto=POR_MINUTO):
+        self.simultaneos = simultaneos
+        self.tamanho_fila = fila
+        self.espera = espera
+        self.por_minuto = por_minuto
+        self.condicao = threading.Condition()
+        self.em_andamento = 0
+        self.fila = deque()
+        self.baldes = {}
+        self.tempo_medio = None
+        self.contadores = {'aceitos': 0, 'recusados_taxa': 0, 'recusados_fila_cheia': 0,
+                           'recusados_espera': 0, 'pico_fila': 0, 'espera_total': 0.0}
+
+    def _ficha(self, usuario, agora):
+        """Consome uma ficha do usuário; retorna 0 ou os segundos até a próxima"""
+        if self.por_minuto <= 0:
+            return 0
+        if len(self.baldes) > MAX_USUARIOS:
+            # Em 60 s sem pedidos qualquer balde volta a ficar cheio
+            self.baldes = {u: b for u, b in self.baldes.items() if agora - b[1] < 60}
+        fichas, instante = self.baldes.get(usuario, (self.por_minuto, agora))
+        fichas = min(self.por_minuto, fichas + (agora - instante) * self.por_minuto / 60)
+        if fichas < 1:
+            self.baldes[usuario] = (fichas, agora)
+            return (1 - fichas) * 60 / self.por_minuto
+        self.baldes[usuario] = (fichas - 1, agora)
+        return 0
+
+    def _retry_after(self):
+        """Segundos estimados até a fila atual andar"""
+        por_pdf = self.tempo_medio or 1.0
+        return max(1, math.ceil(por_pdf * (len(self.fila) + 1) / self.simultaneos))
+
+    def adquirir(self, usuario):
+        """Reserva uma vaga de renderização, esperando na fila se preciso
+
+        Levanta Recusado se o usuário passou da taxa, se a fila está cheia ou se a
+        vez não chegou em ESPERA segundos. Cada adquirir exige um liberar.
+        """
+        with self.condicao:
+            agora = time.monotonic()
+            falta = self._ficha(usuario, agora)
+            if falta:
+                self.contadores['recusados_taxa'] += 1
+                raise Recusado("Muitos relatórios pedidos em pouco tempo; aguarde um pouco.",
+                               429, math.ceil(falta))
+
+            if self.em_andamento >= self.simultaneos or self.fila:
+                if len(self.fila) >= self.tamanho_fila:
+                    self.contadores['recusados_fila_cheia'] += 1
+                    raise Recusado("Geração de relatórios ocupada; tente novamente em instantes.",
+                                   503, self._retry_after())
+                vez = object()
+                self.fila.append(vez)
+                self.contadores['pico_fila'] = max(self.contadores['pico_fila'], len(self.fila))
+                try:
+                    chegou = self.condicao.wait_for(
+                        lambda: self.em_andamento < self.simultaneos and self.fila[0] is vez,
+                        self.espera)
+                finally:
+                    self.fila.remove(vez)
+                    # Quem estava atrás pode ter virado o primeiro da fila
+                    self.condicao.notify_all()
+                if not chegou:
+                    self.contadores['recusados_espera'] += 1
+                    raise Recusado("Geração de relatórios ocupada; tente novamente em instantes.",
+                                   503, self._retry_after())
+                self.contadores['espera_total'] += time.monotonic() - agora
+
+            self.em_andamento += 1
+            self.contadores['aceitos'] += 1
+
+    def liberar(self, duracao):
+        """Devolve a vaga; duracao (s) alimenta a estimativa do Retry-After"""
+        with self.condicao:
+            self.em_andamento -= 1
+            self.tempo_medio = duracao if self.tempo_medio is None else 0.8 * self.tempo_medio + 0.2 * duracao
+            self.condicao.notify_all()
+
+    def metricas(self):
+        """Ocupação atual e contadores desde o início do processo"""
+        with self.condicao:
+            contadores = dict(self.contadores)
+            aceitos = contadores['aceitos']
+            return {
+                'simultaneos': self.simultaneos,
+                'em_andamento': self.em_andamento,
+                'na_fila': len(self.fila),
+                'tamanho_fila': self.tamanho_fila,
+                'pico_fila': contadores.pop('pico_fila'),
+                'espera_media_s': round(contadores.pop('espera_total') / aceitos, 3) if aceitos else 0.0,
+                'geracao_media_s': round(self.tempo_medio or 0.0, 3),
+                'usuarios': len(self.baldes),
+                **contadores,
+            }
@@ -0,0 +1,180 @@
+"""
+Registro de alterações (change feed) para sincronização incremental
+
+Gatilhos no banco gravam cada inclusão, alteração e exclusão em clientes,
+máquinas e registros de trabalho na tabela alteracoes, com um número de
+sequência (seq) crescente. Um dispositivo guarda o último seq recebido e pede
+apenas o que mudou depois dele (GET /changes?since=N); sem since recebe uma
+cópia completa dos cadastros, que também é o caminho quando o log já foi
+podado além do seq do dispositivo (resposta 410).
+
+As alterações devem ser aplicadas como upsert/exclusão por id: uma linha pode
+aparecer na cópia completa e de novo como alteração logo em seguida.
+
+Registros movidos para o arquivo anual aparecem como exclusões, já que saem
+da tabela principal. Uma correção num registro arquivado não passa pelos
+gatilhos (o registro está noutro banco): ela entra no log como alteração da
+tabela totais_arquivados, com o ano no lugar do id e os totais do ano nos dados.
+
+Poda do log (ex.: diariamente pelo cron):
+    python -m rodamotriz.alteracoes podar [DIAS]
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from rodamotriz import arquivamento, locais
+
+# Tabelas acompanhadas e as colunas enviadas aos dispositivos
+TABELAS = {
+    'clientes': ('id', 'nome', 'cnpj_cpf', 'endereco'),
+    'maquinas': ('id', 'marca', 'modelo', 'ano'),
+    'registros_trabalho': tuple(arquivamento.COLUNAS_REGISTRO.split(', ')),
+}
+
+# De onde as colunas são lidas, quando não da própria tabela (o nome do local vem da visão)
+ORIGENS = {
+    'registros_trabalho': locais.VISAO,
+}
+
+# Alterações gravadas à mão (sem gatilho): correções em anos arquivados, id = ano
+TOTAIS_ARQUIVADOS = 'totais_arquivados'
+
+# Dias mantidos no log; quem ficar mais tempo sem sincronizar recomeça do zero
+RETENCAO_DIAS = int(os.environ.get('RODAMOTRIZ_RETENCAO_ALTERACOES', 30))
+
+# Alterações por resposta
+LIMITE_PADRAO = 500
+LIMITE_MAXIMO = 1000
+
+
+class LogTruncado(Exception):
+    """O seq pedido é anterior ao início do log (já podado)"""
+
+
+def criar_tabela(cursor, banco):
+    """Cria a tabela de alterações e os gatilhos das tabelas acompanhadas"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela TEXT NOT NULL,
+            registro_id INTEGER NOT NULL,
+            operacao TEXT NOT NULL,
+            data_alteracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for comando in banco.gatilhos_alteracoes(TABELAS):
+        cursor.execute(comando)
+
+
+def ultimo_seq(cursor):
+    """Maior seq registrado (0 se o log estiver vazio)"""
+    cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM alteracoes')
+    return cursor.fetchone()[0]
+
+
+def _linhas_por_id(cursor, tabela, ids):
+    """Estado atual das linhas pedidas, indexado por id"""
+    if not ids:
+        return {}
+    colunas = TABELAS[tabela]
+    marcadores = ', '.join('?' * len(ids))
+    origem = ORIGENS.get(tabela, tabela)
+    cursor.execute(f'SELECT {", ".join(colunas)} FROM {origem} WHERE id IN ({marcadores})',
+                   sorted(ids))
+    return {linha[0]: dict(zip(colunas, linha)) for linha in cursor.fetchall()}
+
+
+def registrar_ano_arquivado(cursor, ano):
+    """Registra no log a correção de um registro do ano arquivado"""
+    cursor.execute('''
+        INSERT INTO alteracoes (tabela, registro_id, operacao)
+        VALUES (?, ?, 'update')
+    ''', (TOTAIS_ARQUIVADOS, ano))
+
+
+def _totais_por_ano(cursor, anos):
+    """Registros e horas atuais de cada ano arquivado pedido, indexados pelo ano"""
+    if not anos:
+        return {}
+    cursor.execute(f'''
+        SELECT ano, SUM(registros), SUM(horas_trabalhadas)
+        FROM totais_arquivados
+        WHERE ano IN ({', '.join('?' * len(anos))})
+        GROUP BY ano
+    ''', sorted(anos))
+    return {ano: {'ano': ano, 'registros': registros, 'horas_trabalhadas': horas}
+            for ano, registros, horas in cursor.fetchall()}
+
+
+def alteracoes_desde(cursor, desde, limite=LIMITE_PADRAO):
+    """Alterações com seq > desde, com os dados atuais das linhas incluídas/alteradas"""
+    cursor.execute('SELECT MIN(seq) FROM alteracoes')
+    primeiro = cursor.fetchone()[0]
+    if primeiro is not None and desde < primeiro - 1:
+        raise LogTruncado(f"Alterações anteriores a {primeiro} já foram removidas do log.")
+
+    cursor.execute('''
+        SELECT seq, tabela, registro_id, operacao FROM alteracoes
+        WHERE seq > ? ORDER BY seq LIMIT ?
+    ''', (desde, limite + 1))
+    linhas = cursor.fetchall()
+    mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    # Uma consulta por tabela para buscar o estado atual das linhas citadas
+    dados = {}
+    for tabela in TABELAS:
+        ids = {registro_id for _, t, registro_id, operacao in linhas
+               if t == tabela and operacao != 'delete'}
+        dados[tabela] = _linhas_por_id(cursor, tabela, ids)
+    dados[TOTAIS_ARQUIVADOS] = _totais_por_ano(
+        cursor, {ano for _, t, ano, _ in linhas if t == TOTAIS_ARQUIVADOS})
+
+    return {
+        'alteracoes': [{
+            'seq': seq,
+            'tabela': tabela,
+            'id': registro_id,
+            'operacao': operacao,
+            # None quando a linha já foi excluída (a exclusão vem mais adiante no log)
+            'dados': None if operacao == 'delete' else dados[tabela].get(registro_id),
+        } for seq, tabela, registro_id, operacao in linhas],
+        'ultimo': linhas[-1][0] if linhas else desde,
+        'mais': mais,
+    }
+
+
+def podar(cursor, dias=RETENCAO_DIAS):
+    """Remove alterações mais antigas que a retenção; retorna quantas foram removidas"""
+    limite = (datetime.now(timezone.utc) - timedelta(days=dias)).strftime('%Y-%m-%d %H:%M:%S')
+    # A alteração mais recente nunca é removida: ela marca até onde o log já chegou
+    cursor.execute('''
+        DELETE FROM alteracoes
+        WHERE data_alteracao < ? AND seq < (SELECT MAX(seq) FROM alteracoes)
+    ''', (limite,))
+    return cursor.rowcount
+
+
+def main():
+    """Poda pela linha de comando: python -m rodamotriz.alteracoes podar [DIAS]"""
+    if len(sys.argv) < 2 or sys.argv[1] != 'podar':
+        print("Uso: python -m rodamotriz.alteracoes podar [DIAS]")
+        sys.exit(1)
+
+    from rodamotriz.sistema import SistemaRodamotriz
+    sistema = SistemaRodamotriz()
+    try:
+        dias = int(sys.argv[2]) if len(sys.argv) > 2 else RETENCAO_DIAS
+        removidas = sistema.podar_alteracoes(dias)
+        print(f"✅ {removidas} alteração(ões) com mais de {dias} dia(s) removida(s) do log")
+    except ValueError:
+        print(f"❌ Número de dias inválido: {sys.argv[2]}")
+        sys.exit(1)
+    finally:
+        sistema.fechar()
+
+
+if __name__ == '__main__':
+    main()
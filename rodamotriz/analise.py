@@ -0,0 +1,305 @@
+"""
+Cópia analítica dos registros de trabalho (consultas pesadas fora do banco principal)
+
+Análises avulsas (horas por modelo e trimestre, sazonalidade dos clientes)
+rodadas no rodamotriz.db disputam o lock do sistema com a aplicação web. A
+exportação grava num banco SQLite à parte (analise.db, ou RODAMOTRIZ_ANALISE)
+uma tabela larga: cada registro já traz o cliente, a máquina e o local, e as
+datas vêm no formato AAAA-MM-DD com ano, trimestre e mês da data final em
+colunas próprias. Os índices têm o formato das agregações abaixo, então cada
+GROUP BY percorre só um índice, já na ordem dos grupos, sem ler as linhas.
+
+A exportação abre o banco principal numa conexão própria, somente leitura (com
+WAL não bloqueia quem grava), e é incremental: a cópia guarda o último seq do
+log de alterações (alteracoes.py) e, a cada execução, regrava só os registros
+incluídos, corrigidos ou excluídos depois dele e atualiza os nomes dos clientes
+e máquinas alterados. Os anos arquivados (arquivamento.py) também entram na
+cópia e são recarregados quando o arquivo do ano muda. Se o log já foi podado
+além do seq da cópia, ela é refeita do zero.
+
+    python app.py analise exportar [--completa] [--parquet ARQUIVO]   (ex.: de hora em hora pelo cron)
+    python app.py analise modelos [--desde AAAA] [--ate AAAA]
+    python app.py analise sazonalidade [--cliente ID]
+
+--parquet grava também a cópia inteira num arquivo Parquet, para pandas, DuckDB
+e afins (requer pyarrow: pip install -r requirements_analise.txt).
+"""
+
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+from urllib.parse import quote
+
+from rodamotriz import arquivamento
+from rodamotriz.caminhos import CAMINHO_ANALISE, DIRETORIO_ARQUIVO
+
+# Colunas da cópia e o tipo de cada uma (DATA é texto AAAA-MM-DD)
+COLUNAS = (
+    ('id', 'INTEGER'),
+    ('arquivado', 'INTEGER'),
+    ('cliente_id', 'INTEGER'),
+    ('cliente', 'TEXT'),
+    ('maquina_id', 'INTEGER'),
+    ('marca', 'TEXT'),
+    ('modelo', 'TEXT'),
+    ('ano_maquina', 'INTEGER'),
+    ('local_trabalho', 'TEXT'),
+    ('data_inicio', 'DATA'),
+    ('data_final', 'DATA'),
+    ('ano', 'INTEGER'),
+    ('trimestre', 'INTEGER'),
+    ('mes', 'INTEGER'),
+    ('horimetro_inicial', 'REAL'),
+    ('horimetro_final', 'REAL'),
+    ('horas', 'REAL'),
+)
+
+# Data dd/mm/yyyy convertida para AAAA-MM-DD
+EXPR_DATA = "substr({0}, 7, 4) || '-' || substr({0}, 4, 2) || '-' || substr({0}, 1, 2)"
+
+# Linhas lidas por vez ao gravar o Parquet
+TAMANHO_LOTE = 50000
+
+
+def _selecao(tabela, arquivado):
+    """SELECT das colunas da cópia a partir de uma tabela de registros (apelido r)"""
+    # O arquivo anual guarda o nome do local; a tabela principal, o id
+    if arquivado:
+        local, juncao_local = 'r.local_trabalho', ''
+    else:
+        local, juncao_local = 'l.nome', 'JOIN origem.locais l ON l.id = r.local_id'
+    mes = 'CAST(substr(r.data_final, 4, 2) AS INTEGER)'
+    return f'''
+        SELECT r.id, {int(arquivado)}, r.cliente_id, c.nome, r.maquina_id, m.marca, m.modelo, m.ano,
+               {local}, {EXPR_DATA.format('r.data_inicio')}, {EXPR_DATA.format('r.data_final')},
+               CAST(substr(r.data_final, 7, 4) AS INTEGER), ({mes} + 2) / 3, {mes},
+               r.horimetro_inicial, r.horimetro_final, r.horas_trabalhadas
+        FROM {tabela} r
+        JOIN origem.clientes c ON c.id = r.cliente_id
+        JOIN origem.maquinas m ON m.id = r.maquina_id
+        {juncao_local}
+    '''
+
+
+def criar_tabelas(conn):
+    """Tabela larga, índices das agregações e a tabela de controle da exportação"""
+    definicoes = ', '.join(f"{nome} {'TEXT' if tipo == 'DATA' else tipo}" for nome, tipo in COLUNAS)
+    conn.execute(f'CREATE TABLE IF NOT EXISTS trabalhos ({definicoes}, PRIMARY KEY (id))')
+    # Horas por modelo e trimestre (e a recarga de um ano arquivado)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_trabalhos_modelo
+        ON trabalhos (ano, trimestre, marca, modelo, horas)
+    ''')
+    # Sazonalidade por cliente (e a atualização do nome do cliente)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_trabalhos_cliente
+        ON trabalhos (cliente_id, mes, cliente, horas)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_trabalhos_maquina ON trabalhos (maquina_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS exportacao (
+            chave TEXT PRIMARY KEY,
+            valor TEXT NOT NULL
+        )
+    ''')
+
+
+def _controle(conn):
+    return dict(conn.execute('SELECT chave, valor FROM exportacao').fetchall())
+
+
+def _gravar_controle(conn, chave, valor):
+    conn.execute('''
+        INSERT INTO exportacao (chave, valor) VALUES (?, ?)
+        ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor
+    ''', (chave, str(valor)))
+
+
+def _uri_somente_leitura(caminho):
+    return f'file:{quote(os.path.abspath(caminho))}?mode=ro'
+
+
+def _anos_alterados(conn, controle, completa, diretorio):
+    """Anos arquivados cujo arquivo é novo ou mudou desde a última exportação"""
+    anos = {}
+    for (ano,) in conn.execute('SELECT DISTINCT ano FROM origem.totais_arquivados ORDER BY ano'):
+        caminho = arquivamento.caminho_arquivo(ano, diretorio)
+        if not os.path.exists(caminho):
+            continue
+        # Uma correção no arquivo (sistema.editar_trabalho) muda a data do arquivo
+        modificado = str(os.path.getmtime(caminho))
+        if completa or controle.get(f'arquivo_{ano}') != modificado:
+            anos[ano] = modificado
+    return anos
+
+
+def exportar(caminho_banco, destino=CAMINHO_ANALISE, completa=False, diretorio=DIRETORIO_ARQUIVO):
+    """Atualiza a cópia analítica com o que mudou no banco principal; retorna o resumo"""
+    inicio = time.perf_counter()
+    # isolation_level=None: a transação é aberta à mão, para que tudo o que é
+    # lido do banco principal venha do mesmo instante
+    conn = sqlite3.connect(destino, uri=True, isolation_level=None, timeout=30)
+    try:
+        conn.execute('PRAGMA journal_mode = WAL')
+        criar_tabelas(conn)
+        conn.execute('ATTACH DATABASE ? AS origem', (_uri_somente_leitura(caminho_banco),))
+        cursor = conn.cursor()
+
+        controle = _controle(conn)
+        desde = int(controle['seq']) if 'seq' in controle and not completa else None
+        primeiro = conn.execute('SELECT MIN(seq) FROM origem.alteracoes').fetchone()[0]
+        if desde is not None and primeiro is not None and desde < primeiro - 1:
+            # O log já não tem tudo o que mudou depois da última exportação
+            desde = None
+        completa = desde is None
+
+        # ATTACH não é permitido dentro da transação: os arquivos anuais são
+        # anexados antes; um ano arquivado depois disso entra na próxima execução
+        anos = _anos_alterados(conn, controle, completa, diretorio)
+        with arquivamento.anexar_arquivos(cursor, anos, diretorio) as anexados:
+            cursor.execute('BEGIN')
+            try:
+                ultimo = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM origem.alteracoes').fetchone()[0]
+                ativos = _selecao('origem.registros_trabalho', arquivado=False)
+                if completa:
+                    cursor.execute('DELETE FROM trabalhos')
+                    cursor.execute('DELETE FROM exportacao')
+                    cursor.execute(f'INSERT INTO trabalhos {ativos}')
+                    regravados = cursor.rowcount
+                else:
+                    regravados = _aplicar_alteracoes(cursor, ativos, desde, ultimo)
+
+                for ano in anexados:
+                    cursor.execute('DELETE FROM trabalhos WHERE ano = ? AND arquivado = 1', (ano,))
+                    cursor.execute(f'INSERT OR REPLACE INTO trabalhos '
+                                   f'{_selecao(f"arq_{ano}.registros_trabalho", arquivado=True)}')
+                    _gravar_controle(conn, f'arquivo_{ano}', anos[ano])
+
+                _gravar_controle(conn, 'seq', ultimo)
+                _gravar_controle(conn, 'exportado_em', datetime.now().isoformat(timespec='seconds'))
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+        conn.execute('DETACH DATABASE origem')
+        registros = conn.execute('SELECT COUNT(*) FROM trabalhos').fetchone()[0]
+    finally:
+        conn.close()
+
+    return {
+        'completa': completa,
+        'seq': ultimo,
+        'regravados': regravados,
+        'anos_arquivados': anexados,
+        'registros': registros,
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
+
+
+def _aplicar_alteracoes(cursor, ativos, desde, ultimo):
+    """Regrava os registros alterados depois de desde e os nomes dos cadastros alterados"""
+    alterados = '''
+        SELECT registro_id FROM origem.alteracoes
+        WHERE seq > ? AND seq <= ? AND tabela = '{0}' {1}
+    '''
+    registros = alterados.format('registros_trabalho', '')
+    # Exclusões e o estado antigo das alterações saem; o que ainda existe volta.
+    # Registros arquivados também aparecem como exclusão no log, mas a linha
+    # arquivada da cópia só muda quando o arquivo do ano é recarregado
+    cursor.execute(f'DELETE FROM trabalhos WHERE arquivado = 0 AND id IN ({registros})', (desde, ultimo))
+    cursor.execute(f'INSERT OR REPLACE INTO trabalhos {ativos} WHERE r.id IN ({registros})',
+                   (desde, ultimo))
+    regravados = cursor.rowcount
+
+    # Nome do cliente e dados da máquina repetidos em cada linha, inclusive nas arquivadas
+    cursor.execute(f'''
+        UPDATE trabalhos SET cliente = c.nome
+        FROM origem.clientes c
+        WHERE c.id = trabalhos.cliente_id
+          AND trabalhos.cliente_id IN ({alterados.format('clientes', "AND operacao = 'update'")})
+    ''', (desde, ultimo))
+    cursor.execute(f'''
+        UPDATE trabalhos SET marca = m.marca, modelo = m.modelo, ano_maquina = m.ano
+        FROM origem.maquinas m
+        WHERE m.id = trabalhos.maquina_id
+          AND trabalhos.maquina_id IN ({alterados.format('maquinas', "AND operacao = 'update'")})
+    ''', (desde, ultimo))
+    return regravados
+
+
+def abrir(caminho=CAMINHO_ANALISE):
+    """Conexão somente leitura com a cópia analítica"""
+    if not os.path.exists(caminho):
+        raise Exception("Cópia analítica não encontrada. Execute: python app.py analise exportar")
+    return sqlite3.connect(_uri_somente_leitura(caminho), uri=True)
+
+
+def situacao(conn):
+    """(registros na cópia, data da última exportação)"""
+    registros = conn.execute('SELECT COUNT(*) FROM trabalhos').fetchone()[0]
+    return registros, _controle(conn).get('exportado_em')
+
+
+def horas_por_modelo(conn, desde=None, ate=None):
+    """(ano, trimestre, marca, modelo, registros, horas) entre os anos informados"""
+    condicoes, parametros = [], []
+    if desde is not None:
+        condicoes.append('ano >= ?')
+        parametros.append(desde)
+    if ate is not None:
+        condicoes.append('ano <= ?')
+        parametros.append(ate)
+    filtro = ('WHERE ' + ' AND '.join(condicoes)) if condicoes else ''
+    return conn.execute(f'''
+        SELECT ano, trimestre, marca, modelo, COUNT(*), SUM(horas)
+        FROM trabalhos
+        {filtro}
+        GROUP BY ano, trimestre, marca, modelo
+        ORDER BY ano, trimestre, SUM(horas) DESC
+    ''', parametros).fetchall()
+
+
+def sazonalidade(conn, cliente_id=None):
+    """(cliente_id, cliente, mês, registros, horas, % das horas do cliente) de todos os anos"""
+    filtro = '' if cliente_id is None else 'WHERE cliente_id = ?'
+    return conn.execute(f'''
+        SELECT cliente_id, cliente, mes, registros, horas,
+               100.0 * horas / SUM(horas) OVER (PARTITION BY cliente_id)
+        FROM (
+            SELECT cliente_id, MAX(cliente) AS cliente, mes, COUNT(*) AS registros, SUM(horas) AS horas
+            FROM trabalhos
+            {filtro}
+            GROUP BY cliente_id, mes
+        )
+        ORDER BY cliente, cliente_id, mes
+    ''', [] if cliente_id is None else [cliente_id]).fetchall()
+
+
+def gravar_parquet(conn, caminho):
+    """Grava a cópia inteira num arquivo Parquet; retorna as linhas gravadas"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("Exportação Parquet requer pyarrow. Execute: pip install -r requirements_analise.txt")
+    tipos = {'INTEGER': pyarrow.int64(), 'REAL': pyarrow.float64(),
+             'TEXT': pyarrow.string(), 'DATA': pyarrow.date32()}
+    esquema = pyarrow.schema([(nome, tipos[tipo]) for nome, tipo in COLUNAS])
+    datas = [i for i, (_, tipo) in enumerate(COLUNAS) if tipo == 'DATA']
+
+    cursor = conn.execute(f'SELECT {", ".join(nome for nome, _ in COLUNAS)} FROM trabalhos ORDER BY id')
+    total = 0
+    with pyarrow.parquet.ParquetWriter(caminho, esquema) as escritor:
+        while True:
+            lote = cursor.fetchmany(TAMANHO_LOTE)
+            if not lote:
+                break
+            colunas = [list(coluna) for coluna in zip(*lote)]
+            for i in datas:
+                colunas[i] = [date.fromisoformat(valor) for valor in colunas[i]]
+            escritor.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(valores, campo.type) for valores, campo in zip(colunas, esquema)],
+                schema=esquema))
+            total += len(lote)
+    return total
@@ -0,0 +1,320 @@
+"""
+Backends de armazenamento do sistema Rodamotriz (SQLite e PostgreSQL)
+
+O SQL do sistema é escrito no dialeto do SQLite (parâmetros com `?`); o
+backend PostgreSQL adapta os comandos antes de executá-los. A escolha é
+feita por configuração:
+
+    RODAMOTRIZ_BACKEND   sqlite (padrão) ou postgres
+    DATABASE_URL         URL do PostgreSQL (postgres://...); sozinha já
+                         seleciona o backend PostgreSQL
+    RODAMOTRIZ_DB        caminho do arquivo SQLite
+    RODAMOTRIZ_PERFIL_SQLITE  perfil de PRAGMAs do SQLite (ver manutencao.py)
+    RODAMOTRIZ_POOL_MAX  conexões por processo no pool do PostgreSQL (padrão: 10)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from rodamotriz import manutencao
+from rodamotriz.caminhos import CAMINHO_BANCO
+
+# Registros lidos por vez nas listagens com cursor no servidor
+TAMANHO_LOTE = 500
+
+
+def escapar_like(texto):
+    """Escapa os curingas do LIKE para buscar o texto literalmente"""
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class BackendSQLite:
+    """Uma conexão por processo, serializada por lock"""
+
+    tipo = 'sqlite'
+    erro_integridade = sqlite3.IntegrityError
+
+    def __init__(self, caminho=None, perfil=None):
+        self.caminho = caminho or os.environ.get('RODAMOTRIZ_DB') or CAMINHO_BANCO
+        self.perfil = perfil or manutencao.PERFIL_PADRAO
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def conectar(self):
+        """Abre a conexão deste processo (chamado de novo em cada worker após o fork)"""
+        # Permitir uso da conexão em threads diferentes (Flask pode servir em threads)
+        self.conn = sqlite3.connect(self.caminho, check_same_thread=False)
+        # WAL, cache, mmap etc. conforme o perfil configurado
+        manutencao.aplicar_perfil(self.conn, self.perfil)
+        # Lock para serializar acessos ao cursor/commit
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def conexao(self):
+        """Entrega a conexão bruta sob o lock, sem controle de transação"""
+        with self.lock:
+            yield self.conn
+
+    @contextmanager
+    def cursor(self):
+        """Cursor dentro de uma transação: commit ao final, rollback em caso de erro"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            try:
+                yield cursor
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def inserir(self, cursor, sql, parametros=()):
+        """Executa um INSERT e retorna o id gerado"""
+        cursor.execute(sql, parametros)
+        return cursor.lastrowid
+
+    def iterar(self, sql, parametros=(), tamanho=TAMANHO_LOTE):
+        """Percorre o resultado em lotes, sem carregar tudo na memória"""
+        with self.cursor() as cursor:
+            cursor.execute(sql, parametros)
+            while True:
+                lote = cursor.fetchmany(tamanho)
+                if not lote:
+                    break
+                yield from lote
+
+    def indice_prefixo(self, nome, tabela, coluna):
+        """DDL do índice usado nas buscas por prefixo sem diferenciar maiúsculas"""
+        return f'CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({coluna} COLLATE NOCASE)'
+
+    def filtro_prefixo(self, coluna):
+        """Retorna (condição, ordenação) de busca por prefixo que usam indice_prefixo"""
+        # O LIKE do SQLite já ignora maiúsculas (apenas ASCII), como o NOCASE do índice
+        return f"{coluna} LIKE ? ESCAPE '\\'", f'{coluna} COLLATE NOCASE'
+
+    def padrao_prefixo(self, texto):
+        """Parâmetro do filtro_prefixo para o texto digitado"""
+        return escapar_like(texto) + '%'
+
+    def gatilhos_alteracoes(self, tabelas):
+        """DDL dos gatilhos que alimentam a tabela alteracoes"""
+        comandos = []
+        for tabela in tabelas:
+            for evento, linha, operacao in (('INSERT', 'NEW', 'insert'),
+                                            ('UPDATE', 'NEW', 'update'),
+                                            ('DELETE', 'OLD', 'delete')):
+                # As gravações no SQLite são serializadas, então a ordem do seq é a ordem dos commits
+                comandos.append(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{operacao}
+                    AFTER {evento} ON {tabela}
+                    BEGIN
+                        INSERT INTO alteracoes (tabela, registro_id, operacao)
+                        VALUES ('{tabela}', {linha}.id, '{operacao}');
+                    END
+                ''')
+        return comandos
+
+    def travar(self, cursor, chave):
+        """Serializa, até o fim da transação, as gravações que usam a mesma chave"""
+        # O SQLite tem um único gravador por vez: basta gravar antes de conferir,
+        # e quem grava em seguida espera o commit desta transação
+        pass
+
+    def fechar(self):
+        """Fecha a conexão com o banco de dados"""
+        if self.conn is None:
+            return
+        # Fechar com proteção de lock
+        try:
+            with self.lock:
+                # Recomendação do SQLite: atualizar estatísticas ao fechar a conexão
+                try:
+                    self.conn.execute('PRAGMA optimize')
+                except sqlite3.Error:
+                    pass
+                self.conn.close()
+        except Exception:
+            # Se não for possível obter o lock, tentar fechar de qualquer forma
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+
+
+class CursorPostgres:
+    """Cursor do psycopg que aceita o SQL escrito para o SQLite"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, parametros=()):
+        self._cursor.execute(adaptar_sql(sql), parametros)
+        return self
+
+    def executemany(self, sql, sequencia):
+        self._cursor.executemany(adaptar_sql(sql), sequencia)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, tamanho=TAMANHO_LOTE):
+        return self._cursor.fetchmany(tamanho)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+
+# Conversões de DDL/tipos do SQLite para o PostgreSQL
+_SUBSTITUICOES_POSTGRES = [
+    (re.compile(r'\bINTEGER PRIMARY KEY AUTOINCREMENT\b'), 'SERIAL PRIMARY KEY'),
+    # Mantém data_registro/data_cadastro como texto 'YYYY-MM-DD HH:MM:SS', igual ao SQLite
+    (re.compile(r'\bTIMESTAMP DEFAULT CURRENT_TIMESTAMP\b'),
+     "TEXT DEFAULT to_char(CURRENT_TIMESTAMP, 'YYYY-MM-DD HH24:MI:SS')"),
+    # REAL no PostgreSQL tem só 4 bytes; horímetros precisam de precisão dupla
+    (re.compile(r'\bREAL\b'), 'DOUBLE PRECISION'),
+    # Tabelas sem rowid são um recurso só do SQLite; no PostgreSQL toda tabela é assim
+    (re.compile(r'\)\s*WITHOUT ROWID\b'), ')'),
+    # O PostgreSQL não tem CREATE VIEW IF NOT EXISTS; recriar a visão dá no mesmo
+    (re.compile(r'\bCREATE VIEW IF NOT EXISTS\b'), 'CREATE OR REPLACE VIEW'),
+]
+
+
+def adaptar_sql(sql):
+    """Converte o SQL do dialeto SQLite para o PostgreSQL"""
+    for padrao, substituto in _SUBSTITUICOES_POSTGRES:
+        sql = padrao.sub(substituto, sql)
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+class BackendPostgres:
+    """Pool de conexões por processo; cada operação usa uma conexão do pool"""
+
+    tipo = 'postgres'
+    # Definido em conectar(), quando o psycopg é importado
+    erro_integridade = ()
+
+    def __init__(self, url=None, tamanho_max=None):
+        self.url = url or os.environ['DATABASE_URL']
+        self.tamanho_max = int(tamanho_max or os.environ.get('RODAMOTRIZ_POOL_MAX', 10))
+        self.pool = None
+
+    def conectar(self):
+        """Cria o pool deste processo (chamado de novo em cada worker após o fork)"""
+        try:
+            import psycopg
+            from psycopg_pool import ConnectionPool
+        except ImportError:
+            raise Exception("Backend PostgreSQL requer psycopg. Execute: pip install -r requirements_postgres.txt")
+        self.erro_integridade = psycopg.IntegrityError
+        self.pool = ConnectionPool(self.url, min_size=1, max_size=self.tamanho_max, open=True)
+
+    @contextmanager
+    def conexao(self):
+        """Entrega uma conexão do pool (commit ao devolver, rollback em caso de erro)"""
+        with self.pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def cursor(self):
+        """Cursor dentro de uma transação: commit ao final, rollback em caso de erro"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                yield CursorPostgres(cursor)
+
+    def inserir(self, cursor, sql, parametros=()):
+        """Executa um INSERT ... RETURNING id e retorna o id gerado"""
+        cursor.execute(sql.rstrip().rstrip(';') + ' RETURNING id', parametros)
+        return cursor.fetchone()[0]
+
+    def iterar(self, sql, parametros=(), tamanho=TAMANHO_LOTE):
+        """Percorre o resultado com um cursor no servidor, buscando em lotes"""
+        with self.pool.connection() as conn:
+            with conn.cursor(name='rodamotriz_listagem') as cursor:
+                cursor.itersize = tamanho
+                cursor.execute(adaptar_sql(sql), parametros)
+                yield from cursor
+
+    def indice_prefixo(self, nome, tabela, coluna):
+        """DDL do índice usado nas buscas por prefixo sem diferenciar maiúsculas"""
+        # text_pattern_ops permite que o LIKE 'abc%' use o índice em qualquer collation
+        return f'CREATE INDEX IF NOT EXISTS {nome} ON {tabela} (lower({coluna}) text_pattern_ops)'
+
+    def filtro_prefixo(self, coluna):
+        """Retorna (condição, ordenação) de busca por prefixo que usam indice_prefixo"""
+        return f"lower({coluna}) LIKE ? ESCAPE '\\'", f'lower({coluna})'
+
+    def padrao_prefixo(self, texto):
+        """Parâmetro do filtro_prefixo para o texto digitado"""
+        return escapar_like(texto.lower()) + '%'
+
+    def gatilhos_alteracoes(self, tabelas):
+        """DDL dos gatilhos que alimentam a tabela alteracoes"""
+        # O lock consultivo (liberado no commit) serializa as transações que gravam
+        # alterações: sem ele, um seq menor poderia ficar visível depois de um maior
+        # e um dispositivo que já passou daquele ponto nunca o receberia
+        comandos = ['''
+            CREATE OR REPLACE FUNCTION registrar_alteracao() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_advisory_xact_lock(hashtext('rodamotriz_alteracoes'));
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO alteracoes (tabela, registro_id, operacao)
+                    VALUES (TG_TABLE_NAME, OLD.id, 'delete');
+                ELSE
+                    INSERT INTO alteracoes (tabela, registro_id, operacao)
+                    VALUES (TG_TABLE_NAME, NEW.id, lower(TG_OP));
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''']
+        for tabela in tabelas:
+            comandos.append(f'''
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_{tabela}_alteracoes') THEN
+                        CREATE TRIGGER trg_{tabela}_alteracoes
+                        AFTER INSERT OR UPDATE OR DELETE ON {tabela}
+                        FOR EACH ROW EXECUTE FUNCTION registrar_alteracao();
+                    END IF;
+                END
+                $$
+            ''')
+        return comandos
+
+    def travar(self, cursor, chave):
+        """Serializa, até o fim da transação, as gravações que usam a mesma chave"""
+        # Em READ COMMITTED duas transações não veem as inclusões uma da outra
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(?))', (chave,))
+
+    def fechar(self):
+        """Fecha o pool de conexões"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+
+def criar_backend():
+    """Escolhe o backend conforme RODAMOTRIZ_BACKEND / DATABASE_URL"""
+    tipo = os.environ.get('RODAMOTRIZ_BACKEND')
+    url = os.environ.get('DATABASE_URL', '')
+    if tipo is None:
+        tipo = 'postgres' if url.startswith(('postgres://', 'postgresql://')) else 'sqlite'
+
+    if tipo == 'sqlite':
+        return BackendSQLite()
+    if tipo in ('postgres', 'postgresql'):
+        return BackendPostgres()
+    raise Exception(f"Backend de armazenamento desconhecido: {tipo}")
@@ -0,0 +1,238 @@
+"""
+Arquivamento anual dos registros de trabalho da Rodamotriz
+
+Anos encerrados são movidos da tabela registros_trabalho para bancos SQLite
+separados (arquivo/registros_AAAA.db). Os totais de horas por máquina de cada
+ano arquivado ficam na tabela totais_arquivados do banco principal, para que
+os alarmes de manutenção continuem considerando todo o histórico.
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from rodamotriz import locais
+from rodamotriz.armazenamento import BackendSQLite
+from rodamotriz.caminhos import DIRETORIO_ARQUIVO
+
+# Colunas copiadas para o banco de arquivo (mesma ordem da tabela principal)
+COLUNAS_REGISTRO = ('id, cliente_id, maquina_id, local_trabalho, data_inicio, data_final, '
+                    'horimetro_inicial, horimetro_final, horas_trabalhadas, data_registro')
+
+# Ano do registro, extraído da data final no formato dd/mm/yyyy
+EXPR_ANO = "CAST(substr(data_final, 7, 4) AS INTEGER)"
+
+# Data final convertida para yyyymmdd, permitindo comparação por intervalo
+EXPR_DATA_ORDENAVEL = "substr({0}data_final, 7, 4) || substr({0}data_final, 4, 2) || substr({0}data_final, 1, 2)"
+
+
+def caminho_arquivo(ano, diretorio=DIRETORIO_ARQUIVO):
+    """Retorna o caminho do banco de arquivo de um ano"""
+    return os.path.join(diretorio, f'registros_{ano}.db')
+
+
+def criar_tabela_totais(cursor):
+    """Cria a tabela de totais dos anos arquivados no banco principal"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS totais_arquivados (
+            ano INTEGER NOT NULL,
+            maquina_id INTEGER NOT NULL,
+            registros INTEGER NOT NULL,
+            horas_trabalhadas REAL NOT NULL,
+            PRIMARY KEY (ano, maquina_id)
+        )
+    ''')
+
+
+def anos_arquivados(cursor):
+    """Lista os anos que já foram movidos para arquivo"""
+    cursor.execute('SELECT DISTINCT ano FROM totais_arquivados ORDER BY ano')
+    return [linha[0] for linha in cursor.fetchall()]
+
+
+def anos_no_periodo(cursor, desde=None, ate=None):
+    """Retorna os anos arquivados que intersectam o período informado (datas)"""
+    return [ano for ano in anos_arquivados(cursor)
+            if (desde is None or ano >= desde.year) and (ate is None or ano <= ate.year)]
+
+
+@contextmanager
+def anexar_arquivos(cursor, anos, diretorio=DIRETORIO_ARQUIVO):
+    """Anexa os bancos de arquivo dos anos informados como arq_AAAA"""
+    anexados = []
+    try:
+        for ano in anos:
+            caminho = caminho_arquivo(ano, diretorio)
+            if not os.path.exists(caminho):
+                continue
+            cursor.execute(f'ATTACH DATABASE ? AS arq_{int(ano)}', (caminho,))
+            anexados.append(int(ano))
+        yield anexados
+    finally:
+        for ano in anexados:
+            cursor.execute(f'DETACH DATABASE arq_{ano}')
+
+
+def filtro_periodo(desde=None, ate=None, prefixo=''):
+    """Monta a cláusula WHERE (e parâmetros) para o período sobre data_final"""
+    condicoes = []
+    parametros = []
+    expr = EXPR_DATA_ORDENAVEL.format(prefixo)
+    if desde is not None:
+        condicoes.append(f'{expr} >= ?')
+        parametros.append(desde.strftime('%Y%m%d'))
+    if ate is not None:
+        condicoes.append(f'{expr} <= ?')
+        parametros.append(ate.strftime('%Y%m%d'))
+    clausula = ('WHERE ' + ' AND '.join(condicoes)) if condicoes else ''
+    return clausula, parametros
+
+
+def totais_gerais(cursor):
+    """Retorna (registros, horas) somados de todos os anos arquivados"""
+    cursor.execute('''
+        SELECT COALESCE(SUM(registros), 0), COALESCE(SUM(horas_trabalhadas), 0)
+        FROM totais_arquivados
+    ''')
+    return cursor.fetchone()
+
+
+def buscar_registro(cursor, consulta, registro_id, diretorio=DIRETORIO_ARQUIVO):
+    """Procura um registro nos arquivos; a consulta usa {tabela} para registros_trabalho"""
+    for ano in anos_arquivados(cursor):
+        with anexar_arquivos(cursor, [ano], diretorio) as anexados:
+            if not anexados:
+                continue
+            cursor.execute(consulta.format(
+                tabela=f'arq_{ano}.registros_trabalho'), (registro_id,))
+            dados = cursor.fetchone()
+        if dados:
+            return dados
+    return None
+
+
+def atualizar_registro(cursor, ano, registro_id, valores):
+    """Regrava um registro do arquivo arq_AAAA (já anexado) e ajusta totais_arquivados
+
+    valores: colunas de COLUNAS_REGISTRO a gravar, com horas_trabalhadas já
+    recalculada. Os totais recebem só a diferença: as horas antigas saem da
+    máquina antiga e as novas entram na máquina nova, sem somar o ano de novo.
+    Retorna as horas antigas do registro.
+    """
+    tabela = f'arq_{int(ano)}.registros_trabalho'
+    cursor.execute(f'SELECT maquina_id, horas_trabalhadas FROM {tabela} WHERE id = ?', (registro_id,))
+    antigo = cursor.fetchone()
+    if antigo is None:
+        raise Exception(f"Registro {registro_id} não encontrado no arquivo de {ano}.")
+    maquina_antiga, horas_antigas = antigo
+
+    colunas = list(valores)
+    cursor.execute(f'UPDATE {tabela} SET {", ".join(f"{c} = ?" for c in colunas)} WHERE id = ?',
+                   [valores[c] for c in colunas] + [registro_id])
+
+    # A linha da máquina antiga fica mesmo zerada: os anos arquivados são
+    # descobertos por esta tabela
+    cursor.execute('''
+        UPDATE main.totais_arquivados
+        SET registros = registros - 1, horas_trabalhadas = horas_trabalhadas - ?
+        WHERE ano = ? AND maquina_id = ?
+    ''', (horas_antigas, ano, maquina_antiga))
+    cursor.execute('''
+        INSERT INTO main.totais_arquivados (ano, maquina_id, registros, horas_trabalhadas)
+        VALUES (?, ?, 1, ?)
+        ON CONFLICT(ano, maquina_id) DO UPDATE SET
+            registros = registros + 1,
+            horas_trabalhadas = horas_trabalhadas + excluded.horas_trabalhadas
+    ''', (ano, valores.get('maquina_id', maquina_antiga), valores['horas_trabalhadas']))
+    return horas_antigas
+
+
+def arquivar_ano(conn, ano, diretorio=DIRETORIO_ARQUIVO):
+    """Move os registros de um ano encerrado para o banco de arquivo daquele ano"""
+    ano = int(ano)
+    if ano >= datetime.now().year:
+        raise Exception(f"O ano {ano} ainda não foi encerrado e não pode ser arquivado.")
+
+    os.makedirs(diretorio, exist_ok=True)
+    cursor = conn.cursor()
+    criar_tabela_totais(cursor)
+    conn.commit()
+
+    cursor.execute('ATTACH DATABASE ? AS arq', (caminho_arquivo(ano, diretorio),))
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS arq.registros_trabalho (
+                id INTEGER PRIMARY KEY,
+                cliente_id INTEGER NOT NULL,
+                maquina_id INTEGER NOT NULL,
+                local_trabalho TEXT NOT NULL,
+                data_inicio TEXT NOT NULL,
+                data_final TEXT NOT NULL,
+                horimetro_inicial REAL NOT NULL,
+                horimetro_final REAL NOT NULL,
+                horas_trabalhadas REAL NOT NULL,
+                data_registro TIMESTAMP
+            )
+        ''')
+        try:
+            # OR REPLACE torna a operação repetível: com o banco principal em WAL, o
+            # commit não é atômico entre os dois arquivos, e uma queda no meio deixaria
+            # os registros já copiados para o arquivo e ainda presentes no principal.
+            # O arquivo guarda o nome do local, não o id, para não depender do principal
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO arq.registros_trabalho ({COLUNAS_REGISTRO})
+                SELECT {COLUNAS_REGISTRO} FROM main.{locais.VISAO}
+                WHERE {EXPR_ANO} = ?
+            ''', (ano,))
+
+            # Totais por máquina mantidos no banco principal para os alarmes
+            cursor.execute(f'''
+                INSERT INTO main.totais_arquivados (ano, maquina_id, registros, horas_trabalhadas)
+                SELECT ?, maquina_id, COUNT(*), SUM(horas_trabalhadas)
+                FROM main.registros_trabalho
+                WHERE {EXPR_ANO} = ?
+                GROUP BY maquina_id
+                ON CONFLICT(ano, maquina_id) DO UPDATE SET
+                    registros = registros + excluded.registros,
+                    horas_trabalhadas = horas_trabalhadas + excluded.horas_trabalhadas
+            ''', (ano, ano))
+
+            cursor.execute(
+                f'DELETE FROM main.registros_trabalho WHERE {EXPR_ANO} = ?', (ano,))
+            movidos = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        cursor.execute('DETACH DATABASE arq')
+
+    return movidos
+
+
+def main():
+    """Arquiva pela linha de comando: python -m rodamotriz.arquivamento ANO [ANO ...]"""
+    if len(sys.argv) < 2:
+        print("Uso: python -m rodamotriz.arquivamento ANO [ANO ...]")
+        sys.exit(1)
+
+    # Usa o mesmo arquivo do sistema (RODAMOTRIZ_DB ou rodamotriz.db)
+    banco = BackendSQLite()
+    banco.conectar()
+    try:
+        for ano in sys.argv[1:]:
+            try:
+                with banco.conexao() as conn:
+                    movidos = arquivar_ano(conn, int(ano))
+                print(f"✅ Ano {ano}: {movidos} registro(s) arquivado(s) em {caminho_arquivo(ano)}")
+            except ValueError:
+                print(f"❌ Ano inválido: {ano}")
+            except Exception as e:
+                print(f"❌ Erro ao arquivar {ano}: {e}")
+    finally:
+        banco.fechar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+"""
+Backup e restauração a quente do banco SQLite da Rodamotriz
+
+O backup usa a API de backup online do SQLite numa conexão própria. Com o banco
+em WAL (perfis equilibrado e seguro) a cópia é feita num único passo, dentro de
+uma transação de leitura: a aplicação web continua gravando durante a cópia, e
+a cópia é o retrato do início dela. Sem WAL (perfil padrao, journal de
+rollback) a leitura bloquearia as gravações até o fim da cópia, então ela é
+feita em passos de poucas páginas com uma pausa entre eles; cada gravação de
+outra conexão reinicia a cópia, e depois de MAX_REINICIOS o backup desiste
+(use um perfil com WAL num sistema com muitas gravações).
+Cada cópia é verificada, comprimida (gzip) e guardada com data e hora em
+backups/, mantendo apenas as mais recentes. Os bancos dos anos arquivados
+(arquivamento.py) listados em totais_arquivados da cópia entram no mesmo
+backup, na pasta <backup>.arquivo/ ao lado do .db.gz: sem eles, o banco
+restaurado apontaria para anos cujos registros não existem mais.
+
+A restauração descomprime e verifica o arquivo (e os anos arquivados) antes de
+tocar no banco, guarda uma cópia do estado atual e grava o conteúdo pela mesma API, de modo que as
+conexões já abertas pelos workers continuam válidas.
+
+Uso:
+    python -m rodamotriz.backup criar
+    python -m rodamotriz.backup listar
+    python -m rodamotriz.backup restaurar ARQUIVO [--sim]
+
+Configuração:
+    RODAMOTRIZ_BACKUPS         diretório das cópias (padrão: backups/)
+    RODAMOTRIZ_BACKUPS_MANTER  quantas cópias manter (padrão: 7)
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from rodamotriz import arquivamento
+from rodamotriz.caminhos import DIRETORIO_ARQUIVO, DIRETORIO_BACKUPS
+
+MANTER = int(os.environ.get('RODAMOTRIZ_BACKUPS_MANTER', 7))
+
+# Tabelas que um backup válido precisa ter
+TABELAS_OBRIGATORIAS = ('clientes', 'maquinas', 'registros_trabalho')
+TABELAS_ARQUIVO = ('registros_trabalho',)
+
+ARQUIVO_STATUS = 'ultimo_backup.json'
+
+# Sem WAL: páginas copiadas por passo, pausa entre passos (segundos) e quantas
+# vezes a cópia pode recomeçar por gravações de outras conexões
+PAGINAS_POR_PASSO = 256
+PAUSA_ENTRE_PASSOS = 0.005
+MAX_REINICIOS = 20
+
+
+def _nome(prefixo):
+    return f"{prefixo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db.gz"
+
+
+def _copiar(origem, destino):
+    """Copia origem -> destino (conexões SQLite); retorna as páginas copiadas
+
+    Em WAL, num único passo; nos demais modos de journal, em passos.
+    """
+    paginas = [0]
+    anterior = [None]
+    reinicios = [0]
+
+    def progresso(status, restantes, total):
+        paginas[0] = total
+        # Mais páginas restantes que no passo anterior: outra conexão gravou e a cópia recomeçou
+        if anterior[0] is not None and restantes > anterior[0]:
+            reinicios[0] += 1
+            if reinicios[0] > MAX_REINICIOS:
+                raise Exception(f"Backup interrompido: a cópia recomeçou {reinicios[0]} vezes por "
+                                f"gravações de outras conexões (use um perfil com WAL).")
+        anterior[0] = restantes
+
+    if origem.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal':
+        # Leitores não bloqueiam gravações no WAL: tudo num passo, sem reinícios
+        origem.backup(destino, pages=-1, progress=progresso)
+    else:
+        # Entre os passos o banco fica livre para as gravações da aplicação
+        origem.backup(destino, pages=PAGINAS_POR_PASSO, progress=progresso,
+                      sleep=PAUSA_ENTRE_PASSOS)
+    return paginas[0]
+
+
+def pasta_arquivos(copia):
+    """Pasta com os anos arquivados de um backup (ao lado do .db.gz)"""
+    return copia[:-len('.db.gz')] + '.arquivo'
+
+
+def _copiar_banco(caminho, copia):
+    origem = sqlite3.connect(caminho)
+    destino = sqlite3.connect(copia)
+    try:
+        return _copiar(origem, destino)
+    finally:
+        destino.close()
+        origem.close()
+
+
+def _comprimir(copia, final):
+    # Comprime para um nome temporário e renomeia: nunca fica um .gz pela metade
+    with open(copia, 'rb') as entrada, gzip.open(final + '.tmp', 'wb', compresslevel=6) as saida:
+        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+    os.replace(final + '.tmp', final)
+
+
+def _descomprimir(arquivo, copia):
+    try:
+        with gzip.open(arquivo, 'rb') as entrada, open(copia, 'wb') as saida:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+    except (OSError, EOFError) as e:
+        raise Exception(f"Não foi possível ler o backup {arquivo}: {e}")
+
+
+def _anos_arquivados(copia):
+    """Anos arquivados segundo a cópia do banco principal"""
+    conn = sqlite3.connect(copia)
+    try:
+        return arquivamento.anos_arquivados(conn.cursor())
+    except sqlite3.OperationalError:
+        # Banco anterior ao arquivamento anual, sem totais_arquivados
+        return []
+    finally:
+        conn.close()
+
+
+def verificar(caminho, tabelas=TABELAS_OBRIGATORIAS):
+    """Confere a integridade e as tabelas de um banco descomprimido; levanta Exception se inválido"""
+    conn = sqlite3.connect(caminho)
+    try:
+        try:
+            resultado = conn.execute('PRAGMA integrity_check').fetchone()[0]
+            existentes = {linha[0] for linha in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        except sqlite3.DatabaseError as e:
+            raise Exception(f"Backup inválido: {e}")
+        if resultado != 'ok':
+            raise Exception(f"Backup corrompido: {resultado}")
+        faltando = [t for t in tabelas if t not in existentes]
+        if faltando:
+            raise Exception(f"Backup sem as tabelas: {', '.join(faltando)}")
+    finally:
+        conn.close()
+
+
+def criar(caminho_banco, diretorio=DIRETORIO_BACKUPS, prefixo='rodamotriz', manter=MANTER,
+          diretorio_arquivo=DIRETORIO_ARQUIVO):
+    """Gera uma cópia verificada e comprimida do banco e dos anos arquivados; retorna o status gravado"""
+    os.makedirs(diretorio, exist_ok=True)
+    inicio = time.perf_counter()
+    iniciado_em = datetime.now().isoformat(timespec='seconds')
+
+    with tempfile.TemporaryDirectory(dir=diretorio) as temporario:
+        copia = os.path.join(temporario, 'copia.db')
+        paginas = _copiar_banco(caminho_banco, copia)
+        verificar(copia)
+        final = os.path.join(diretorio, _nome(prefixo))
+
+        # Os anos que a cópia considera arquivados (arquivar um ano durante o
+        # backup só entra no próximo)
+        anos = _anos_arquivados(copia)
+        pasta = os.path.join(temporario, 'arquivo')
+        os.makedirs(pasta)
+        for ano in anos:
+            caminho = arquivamento.caminho_arquivo(ano, diretorio_arquivo)
+            if not os.path.exists(caminho):
+                raise Exception(f"Banco do ano arquivado {ano} não encontrado: {caminho}")
+            copia_ano = os.path.join(temporario, f'registros_{ano}.db')
+            paginas += _copiar_banco(caminho, copia_ano)
+            verificar(copia_ano, TABELAS_ARQUIVO)
+            _comprimir(copia_ano, os.path.join(pasta, f'registros_{ano}.db.gz'))
+        tamanho = sum(os.path.getsize(os.path.join(pasta, nome)) for nome in os.listdir(pasta))
+        if anos:
+            os.replace(pasta, pasta_arquivos(final))
+
+        # O .db.gz é gravado por último: só aparece em listar() com os anos já copiados
+        _comprimir(copia, final)
+
+    status = {
+        'arquivo': os.path.basename(final),
+        'inicio': iniciado_em,
+        'duracao': round(time.perf_counter() - inicio, 3),
+        'paginas': paginas,
+        'bytes': os.path.getsize(final) + tamanho,
+        'anos_arquivados': anos,
+    }
+    # O status acompanha só os backups regulares, não a cópia feita antes de restaurar
+    if prefixo == 'rodamotriz':
+        with open(os.path.join(diretorio, ARQUIVO_STATUS), 'w') as arquivo:
+            json.dump(status, arquivo)
+
+    rotacionar(diretorio, prefixo, manter)
+    return status
+
+
+def listar(diretorio=DIRETORIO_BACKUPS, prefixo='*'):
+    """Cópias existentes, da mais recente para a mais antiga"""
+    return sorted(glob.glob(os.path.join(diretorio, f'{prefixo}_*.db.gz')), reverse=True)
+
+
+def rotacionar(diretorio=DIRETORIO_BACKUPS, prefixo='rodamotriz', manter=MANTER):
+    """Apaga as cópias mais antigas além das `manter` mais recentes"""
+    for antigo in listar(diretorio, prefixo)[manter:]:
+        os.remove(antigo)
+        shutil.rmtree(pasta_arquivos(antigo), ignore_errors=True)
+
+
+def status(diretorio=DIRETORIO_BACKUPS):
+    """Último backup (arquivo, início, duração) e quantas cópias existem"""
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_STATUS)) as arquivo:
+            ultimo = json.load(arquivo)
+    except (OSError, ValueError):
+        ultimo = None
+    if ultimo:
+        ultimo['segundos_desde'] = int(
+            (datetime.now() - datetime.fromisoformat(ultimo['inicio'])).total_seconds())
+    return {'ultimo': ultimo, 'copias': len(listar(diretorio, 'rodamotriz'))}
+
+
+def _gravar(copia, caminho):
+    """Grava o conteúdo da cópia sobre o banco em caminho"""
+    origem = sqlite3.connect(copia)
+    destino = sqlite3.connect(caminho, timeout=30)
+    try:
+        # Gravado de uma vez: a restauração não pode ser intercalada com outras gravações
+        origem.backup(destino)
+    finally:
+        destino.close()
+        origem.close()
+
+
+def restaurar(arquivo, caminho_banco, diretorio=DIRETORIO_BACKUPS, diretorio_arquivo=DIRETORIO_ARQUIVO):
+    """Restaura uma cópia (e os anos arquivados dela) sobre o banco em uso; retorna o backup do estado anterior"""
+    if not os.path.exists(arquivo):
+        arquivo = os.path.join(diretorio, arquivo)
+
+    with tempfile.TemporaryDirectory(dir=diretorio) as temporario:
+        copia = os.path.join(temporario, 'restaurar.db')
+        _descomprimir(arquivo, copia)
+        # Nada é alterado se a cópia ou algum ano arquivado não passar na verificação
+        verificar(copia)
+        pasta = pasta_arquivos(arquivo)
+        anos = {}
+        # Backups anteriores à cópia dos anos arquivados não têm a pasta: os
+        # bancos de arquivo atuais ficam como estão
+        if os.path.isdir(pasta):
+            for ano in _anos_arquivados(copia):
+                copia_ano = os.path.join(temporario, f'registros_{ano}.db')
+                comprimido = os.path.join(pasta, f'registros_{ano}.db.gz')
+                if not os.path.exists(comprimido):
+                    raise Exception(f"Backup incompleto: falta o ano arquivado {ano} em {pasta}")
+                _descomprimir(comprimido, copia_ano)
+                verificar(copia_ano, TABELAS_ARQUIVO)
+                anos[ano] = copia_ano
+
+        anterior = criar(caminho_banco, diretorio, prefixo='antes_restauracao',
+                         diretorio_arquivo=diretorio_arquivo)
+
+        _gravar(copia, caminho_banco)
+        os.makedirs(diretorio_arquivo, exist_ok=True)
+        for ano, copia_ano in anos.items():
+            _gravar(copia_ano, arquivamento.caminho_arquivo(ano, diretorio_arquivo))
+
+    verificar(caminho_banco)
+    return anterior
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m rodamotriz.backup',
+                                     description='Backup e restauração do banco SQLite')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comandos.add_parser('criar', help='gera uma nova cópia')
+    comandos.add_parser('listar', help='lista as cópias existentes')
+    restaurar_ = comandos.add_parser('restaurar', help='restaura uma cópia sobre o banco atual')
+    restaurar_.add_argument('arquivo')
+    restaurar_.add_argument('--sim', action='store_true', help='não pedir confirmação')
+    args = parser.parse_args()
+
+    # Mesmo arquivo do sistema (RODAMOTRIZ_DB ou rodamotriz.db)
+    from rodamotriz.armazenamento import BackendSQLite
+    caminho_banco = BackendSQLite().caminho
+
+    try:
+        if args.comando == 'criar':
+            resultado = criar(caminho_banco)
+            print(f"✅ Backup {resultado['arquivo']}: {resultado['paginas']} páginas, "
+                  f"{resultado['bytes'] / 1024:.0f} KB em {resultado['duracao']:.2f}s")
+            if resultado['anos_arquivados']:
+                print(f"   Anos arquivados incluídos: {', '.join(map(str, resultado['anos_arquivados']))}")
+        elif args.comando == 'listar':
+            for caminho in listar():
+                print(f"{os.path.basename(caminho):<45} {os.path.getsize(caminho) / 1024:>10.0f} KB")
+        else:
+            if not args.sim:
+                resposta = input(f"Substituir o conteúdo de {caminho_banco} por {args.arquivo}? (s/n): ")
+                if resposta.strip().lower() != 's':
+                    print("Cancelado.")
+                    return
+            anterior = restaurar(args.arquivo, caminho_banco)
+            print(f"✅ Banco restaurado. Estado anterior salvo em {anterior['arquivo']}")
+    except Exception as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""
+Caminhos padrão do sistema Rodamotriz (relativos à raiz do projeto)
+"""
+
+import os
+
+DIRETORIO_BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CAMINHO_BANCO = os.path.join(DIRETORIO_BASE, 'rodamotriz.db')
+DIRETORIO_RELATORIOS = os.environ.get('RODAMOTRIZ_RELATORIOS') or os.path.join(DIRETORIO_BASE, 'relatorios')
+DIRETORIO_ARQUIVO = os.environ.get('RODAMOTRIZ_ARQUIVO') or os.path.join(DIRETORIO_BASE, 'arquivo')
+DIRETORIO_BACKUPS = os.environ.get('RODAMOTRIZ_BACKUPS') or os.path.join(DIRETORIO_BASE, 'backups')
+DIRETORIO_PERFIS = os.environ.get('RODAMOTRIZ_PERFIS') or os.path.join(DIRETORIO_BASE, 'perfis')
+CAMINHO_ANALISE = os.environ.get('RODAMOTRIZ_ANALISE') or os.path.join(DIRETORIO_BASE, 'analise.db')
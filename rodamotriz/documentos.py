@@ -0,0 +1,149 @@
+"""
+CNPJ/CPF dos clientes: índice único e deduplicação
+
+O documento é gravado normalizado (sem pontuação, com os dígitos verificadores
+conferidos em validacao.py) e um índice único sobre ele impede cadastros
+repetidos e torna a busca de um cliente pelo documento uma consulta pontual.
+
+Bancos anteriores à normalização podem ter o mesmo cliente cadastrado mais de
+uma vez, com ou sem pontuação; enquanto houver documentos repetidos o índice
+único não é criado. A deduplicação percorre os clientes uma única vez,
+agrupando pelo documento normalizado: em cada grupo fica o cliente mais antigo
+(menor id), os registros de trabalho (inclusive os dos anos arquivados),
+reservas, contratos e faturas dos demais passam para ele e os repetidos são
+removidos, tudo numa única transação. Documentos inválidos não são mesclados;
+ficam como estão, para correção manual.
+
+    python app.py clientes dedup [--simular]
+"""
+
+from rodamotriz import validacao
+
+INDICE = 'idx_clientes_documento'
+
+# Tabelas do banco principal que apontam para clientes(id) pela coluna cliente_id
+# (faturas também, mas duas faturas do mesmo mês precisam virar uma; ver _mesclar_faturas)
+REFERENCIAS = ('registros_trabalho', 'reservas', 'contratos')
+
+# Documentos por consulta ao procurar vários de uma vez
+TAMANHO_LOTE = 500
+
+
+def criar_indice(cursor, erro_integridade):
+    """Cria o índice único do CNPJ/CPF; retorna False se ainda há documentos repetidos"""
+    # Savepoint: no PostgreSQL o erro aborta a transação inteira
+    cursor.execute('SAVEPOINT indice_documento')
+    try:
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {INDICE} ON clientes (cnpj_cpf)')
+        criado = True
+    except erro_integridade:
+        cursor.execute('ROLLBACK TO SAVEPOINT indice_documento')
+        criado = False
+    cursor.execute('RELEASE SAVEPOINT indice_documento')
+    return criado
+
+
+def ids_por_documento(cursor, documentos):
+    """{documento: id} dos clientes já cadastrados com os documentos informados"""
+    documentos = list(documentos)
+    encontrados = {}
+    for inicio in range(0, len(documentos), TAMANHO_LOTE):
+        lote = documentos[inicio:inicio + TAMANHO_LOTE]
+        cursor.execute(f'SELECT cnpj_cpf, id FROM clientes WHERE cnpj_cpf IN ({", ".join("?" * len(lote))})',
+                       lote)
+        encontrados.update(cursor.fetchall())
+    return encontrados
+
+
+def agrupar(cursor):
+    """Percorre os clientes uma vez, por id
+
+    Retorna ({id repetido: id mantido}, {id mantido: documento normalizado a
+    regravar}, [ids com documento inválido]).
+    """
+    mantidos = {}
+    mapa = {}
+    regravar = {}
+    invalidos = []
+    cursor.execute('SELECT id, cnpj_cpf FROM clientes ORDER BY id')
+    for cliente_id, texto in cursor.fetchall():
+        documento = validacao.limpar_documento(texto)
+        if not validacao.documento_valido(documento):
+            invalidos.append(cliente_id)
+        elif documento in mantidos:
+            mapa[cliente_id] = mantidos[documento]
+        else:
+            mantidos[documento] = cliente_id
+            if texto != documento:
+                regravar[cliente_id] = documento
+    return mapa, regravar, invalidos
+
+
+def _mesclar_faturas(cursor):
+    """Passa as faturas dos repetidos para o cliente mantido; retorna quantas mudaram"""
+    cursor.execute('''
+        SELECT f.id, m.novo, f.competencia, f.horas, f.valor
+        FROM faturas f
+        JOIN mapa_clientes m ON m.antigo = f.cliente_id
+        ORDER BY f.id
+    ''')
+    faturas = cursor.fetchall()
+    for fatura_id, novo, competencia, horas, valor in faturas:
+        cursor.execute('SELECT id, valor FROM faturas WHERE competencia = ? AND cliente_id = ?',
+                       (competencia, novo))
+        destino = cursor.fetchone()
+        if destino is None:
+            cursor.execute('UPDATE faturas SET cliente_id = ? WHERE id = ?', (novo, fatura_id))
+            continue
+        # O mesmo cliente faturado duas vezes no mês: os itens vão para uma só fatura
+        cursor.execute('UPDATE faturas SET horas = horas + ?, valor = ? WHERE id = ?',
+                       (horas, round(destino[1] + valor, 2), destino[0]))
+        cursor.execute('UPDATE itens_fatura SET fatura_id = ? WHERE fatura_id = ?', (destino[0], fatura_id))
+        cursor.execute('DELETE FROM faturas WHERE id = ?', (fatura_id,))
+    return len(faturas)
+
+
+def deduplicar(cursor, erro_integridade, tabelas_arquivo=(), simular=False):
+    """Mescla os clientes com o mesmo documento e normaliza os demais; retorna o resumo
+
+    tabelas_arquivo: registros_trabalho dos anos arquivados, já anexados ao cursor.
+    Com simular, só conta o que seria feito.
+    """
+    mapa, regravar, invalidos = agrupar(cursor)
+    resumo = {
+        'mesclados': len(mapa),
+        'mantidos': len(set(mapa.values())),
+        'normalizados': len(regravar),
+        'invalidos': invalidos,
+        'registros': 0,
+        'faturas': 0,
+        'indice': None,
+    }
+    if simular:
+        return resumo
+
+    if mapa:
+        # No SQLite o CREATE TEMP TABLE, feito antes de qualquer alteração, é
+        # confirmado na hora e sobrevive ao rollback: uma falha no meio deixa a
+        # tabela na conexão, por isso ela é reaproveitada e esvaziada aqui
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS mapa_clientes '
+                       '(antigo INTEGER PRIMARY KEY, novo INTEGER NOT NULL)')
+        cursor.execute('DELETE FROM mapa_clientes')
+        cursor.executemany('INSERT INTO mapa_clientes (antigo, novo) VALUES (?, ?)', list(mapa.items()))
+        for tabela in REFERENCIAS + tuple(tabelas_arquivo):
+            cursor.execute(f'''
+                UPDATE {tabela}
+                SET cliente_id = (SELECT novo FROM mapa_clientes WHERE antigo = {tabela}.cliente_id)
+                WHERE cliente_id IN (SELECT antigo FROM mapa_clientes)
+            ''')
+            if tabela.endswith('registros_trabalho'):
+                resumo['registros'] += cursor.rowcount
+        resumo['faturas'] = _mesclar_faturas(cursor)
+        cursor.execute('DELETE FROM clientes WHERE id IN (SELECT antigo FROM mapa_clientes)')
+        cursor.execute('DROP TABLE mapa_clientes')
+
+    # Só os mantidos são regravados, então nenhum documento normalizado colide
+    cursor.executemany('UPDATE clientes SET cnpj_cpf = ? WHERE id = ?',
+                       [(documento, cliente_id) for cliente_id, documento in regravar.items()])
+    resumo['indice'] = criar_indice(cursor, erro_integridade)
+    return resumo
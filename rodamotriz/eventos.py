@@ -0,0 +1,176 @@
+"""
+Difusão de eventos ao vivo (Server-Sent Events) para o painel e a lista de trabalhos
+
+A fonte dos eventos é o log de alterações (alteracoes.py): uma única thread por
+processo acompanha o log e distribui cada lote de eventos, montado uma vez, para
+as filas de todos os ouvintes daquele processo. Assim, um registro gravado em
+qualquer worker (ou pelo CLI) chega a todos os navegadores conectados, e cada
+ouvinte custa apenas uma fila e uma thread bloqueada esperando nela.
+
+Cada ouvinte prende uma thread do worker gthread por até 5 minutos (DURACAO_SSE
+em app_web.py), então o limite de ouvintes por processo deixa sempre
+RESERVA_THREADS threads livres para as páginas e a API (com as 4 threads padrão,
+2 ouvintes). Acima dele, /eventos responde 503 com Retry-After. Para muitos
+ouvintes use o modo assíncrono (app_asgi.py), onde um ouvinte não ocupa thread.
+
+Configuração:
+    GUNICORN_THREADS           threads por worker (padrão: 4, como em gunicorn.conf.py)
+    RODAMOTRIZ_SSE_MAX         ouvintes simultâneos por processo (padrão e máximo:
+                               GUNICORN_THREADS - 2)
+    RODAMOTRIZ_SSE_INTERVALO   segundos entre consultas ao log (padrão: 1)
+"""
+
+import os
+import queue
+import threading
+
+from rodamotriz import alteracoes
+
+# Threads do worker que os ouvintes nunca ocupam
+RESERVA_THREADS = 2
+# O worker sync atende uma requisição por vez: nenhum ouvinte cabe nele
+THREADS = (1 if os.environ.get('GUNICORN_WORKER_CLASS', 'gthread') == 'sync'
+           else int(os.environ.get('GUNICORN_THREADS', 4)))
+MAX_OUVINTES = max(0, min(int(os.environ.get('RODAMOTRIZ_SSE_MAX', THREADS)), THREADS - RESERVA_THREADS))
+INTERVALO = float(os.environ.get('RODAMOTRIZ_SSE_INTERVALO', 1))
+
+# Eventos pendentes por ouvinte; quem não consome a tempo é desconectado
+TAMANHO_FILA = 100
+
+
+def formatar_trabalho(trabalho):
+    """Linha de listar_trabalhos no formato enviado ao navegador"""
+    return {
+        'id': trabalho[0],
+        'cliente': trabalho[1],
+        'maquina': f'{trabalho[2]} {trabalho[3]}',
+        'local': trabalho[4],
+        'periodo': f'{trabalho[5]} a {trabalho[6]}',
+        'horas': trabalho[7],
+        'data_registro': trabalho[8][:10] if trabalho[8] else 'N/A',
+    }
+
+
+def montar_eventos(sistema, desde):
+    """Eventos (seq, nome, dados) das alterações posteriores a desde
+
+    Retorna (eventos, ultimo). Levanta alteracoes.LogTruncado se o log já foi
+    podado além de desde.
+    """
+    lista = []
+    ultimo = desde
+    while True:
+        resultado = sistema.alteracoes_desde(ultimo, alteracoes.LIMITE_MAXIMO)
+        lista.extend(resultado['alteracoes'])
+        ultimo = resultado['ultimo']
+        if not resultado['mais']:
+            break
+    if not lista:
+        return [], ultimo
+
+    # Linhas completas (com nomes de cliente e máquina) numa única consulta
+    ids = {a['id'] for a in lista
+           if a['tabela'] == 'registros_trabalho' and a['operacao'] != 'delete'}
+    linhas = {t[0]: formatar_trabalho(t) for t in sistema.trabalhos_por_id(sorted(ids))}
+
+    eventos = []
+    for alteracao in lista:
+        if alteracao['tabela'] != 'registros_trabalho':
+            continue
+        if alteracao['operacao'] == 'delete':
+            eventos.append((alteracao['seq'], 'trabalho_removido', {'id': alteracao['id']}))
+        elif alteracao['id'] in linhas:
+            eventos.append((alteracao['seq'], 'trabalho', linhas[alteracao['id']]))
+
+    # Um único evento de totais por lote, qualquer que seja a tabela alterada
+    eventos.append((ultimo, 'totais', sistema.estatisticas()))
+    return eventos, ultimo
+
+
+class Difusor:
+    """Acompanha o log de alterações e distribui os eventos aos ouvintes deste processo"""
+
+    def __init__(self, sistema, max_ouvintes=MAX_OUVINTES, intervalo=INTERVALO):
+        self.sistema = sistema
+        self.max_ouvintes = max_ouvintes
+        self.intervalo = intervalo
+        self.ouvintes = set()
+        self.lock = threading.Lock()
+        self.acordar = threading.Event()
+        self.thread = None
+        self.ultimo = 0
+
+    def inscrever(self):
+        """Cria a fila de um novo ouvinte e retorna (fila, seq a partir do qual ela recebe)
+
+        Retorna None se o limite de ouvintes do processo foi atingido.
+        """
+        with self.lock:
+            if len(self.ouvintes) >= self.max_ouvintes:
+                return None
+            # A thread só nasce no primeiro ouvinte, já dentro do worker (após o fork)
+            if self.thread is None or not self.thread.is_alive():
+                self.ultimo = self._ultimo_seq()
+                self.thread = threading.Thread(target=self._laco, name='difusor-sse', daemon=True)
+                self.thread.start()
+            fila = self._nova_fila()
+            self.ouvintes.add(fila)
+            return fila, self.ultimo
+
+    def cancelar(self, fila):
+        """Remove o ouvinte (conexão encerrada)"""
+        with self.lock:
+            self.ouvintes.discard(fila)
+
+    def notificar(self):
+        """Antecipa a próxima consulta ao log (chamado após gravações neste processo)"""
+        self.acordar.set()
+
+    def _ultimo_seq(self):
+        with self.sistema.banco.cursor() as cursor:
+            return alteracoes.ultimo_seq(cursor)
+
+    def _laco(self):
+        while True:
+            self.acordar.wait(self.intervalo)
+            self.acordar.clear()
+            with self.lock:
+                if not self.ouvintes:
+                    # Sem ouvintes a thread termina; o próximo inscrito a recria
+                    self.thread = None
+                    return
+            try:
+                eventos, self.ultimo = montar_eventos(self.sistema, self.ultimo)
+            except alteracoes.LogTruncado:
+                # Log podado enquanto ninguém olhava: recomeça do fim, avisando as páginas
+                self.ultimo = self._ultimo_seq()
+                eventos = [(self.ultimo, 'recarregar', {})]
+            except Exception:
+                # Falha passageira no banco: tenta de novo na próxima volta
+                continue
+            if eventos:
+                self._distribuir(eventos)
+
+    def _nova_fila(self):
+        return queue.Queue(TAMANHO_FILA)
+
+    def _distribuir(self, eventos):
+        with self.lock:
+            ouvintes = list(self.ouvintes)
+        for fila in ouvintes:
+            self._entregar(fila, eventos)
+
+    def _entregar(self, fila, eventos):
+        """Põe os eventos na fila do ouvinte (chamado na thread do difusor)"""
+        try:
+            for evento in eventos:
+                fila.put_nowait(evento)
+        except queue.Full:
+            # Ouvinte lento: é desligado e o navegador reconecta recuperando o que perdeu
+            self.cancelar(fila)
+            try:
+                while True:
+                    fila.get_nowait()
+            except queue.Empty:
+                pass
+            fila.put_nowait(None)
@@ -0,0 +1,228 @@
+"""
+Faturamento mensal: horas trabalhadas × contratos de valor por hora
+
+Um contrato vale para um cliente e, opcionalmente, para uma máquina específica
+(sem máquina, cobre todas as máquinas do cliente que não tenham contrato
+próprio). Tem valor por hora, mínimo de horas faturadas no mês e faixas
+progressivas: a partir de N horas no mês, as horas excedentes passam a valer
+outro valor.
+
+O cálculo do mês inteiro é uma única consulta: soma as horas dos registros por
+cliente e máquina, associa cada par ao contrato vigente, aplica o mínimo e
+reparte as horas entre as faixas. O resultado vira uma fatura por cliente com
+um item por contrato; rodar de novo o mesmo mês recalcula as faturas dele.
+
+O mês de um registro é o da data final. Registros sem contrato vigente não
+são faturados e aparecem no resumo da execução. Um mês de ano já arquivado é
+faturado com os registros do banco de arquivo daquele ano, anexado antes.
+"""
+
+import re
+
+# Competência (mês faturado) no formato AAAA-MM
+PADRAO_COMPETENCIA = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+# Competência do registro, a partir da data final dd/mm/yyyy
+EXPR_COMPETENCIA = "substr(r.data_final, 7, 4) || '-' || substr(r.data_final, 4, 2)"
+
+# Contrato vigente na competência (o mais recente, se houver sobreposição)
+_CONTRATO_VIGENTE = '''
+    SELECT c.id FROM contratos c
+    WHERE c.cliente_id = h.cliente_id AND {maquina}
+      AND c.inicio <= ? AND (c.fim IS NULL OR c.fim >= ?)
+    ORDER BY c.inicio DESC, c.id DESC LIMIT 1
+'''
+
+CALCULO = f'''
+    WITH horas AS (
+        SELECT r.cliente_id, r.maquina_id,
+               SUM(r.horas_trabalhadas) AS horas, COUNT(*) AS registros
+        FROM {{registros}} r
+        WHERE {EXPR_COMPETENCIA} = ?
+        GROUP BY r.cliente_id, r.maquina_id
+    ),
+    vinculos AS (
+        -- Contrato da máquina, senão o contrato geral do cliente
+        SELECT h.cliente_id, h.maquina_id, h.horas, h.registros,
+               COALESCE(({_CONTRATO_VIGENTE.format(maquina='c.maquina_id = h.maquina_id')}),
+                        ({_CONTRATO_VIGENTE.format(maquina='c.maquina_id IS NULL')})) AS contrato_id
+        FROM horas h
+    ),
+    por_contrato AS (
+        SELECT v.contrato_id, v.cliente_id, c.maquina_id,
+               SUM(v.horas) AS horas, SUM(v.registros) AS registros,
+               CASE WHEN SUM(v.horas) < c.horas_minimas THEN c.horas_minimas
+                    ELSE SUM(v.horas) END AS faturadas
+        FROM vinculos v
+        JOIN contratos c ON c.id = v.contrato_id
+        GROUP BY v.contrato_id, v.cliente_id, c.maquina_id, c.horas_minimas
+    ),
+    faixas AS (
+        -- O valor base do contrato é a faixa que começa em zero
+        SELECT t.contrato_id, t.a_partir_de, t.valor_hora,
+               LEAD(t.a_partir_de) OVER (PARTITION BY t.contrato_id ORDER BY t.a_partir_de) AS ate
+        FROM (
+            SELECT id AS contrato_id, 0 AS a_partir_de, valor_hora FROM contratos
+            UNION ALL
+            SELECT contrato_id, a_partir_de, valor_hora FROM faixas_contrato
+        ) t
+    )
+    SELECT p.cliente_id, p.contrato_id, p.maquina_id, p.registros, p.horas, p.faturadas,
+           SUM(f.valor_hora * (CASE WHEN f.ate IS NULL OR p.faturadas < f.ate
+                                    THEN p.faturadas ELSE f.ate END - f.a_partir_de)) AS valor
+    FROM por_contrato p
+    JOIN faixas f ON f.contrato_id = p.contrato_id AND f.a_partir_de < p.faturadas
+    GROUP BY p.cliente_id, p.contrato_id, p.maquina_id, p.registros, p.horas, p.faturadas
+    ORDER BY p.cliente_id, p.contrato_id
+'''
+
+# Horas do mês que nenhum contrato vigente cobre
+SEM_CONTRATO = f'''
+    SELECT h.cliente_id, h.maquina_id, h.horas FROM (
+        SELECT r.cliente_id, r.maquina_id, SUM(r.horas_trabalhadas) AS horas
+        FROM {{registros}} r
+        WHERE {EXPR_COMPETENCIA} = ?
+        GROUP BY r.cliente_id, r.maquina_id
+    ) h
+    WHERE NOT EXISTS ({_CONTRATO_VIGENTE.format(
+        maquina='(c.maquina_id = h.maquina_id OR c.maquina_id IS NULL)')})
+    ORDER BY h.cliente_id, h.maquina_id
+'''
+
+
+def criar_tabelas(cursor):
+    """Cria as tabelas de contratos, faixas, faturas e itens"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contratos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER NOT NULL,
+            maquina_id INTEGER,
+            valor_hora REAL NOT NULL,
+            horas_minimas REAL NOT NULL DEFAULT 0,
+            inicio TEXT NOT NULL,
+            fim TEXT,
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id),
+            FOREIGN KEY (maquina_id) REFERENCES maquinas(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_contratos_cliente
+        ON contratos (cliente_id, maquina_id, inicio)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS faixas_contrato (
+            contrato_id INTEGER NOT NULL,
+            a_partir_de REAL NOT NULL,
+            valor_hora REAL NOT NULL,
+            PRIMARY KEY (contrato_id, a_partir_de),
+            FOREIGN KEY (contrato_id) REFERENCES contratos(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS faturas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER NOT NULL,
+            competencia TEXT NOT NULL,
+            horas REAL NOT NULL,
+            valor REAL NOT NULL,
+            data_geracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (competencia, cliente_id),
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS itens_fatura (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fatura_id INTEGER NOT NULL,
+            contrato_id INTEGER NOT NULL,
+            maquina_id INTEGER,
+            registros INTEGER NOT NULL,
+            horas REAL NOT NULL,
+            horas_faturadas REAL NOT NULL,
+            valor REAL NOT NULL,
+            FOREIGN KEY (fatura_id) REFERENCES faturas(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_itens_fatura ON itens_fatura (fatura_id)')
+
+
+def validar_competencia(competencia):
+    """Levanta Exception se a competência não estiver no formato AAAA-MM"""
+    if not PADRAO_COMPETENCIA.match(competencia or ''):
+        raise Exception(f"Competência inválida: {competencia} (use AAAA-MM)")
+
+
+def validar_faixas(valor_hora, horas_minimas, faixas):
+    """Confere valores do contrato; retorna as faixas [(a_partir_de, valor_hora)] ordenadas"""
+    if valor_hora < 0 or horas_minimas < 0:
+        raise Exception("Valor por hora e mínimo de horas não podem ser negativos.")
+    faixas = sorted((float(a_partir_de), float(valor)) for a_partir_de, valor in faixas)
+    inicios = [a_partir_de for a_partir_de, _ in faixas]
+    if any(a_partir_de <= 0 for a_partir_de in inicios) or len(set(inicios)) != len(inicios):
+        raise Exception("As faixas devem começar em horas positivas e distintas.")
+    if any(valor < 0 for _, valor in faixas):
+        raise Exception("O valor por hora de uma faixa não pode ser negativo.")
+    return faixas
+
+
+def _registros(anexados):
+    """Origem dos registros: a tabela principal mais os arquivos anexados (arq_AAAA)"""
+    if not anexados:
+        return 'registros_trabalho'
+    colunas = 'cliente_id, maquina_id, data_final, horas_trabalhadas'
+    return '(' + ' UNION ALL '.join(
+        f'SELECT {colunas} FROM {tabela}'
+        for tabela in ['main.registros_trabalho'] + [f'arq_{ano}.registros_trabalho' for ano in anexados]) + ')'
+
+
+def faturar(cursor, competencia, anexados=()):
+    """Calcula e grava as faturas da competência; retorna o resumo da execução
+
+    anexados: anos arquivados já anexados como arq_AAAA cujos registros também contam.
+    """
+    registros = _registros(anexados)
+    # Cada subconsulta de contrato vigente recebe a competência duas vezes
+    cursor.execute(CALCULO.format(registros=registros), (competencia,) + (competencia,) * 4)
+    itens = cursor.fetchall()
+    cursor.execute(SEM_CONTRATO.format(registros=registros), (competencia,) * 3)
+    sem_contrato = cursor.fetchall()
+
+    # Recalcular o mês substitui as faturas anteriores dele
+    cursor.execute('''
+        DELETE FROM itens_fatura
+        WHERE fatura_id IN (SELECT id FROM faturas WHERE competencia = ?)
+    ''', (competencia,))
+    cursor.execute('DELETE FROM faturas WHERE competencia = ?', (competencia,))
+
+    por_cliente = {}
+    for cliente_id, *item in itens:
+        por_cliente.setdefault(cliente_id, []).append(item)
+
+    total = 0.0
+    for cliente_id, itens_cliente in por_cliente.items():
+        valores = [round(item[-1], 2) for item in itens_cliente]
+        cursor.execute('''
+            INSERT INTO faturas (cliente_id, competencia, horas, valor) VALUES (?, ?, ?, ?)
+        ''', (cliente_id, competencia, sum(item[3] for item in itens_cliente), round(sum(valores), 2)))
+        cursor.execute('SELECT id FROM faturas WHERE competencia = ? AND cliente_id = ?',
+                       (competencia, cliente_id))
+        fatura_id = cursor.fetchone()[0]
+        cursor.executemany('''
+            INSERT INTO itens_fatura
+                (fatura_id, contrato_id, maquina_id, registros, horas, horas_faturadas, valor)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(fatura_id, *item[:-1], valor) for item, valor in zip(itens_cliente, valores)])
+        total += sum(valores)
+
+    return {
+        'competencia': competencia,
+        'faturas': len(por_cliente),
+        'valor': round(total, 2),
+        'sem_contrato': sem_contrato,
+    }
+
+
+def moeda(valor):
+    """Valor em reais no formato brasileiro (R$ 1.234,56)"""
+    return 'R$ ' + f'{valor:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')
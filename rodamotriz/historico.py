@@ -0,0 +1,127 @@
+"""
+Histórico de um cliente ou de uma máquina (páginas /clientes/<id> e /maquinas/<id>)
+
+Cada página mostra os totais e os registros do mais recente para o mais antigo,
+em páginas. Dois índices compostos começam pelo cliente/máquina e seguem pelo
+id do registro:
+
+- os totais (quantidade, horas e, na máquina, o maior horímetro) são lidos
+  só do índice, que já traz as colunas somadas;
+- cada página é uma busca por faixa no índice (id menor que o último mostrado),
+  seguida da leitura de apenas as linhas da página.
+
+Assim o custo depende do histórico do próprio cliente/máquina, não do tamanho
+da tabela de registros. Os totais da máquina incluem os anos arquivados
+(totais_arquivados); os do cliente contam só os registros ativos.
+"""
+
+from rodamotriz import locais
+
+# Limites de horas acumuladas por modelo que disparam manutenção
+LIMITES_ALARME = [500, 1000, 1500, 2000]
+
+# Registros por página do histórico
+TAMANHO_PAGINA = 50
+
+# Colunas de cada registro na página, nas duas telas
+COLUNAS_REGISTRO = '''
+    r.id, c.nome, m.marca, m.modelo, r.local_trabalho, r.data_inicio, r.data_final,
+    r.horimetro_inicial, r.horimetro_final, r.horas_trabalhadas
+'''
+
+
+def criar_indices(cursor):
+    """Índices de cobertura do histórico por cliente e por máquina"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_registros_cliente
+        ON registros_trabalho (cliente_id, id, horas_trabalhadas)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_registros_maquina
+        ON registros_trabalho (maquina_id, id, horas_trabalhadas, horimetro_final)
+    ''')
+
+
+def pagina(cursor, coluna, valor, antes=None, tamanho=TAMANHO_PAGINA):
+    """Registros com coluna (cliente_id ou maquina_id) = valor, do mais recente
+
+    antes: id do último registro da página anterior. Retorna (registros, id para
+    a próxima página ou None na última).
+    """
+    condicao = '' if antes is None else 'AND r.id < ?'
+    cursor.execute(f'''
+        SELECT {COLUNAS_REGISTRO}
+        FROM {locais.VISAO} r
+        JOIN clientes c ON r.cliente_id = c.id
+        JOIN maquinas m ON r.maquina_id = m.id
+        WHERE r.{coluna} = ? {condicao}
+        ORDER BY r.id DESC
+        LIMIT ?
+    ''', [valor] + ([] if antes is None else [antes]) + [tamanho + 1])
+    registros = cursor.fetchall()
+    if len(registros) > tamanho:
+        return registros[:tamanho], registros[tamanho - 1][0]
+    return registros, None
+
+
+def totais_cliente(cursor, cliente_id):
+    """(registros, horas) ativos do cliente"""
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(horas_trabalhadas), 0)
+        FROM registros_trabalho
+        WHERE cliente_id = ?
+    ''', (cliente_id,))
+    registros, horas = cursor.fetchone()
+    return registros, float(horas)
+
+
+def totais_maquina(cursor, maquina_id):
+    """(registros, horas, maior horímetro final) da máquina, com os anos arquivados"""
+    # O horímetro só avança: o maior valor registrado é a última leitura
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(horas_trabalhadas), 0), MAX(horimetro_final)
+        FROM registros_trabalho
+        WHERE maquina_id = ?
+    ''', (maquina_id,))
+    registros, horas, horimetro = cursor.fetchone()
+    cursor.execute('''
+        SELECT COALESCE(SUM(registros), 0), COALESCE(SUM(horas_trabalhadas), 0)
+        FROM totais_arquivados
+        WHERE maquina_id = ?
+    ''', (maquina_id,))
+    registros_arquivados, horas_arquivadas = cursor.fetchone()
+    return (registros + registros_arquivados, float(horas) + float(horas_arquivadas),
+            None if horimetro is None else float(horimetro))
+
+
+def ultima_leitura(cursor, maquina_id):
+    """(instante, horímetro) da leitura de telemetria mais recente, ou None"""
+    cursor.execute('''
+        SELECT ultima, horimetro_final
+        FROM leituras_horimetro_hora
+        WHERE maquina_id = ?
+        ORDER BY hora DESC
+        LIMIT 1
+    ''', (maquina_id,))
+    return cursor.fetchone()
+
+
+def horas_do_modelo(cursor, marca, modelo):
+    """Horas acumuladas pelas máquinas do modelo, com os anos arquivados (base dos alarmes)"""
+    total = 0.0
+    # IN em vez de JOIN: uma busca no índice por máquina do modelo, sem varrer os registros
+    for tabela in ('registros_trabalho', 'totais_arquivados'):
+        cursor.execute(f'''
+            SELECT SUM(horas_trabalhadas)
+            FROM {tabela}
+            WHERE maquina_id IN (SELECT id FROM maquinas WHERE marca = ? AND modelo = ?)
+        ''', (marca, modelo))
+        soma = cursor.fetchone()
+        if soma and soma[0] is not None:
+            total += float(soma[0])
+    return total
+
+
+def manutencao(horas_modelo):
+    """[(limite, atendido)] de cada limite de alarme para as horas do modelo"""
+    return [(limite, horas_modelo >= limite) for limite in LIMITES_ALARME]
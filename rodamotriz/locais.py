@@ -0,0 +1,132 @@
+"""
+Locais de trabalho (dimensão normalizada dos registros de trabalho)
+
+Cada registro guarda só o id do local (local_id); o nome fica uma única vez na
+tabela locais. Nomes que diferem apenas em maiúsculas ou espaços são o mesmo
+local: ao registrar um trabalho o nome é "internado", ou seja, procurado pela
+chave normalizada e cadastrado só se ainda não existir. Vale o primeiro nome
+escrito.
+
+Quem lê continua vendo o texto: a visão registros_trabalho_completo tem as
+mesmas colunas da tabela antiga (com local_trabalho), e é dela que saem as
+listagens, exportações, o log de alterações e o arquivamento anual (os bancos
+de arquivo seguem guardando o nome, para serem independentes do principal).
+
+Bancos antigos, com o nome repetido em cada registro, são migrados na
+inicialização: os nomes distintos são internados, os registros passam a apontar
+para eles e a coluna de texto é removida (o espaço volta ao arquivo no próximo
+VACUUM, ver manutencao.py).
+"""
+
+VISAO = 'registros_trabalho_completo'
+
+# Nomes por consulta ao procurar vários de uma vez
+TAMANHO_LOTE = 500
+
+
+def limpar(nome):
+    """Nome sem espaços nas pontas nem repetidos no meio"""
+    return ' '.join(str(nome or '').split())
+
+
+def chave(nome):
+    """Chave de comparação: nome limpo, sem diferenciar maiúsculas"""
+    return limpar(nome).casefold()
+
+
+def criar_tabelas(cursor):
+    """Cria a tabela de locais; chamada antes de registros_trabalho, que aponta para ela"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS locais (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            chave TEXT NOT NULL UNIQUE
+        )
+    ''')
+
+
+def _colunas(cursor, tabela):
+    cursor.execute(f'SELECT * FROM {tabela} WHERE 1 = 0')
+    return [descricao[0] for descricao in cursor.description]
+
+
+def migrar(cursor):
+    """Converte o local em texto dos bancos antigos para local_id; retorna os nomes internados"""
+    colunas = _colunas(cursor, 'registros_trabalho')
+    if 'local_trabalho' not in colunas:
+        return 0
+    if 'local_id' not in colunas:
+        cursor.execute('ALTER TABLE registros_trabalho ADD COLUMN local_id INTEGER REFERENCES locais(id)')
+
+    cursor.execute('SELECT DISTINCT local_trabalho FROM registros_trabalho')
+    ids = internar(cursor, [linha[0] for linha in cursor.fetchall()])
+    cursor.execute('CREATE TEMP TABLE mapa_locais (texto TEXT PRIMARY KEY, local_id INTEGER NOT NULL)')
+    cursor.executemany('INSERT INTO mapa_locais (texto, local_id) VALUES (?, ?)', list(ids.items()))
+    # Os gatilhos do log de alterações registram cada linha; os dispositivos
+    # recebem os mesmos dados de novo uma única vez
+    cursor.execute('''
+        UPDATE registros_trabalho
+        SET local_id = (SELECT local_id FROM mapa_locais WHERE texto = registros_trabalho.local_trabalho)
+    ''')
+    cursor.execute('DROP TABLE mapa_locais')
+    cursor.execute('ALTER TABLE registros_trabalho DROP COLUMN local_trabalho')
+    return len(ids)
+
+
+def criar_visao_e_indice(cursor):
+    """Visão com o nome do local e índice das somas por local (depois de migrar)"""
+    cursor.execute(f'''
+        CREATE VIEW IF NOT EXISTS {VISAO} AS
+        SELECT r.id, r.cliente_id, r.maquina_id, l.nome AS local_trabalho,
+               r.data_inicio, r.data_final, r.horimetro_inicial, r.horimetro_final,
+               r.horas_trabalhadas, r.data_registro
+        FROM registros_trabalho r
+        JOIN locais l ON l.id = r.local_id
+    ''')
+    # Cobre a soma de horas por local: o GROUP BY percorre só o índice, já agrupado
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_registros_local
+        ON registros_trabalho (local_id, horas_trabalhadas)
+    ''')
+
+
+def _ids_por_chave(cursor, chaves):
+    chaves = list(chaves)
+    ids = {}
+    for inicio in range(0, len(chaves), TAMANHO_LOTE):
+        lote = chaves[inicio:inicio + TAMANHO_LOTE]
+        cursor.execute(f'SELECT chave, id FROM locais WHERE chave IN ({", ".join("?" * len(lote))})', lote)
+        ids.update(cursor.fetchall())
+    return ids
+
+
+def internar(cursor, nomes):
+    """{nome: id do local} para os nomes informados, cadastrando os que faltam"""
+    nomes = list(nomes)
+    por_chave = {}
+    for nome in nomes:
+        por_chave.setdefault(chave(nome), limpar(nome))
+    ids = _ids_por_chave(cursor, por_chave)
+    novos = [(nome, c) for c, nome in por_chave.items() if c not in ids]
+    if novos:
+        # Outra transação pode ter cadastrado o mesmo local nesse meio tempo
+        cursor.executemany('INSERT INTO locais (nome, chave) VALUES (?, ?) ON CONFLICT (chave) DO NOTHING',
+                           novos)
+        ids.update(_ids_por_chave(cursor, [c for _, c in novos]))
+    return {nome: ids[chave(nome)] for nome in nomes}
+
+
+def horas_por_local(cursor):
+    """(id, nome, registros, horas) de cada local, do que mais trabalhou para o menos"""
+    # Agrupa primeiro (só pelo índice) e depois busca o nome de cada local
+    cursor.execute('''
+        SELECT l.id, l.nome, t.registros, t.horas
+        FROM (
+            SELECT local_id, COUNT(*) AS registros, SUM(horas_trabalhadas) AS horas
+            FROM registros_trabalho
+            GROUP BY local_id
+        ) t
+        JOIN locais l ON l.id = t.local_id
+        ORDER BY t.horas DESC, l.nome
+    ''')
+    return cursor.fetchall()
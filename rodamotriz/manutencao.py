@@ -0,0 +1,171 @@
+"""
+Ajuste de desempenho e manutenção do banco SQLite da Rodamotriz
+
+Perfis de configuração (PRAGMAs) aplicados a cada conexão aberta pelo
+BackendSQLite, escolhidos por RODAMOTRIZ_PERFIL_SQLITE:
+
+    equilibrado  WAL + synchronous NORMAL, cache de 16 MB, mmap de 64 MB (padrão)
+    seguro       WAL + synchronous FULL (cada commit sincronizado em disco)
+    padrao       configuração padrão do SQLite, sem ajustes
+
+A manutenção (estatísticas do planejador, vacuum incremental, checkpoint do
+WAL e verificação de integridade) roda pela linha de comando, por exemplo
+diariamente pelo cron:
+
+    python -m rodamotriz.manutencao [--completo] [--converter]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# PRAGMAs de cada perfil, aplicados na ordem
+PERFIS = {
+    'equilibrado': [
+        # Só tem efeito em bancos novos; bancos existentes são convertidos com --converter
+        ('auto_vacuum', 'INCREMENTAL'),
+        # Leitores não bloqueiam o gravador (vários workers do gunicorn)
+        ('journal_mode', 'WAL'),
+        # Com WAL, NORMAL só arrisca o último commit numa queda de energia, nunca o banco
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -16000),  # em KiB: 16 MB por conexão
+        ('mmap_size', 64 * 1024 * 1024),
+        ('temp_store', 'MEMORY'),
+    ],
+    'seguro': [
+        ('auto_vacuum', 'INCREMENTAL'),
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'FULL'),
+        ('cache_size', -16000),
+    ],
+    'padrao': [],
+}
+
+PERFIL_PADRAO = os.environ.get('RODAMOTRIZ_PERFIL_SQLITE', 'equilibrado')
+
+# Linhas amostradas por índice no ANALYZE (mantém a coleta rápida em tabelas grandes)
+LIMITE_ANALISE = 1000
+
+
+def aplicar_perfil(conn, perfil=PERFIL_PADRAO):
+    """Aplica os PRAGMAs do perfil a uma conexão recém-aberta"""
+    if perfil not in PERFIS:
+        raise Exception(f"Perfil SQLite desconhecido: {perfil} (use {', '.join(PERFIS)})")
+    for pragma, valor in PERFIS[perfil]:
+        conn.execute(f'PRAGMA {pragma} = {valor}').fetchall()
+
+
+def estado(conn):
+    """Páginas do banco (total, livres, tamanho) e tamanho do arquivo em bytes"""
+    tamanho_pagina = conn.execute('PRAGMA page_size').fetchone()[0]
+    paginas = conn.execute('PRAGMA page_count').fetchone()[0]
+    livres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return {
+        'paginas': paginas,
+        'paginas_livres': livres,
+        'tamanho_pagina': tamanho_pagina,
+        'bytes': paginas * tamanho_pagina,
+    }
+
+
+def _analisar(conn):
+    """Atualiza as estatísticas do planejador de consultas"""
+    conn.execute(f'PRAGMA analysis_limit = {LIMITE_ANALISE}')
+    analisado = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if analisado is None:
+        # Primeira vez: PRAGMA optimize só reanalisa o que já tem estatísticas
+        conn.execute('ANALYZE')
+        return 'ANALYZE inicial'
+    # 0x10002: confere todas as tabelas, não só as usadas nesta conexão
+    conn.execute('PRAGMA optimize = 0x10002')
+    return 'PRAGMA optimize'
+
+
+def _vacuum(conn, converter):
+    """Devolve ao sistema de arquivos as páginas livres deixadas pelas exclusões"""
+    modo = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    if modo == 2:
+        # fetchall: cada passo do PRAGMA libera uma página
+        conn.execute('PRAGMA incremental_vacuum').fetchall()
+        return 'incremental'
+    if not converter:
+        return 'ignorado (auto_vacuum desativado; use --converter uma vez)'
+    # Conversão única: exige um VACUUM completo, que bloqueia as gravações enquanto roda
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return 'VACUUM completo (convertido para auto_vacuum incremental)'
+
+
+def _checkpoint(conn):
+    """Copia o WAL para o banco e trunca o arquivo -wal"""
+    if conn.execute('PRAGMA journal_mode').fetchone()[0].lower() != 'wal':
+        return 'sem WAL'
+    ocupado, _, copiadas = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+    return f'{copiadas} página(s) copiada(s)' + (' (parcial: banco em uso)' if ocupado else '')
+
+
+def _verificar(conn, completo):
+    """quick_check (padrão) ou integrity_check (--completo); 'ok' ou os problemas encontrados"""
+    pragma = 'integrity_check' if completo else 'quick_check'
+    problemas = [linha[0] for linha in conn.execute(f'PRAGMA {pragma}').fetchall()]
+    return 'ok' if problemas == ['ok'] else '; '.join(problemas)
+
+
+def executar(conn, completo=False, converter=False):
+    """Executa a manutenção; retorna o relatório com o estado antes/depois e cada etapa"""
+    # VACUUM e checkpoint não podem rodar dentro de uma transação aberta
+    conn.commit()
+    relatorio = {'antes': estado(conn), 'etapas': []}
+    etapas = [
+        ('estatísticas', lambda: _analisar(conn)),
+        ('vacuum', lambda: _vacuum(conn, converter)),
+        ('checkpoint', lambda: _checkpoint(conn)),
+        ('integridade', lambda: _verificar(conn, completo)),
+    ]
+    for nome, funcao in etapas:
+        inicio = time.perf_counter()
+        resultado = funcao()
+        relatorio['etapas'].append((nome, resultado, time.perf_counter() - inicio))
+        conn.commit()
+    relatorio['depois'] = estado(conn)
+    relatorio['integro'] = relatorio['etapas'][-1][1] == 'ok'
+    return relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m rodamotriz.manutencao', description='Manutenção do banco SQLite')
+    parser.add_argument('--completo', action='store_true',
+                        help='integrity_check completo em vez de quick_check')
+    parser.add_argument('--converter', action='store_true',
+                        help='ativa o auto_vacuum incremental com um VACUUM completo (bloqueia gravações)')
+    args = parser.parse_args()
+
+    # Usa o mesmo banco e perfil do sistema (RODAMOTRIZ_DB / RODAMOTRIZ_PERFIL_SQLITE)
+    from rodamotriz.sistema import SistemaRodamotriz
+    sistema = SistemaRodamotriz()
+    try:
+        relatorio = sistema.executar_manutencao(args.completo, args.converter)
+    except Exception as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        sistema.fechar()
+
+    print(f"🔧 Manutenção de {sistema.banco.caminho}")
+    for nome, resultado, duracao in relatorio['etapas']:
+        print(f"  {nome:<14} {duracao * 1000:>9.1f} ms  {resultado}")
+    antes, depois = relatorio['antes'], relatorio['depois']
+    print(f"  páginas        {antes['paginas']} → {depois['paginas']} "
+          f"(livres {antes['paginas_livres']} → {depois['paginas_livres']}, "
+          f"{antes['bytes'] / 1024:.0f} KB → {depois['bytes'] / 1024:.0f} KB)")
+    if not relatorio['integro']:
+        print("❌ Problemas de integridade encontrados!")
+        sys.exit(1)
+    print("✅ Concluída")
+
+
+if __name__ == '__main__':
+    main()
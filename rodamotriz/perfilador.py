@@ -0,0 +1,169 @@
+"""
+Perfilador de requisições sob demanda (cProfile)
+
+Envolve a aplicação WSGI e perfila uma requisição inteira (despacho do Flask,
+consultas do SistemaRodamotriz e a montagem do PDF pelo ReportLab) quando:
+
+- ela vem marcada por um administrador (cabeçalho X-Perfil: 1 junto com um
+  X-Admin-Token válido), e é sempre guardada; ou
+- ela cai na amostragem (fração RODAMOTRIZ_PERFIL_AMOSTRA das requisições), e é
+  guardada só se demorou pelo menos RODAMOTRIZ_PERFIL_LENTO segundos.
+
+Cada perfil é gravado em perfis/ no formato do pstats (abre com python -m pstats,
+snakeviz ou flameprof para o flamegraph), com um .json ao lado descrevendo a
+requisição. Só os mais recentes são mantidos, então o diretório funciona como um
+anel compartilhado pelos workers. Um processo perfila uma requisição por vez; as
+outras seguem normalmente enquanto isso.
+
+Configuração:
+    RODAMOTRIZ_PERFIS          diretório dos perfis (padrão: perfis/)
+    RODAMOTRIZ_PERFIS_MANTER   quantos perfis manter (padrão: 20)
+    RODAMOTRIZ_PERFIL_AMOSTRA  fração das requisições amostradas (padrão: 0)
+    RODAMOTRIZ_PERFIL_LENTO    segundos mínimos para guardar uma amostra (padrão: 0.5)
+"""
+
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from rodamotriz.caminhos import DIRETORIO_PERFIS
+
+MANTER = int(os.environ.get('RODAMOTRIZ_PERFIS_MANTER', 20))
+AMOSTRA = float(os.environ.get('RODAMOTRIZ_PERFIL_AMOSTRA', 0))
+LENTO = float(os.environ.get('RODAMOTRIZ_PERFIL_LENTO', 0.5))
+
+# Nome dos arquivos: perfil_AAAAMMDD_HHMMSS_micro_pid (sem extensão)
+PADRAO_NOME = re.compile(r'^perfil_\d{8}_\d{6}_\d{6}_\d+$')
+
+# Partes da requisição somadas em cada perfil: (nome, teste sobre arquivo e função)
+PARTES = [
+    ('banco', lambda arquivo, funcao: arquivo == '~' and re.search(
+        r"'(execute|executemany|fetch\w*|commit)' of '(sqlite3|psycopg)", funcao)),
+    ('pdf', lambda arquivo, funcao: funcao == 'build' and 'reportlab' in arquivo),
+    ('templates', lambda arquivo, funcao: funcao == 'render' and 'jinja2' in arquivo),
+]
+
+
+class Perfilador:
+    """Middleware WSGI que perfila as requisições marcadas ou amostradas"""
+
+    def __init__(self, app, autorizado, diretorio=None, manter=MANTER, amostra=AMOSTRA, lento=LENTO):
+        self.app = app
+        self.autorizado = autorizado
+        self.diretorio = diretorio or DIRETORIO_PERFIS
+        self.manter = manter
+        self.amostra = amostra
+        self.lento = lento
+        self.lock = threading.Lock()
+
+    def _motivo(self, environ):
+        if environ.get('HTTP_X_PERFIL') == '1' and self.autorizado(environ.get('HTTP_X_ADMIN_TOKEN', '')):
+            return 'pedido'
+        if self.amostra and random.random() < self.amostra:
+            return 'amostra'
+        return None
+
+    def __call__(self, environ, start_response):
+        motivo = self._motivo(environ)
+        # Um perfil por vez no processo (o cProfile não aceita dois ativos)
+        if motivo is None or not self.lock.acquire(blocking=False):
+            return self.app(environ, start_response)
+        try:
+            status = []
+
+            def iniciar_resposta(linha, cabecalhos, exc_info=None):
+                status.append(linha)
+                return start_response(linha, cabecalhos, exc_info)
+
+            perfil = cProfile.Profile()
+            inicio = time.perf_counter()
+            perfil.enable()
+            try:
+                resposta = self.app(environ, iniciar_resposta)
+            finally:
+                perfil.disable()
+            duracao = time.perf_counter() - inicio
+            if motivo == 'pedido' or duracao >= self.lento:
+                try:
+                    self._gravar(perfil, {
+                        'metodo': environ.get('REQUEST_METHOD'),
+                        'rota': environ.get('PATH_INFO', '') + (
+                            '?' + environ['QUERY_STRING'] if environ.get('QUERY_STRING') else ''),
+                        'status': status[0] if status else None,
+                        'duracao': round(duracao, 4),
+                        'motivo': motivo,
+                    })
+                except OSError:
+                    # Falha ao gravar o perfil não derruba a requisição
+                    pass
+            return resposta
+        finally:
+            self.lock.release()
+
+    def _gravar(self, perfil, dados):
+        os.makedirs(self.diretorio, exist_ok=True)
+        agora = datetime.now()
+        nome = f"perfil_{agora.strftime('%Y%m%d_%H%M%S_%f')}_{os.getpid()}"
+        base = os.path.join(self.diretorio, nome)
+        perfil.dump_stats(base + '.prof')
+        dados.update(nome=nome, instante=agora.isoformat(timespec='seconds'), pid=os.getpid(),
+                     partes=partes(pstats.Stats(perfil)))
+        with open(base + '.json', 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo, ensure_ascii=False)
+        # Anel: só os mais recentes ficam
+        for antigo in sorted(glob.glob(os.path.join(self.diretorio, 'perfil_*.prof')))[:-self.manter]:
+            for arquivo in (antigo, antigo[:-len('.prof')] + '.json'):
+                try:
+                    os.remove(arquivo)
+                except FileNotFoundError:
+                    pass
+
+
+def partes(estatisticas):
+    """Segundos gastos em banco, PDF e templates (tempo acumulado das funções-chave)"""
+    totais = dict.fromkeys((nome for nome, _ in PARTES), 0.0)
+    for (arquivo, _, funcao), (_, _, _, acumulado, _) in estatisticas.stats.items():
+        for nome, teste in PARTES:
+            if teste(arquivo, funcao):
+                totais[nome] += acumulado
+    return {nome: round(segundos, 4) for nome, segundos in totais.items()}
+
+
+def listar(diretorio=None):
+    """Perfis guardados, do mais recente para o mais antigo"""
+    lista = []
+    for nome in sorted(glob.glob(os.path.join(diretorio or DIRETORIO_PERFIS, 'perfil_*.json')),
+                       reverse=True):
+        try:
+            with open(nome, encoding='utf-8') as arquivo:
+                lista.append(json.load(arquivo))
+        except (OSError, ValueError):
+            # Removido pela rotação de outro worker ou ainda sendo gravado
+            continue
+    return lista
+
+
+def caminho(nome, diretorio=None):
+    """Arquivo .prof do perfil; levanta Exception para nomes inválidos ou já descartados"""
+    if not PADRAO_NOME.match(nome):
+        raise Exception(f"Perfil inválido: {nome}")
+    arquivo = os.path.join(diretorio or DIRETORIO_PERFIS, nome + '.prof')
+    if not os.path.exists(arquivo):
+        raise Exception(f"Perfil não encontrado: {nome}")
+    return arquivo
+
+
+def resumo(nome, linhas=40, ordem='cumulative', diretorio=None):
+    """Tabela do pstats com as funções mais custosas do perfil"""
+    saida = io.StringIO()
+    estatisticas = pstats.Stats(caminho(nome, diretorio), stream=saida)
+    estatisticas.strip_dirs().sort_stats(ordem).print_stats(linhas)
+    return saida.getvalue()
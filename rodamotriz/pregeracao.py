@@ -0,0 +1,130 @@
+"""
+Pré-geração noturna dos PDFs do mês (demonstrativos das faturas e relatórios)
+
+No fim do mês todos pedem os mesmos PDFs ao mesmo tempo. Rodando de madrugada
+(cron), a pré-geração monta num pool de processos o demonstrativo de cada
+fatura da competência e o relatório de cada registro cuja data final cai nela,
+e grava tudo no diretório de relatórios. As rotas /gerar_pdf/<id> e
+/faturas/<id>/pdf entregam o arquivo pronto, sem passar pelo limitador de
+PDFs, enquanto ele valer:
+
+- relatório de registro: gerado há menos de RODAMOTRIZ_PDF_VALIDADE_HORAS
+  (padrão: 26, uma noite com folga), já que o total do modelo usado nos
+  alarmes muda a cada novo trabalho (0 desliga a entrega de prontos);
+  corrigir o registro apaga os PDFs dele;
+- demonstrativo: enquanto a fatura existir (faturar o mês de novo apaga os
+  demonstrativos dele).
+
+Cada execução grava o resumo (duração, documentos gerados e erros) em
+pregeracao.json no diretório de relatórios; /admin/pdf mostra o último.
+
+    python app.py relatorio pregerar [--competencia AAAA-MM] [--faturar] [--processos N]
+"""
+
+import glob
+import json
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+
+from rodamotriz import faturamento, processos_pdf
+from rodamotriz.caminhos import DIRETORIO_RELATORIOS
+
+VALIDADE_HORAS = float(os.environ.get('RODAMOTRIZ_PDF_VALIDADE_HORAS', 26))
+
+ARQUIVO_RESUMO = 'pregeracao.json'
+
+# relatorio_<id>_<AAAAMMDD>_<HHMMSS>.pdf (o nome ordena pela geração)
+PADRAO_RELATORIO = re.compile(r'^relatorio_(\d+)_\d{8}_\d{6}\.pdf$')
+
+
+def competencia_padrao():
+    """Mês de ontem: rodando logo após a meia-noite do dia 1º, fecha o mês que acabou"""
+    return (date.today() - timedelta(days=1)).strftime('%Y-%m')
+
+
+def relatorio_pronto(registro_id, diretorio=None, validade=VALIDADE_HORAS):
+    """Relatório mais recente do registro, se gerado dentro da validade; senão None"""
+    if validade <= 0:
+        return None
+    nomes = glob.glob(os.path.join(diretorio or DIRETORIO_RELATORIOS, f'relatorio_{registro_id}_*.pdf'))
+    if not nomes:
+        return None
+    caminho = max(nomes)
+    try:
+        if time.time() - os.path.getmtime(caminho) > validade * 3600:
+            return None
+    except FileNotFoundError:
+        # Apagado por uma correção do registro nesse meio tempo
+        return None
+    return caminho
+
+
+def fatura_pronta(fatura_id, diretorio=None):
+    """Demonstrativo já gerado da fatura, ou None"""
+    nomes = glob.glob(os.path.join(diretorio or DIRETORIO_RELATORIOS, f'fatura_{fatura_id}_*.pdf'))
+    return nomes[0] if nomes else None
+
+
+def _podar_relatorios(diretorio, ids):
+    """Deixa só o relatório mais recente de cada registro informado"""
+    por_registro = {}
+    with os.scandir(diretorio) as entradas:
+        for entrada in entradas:
+            encontrado = PADRAO_RELATORIO.match(entrada.name)
+            if encontrado and int(encontrado.group(1)) in ids:
+                por_registro.setdefault(int(encontrado.group(1)), []).append(entrada.name)
+    removidos = 0
+    for nomes in por_registro.values():
+        for nome in sorted(nomes)[:-1]:
+            try:
+                os.remove(os.path.join(diretorio, nome))
+                removidos += 1
+            except FileNotFoundError:
+                pass
+    return removidos
+
+
+def executar(sistema, competencia=None, processos=1, faturar=False, renderizador=None):
+    """Gera os demonstrativos e relatórios da competência; retorna e grava o resumo"""
+    competencia = competencia or competencia_padrao()
+    faturamento.validar_competencia(competencia)
+    iniciado = datetime.now()
+    inicio = time.perf_counter()
+
+    if faturar:
+        sistema.faturar_mes(competencia)
+    faturas = [fatura[0] for fatura in sistema.listar_faturas(competencia)]
+    registros = sistema.registros_da_competencia(competencia)
+
+    resultados_faturas = processos_pdf.gerar_lote(processos_pdf.gerar_fatura, faturas, processos, sistema)
+    resultados_registros = processos_pdf.gerar_lote(processos_pdf.gerar, registros, processos, sistema,
+                                                    renderizador=renderizador)
+    gerados = {registro_id for registro_id, arquivo, _ in resultados_registros if arquivo}
+    os.makedirs(DIRETORIO_RELATORIOS, exist_ok=True)
+    substituidos = _podar_relatorios(DIRETORIO_RELATORIOS, gerados)
+
+    resumo = {
+        'competencia': competencia,
+        'inicio': iniciado.isoformat(timespec='seconds'),
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'processos': processos,
+        'faturas': sum(1 for _, arquivo, _ in resultados_faturas if arquivo),
+        'relatorios': len(gerados),
+        'substituidos': substituidos,
+        'erros': [f'fatura {i}: {erro}' for i, _, erro in resultados_faturas if erro] +
+                 [f'registro {i}: {erro}' for i, _, erro in resultados_registros if erro],
+    }
+    with open(os.path.join(DIRETORIO_RELATORIOS, ARQUIVO_RESUMO), 'w', encoding='utf-8') as arquivo:
+        json.dump(resumo, arquivo, ensure_ascii=False, indent=2)
+    return resumo
+
+
+def ultimo_resumo(diretorio=None):
+    """Resumo da última pré-geração, ou None se nunca rodou"""
+    try:
+        with open(os.path.join(diretorio or DIRETORIO_RELATORIOS, ARQUIVO_RESUMO), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
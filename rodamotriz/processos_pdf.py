@@ -0,0 +1,53 @@
+"""
+Geração de relatórios PDF em processos separados
+
+Renderizar com o ReportLab é trabalho de CPU: o CLI distribui lotes entre
+processos (app.py relatorio gerar e pregerar) e o modo assíncrono da web (app_asgi.py)
+tira a renderização do laço de eventos. Cada processo do pool abre a sua
+própria conexão com o banco ao iniciar (initializer=iniciar).
+"""
+
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+# Mínimo de PDFs por processo ao distribuir um lote (abrir um processo custa
+# mais que alguns PDFs)
+PDFS_POR_PROCESSO = 20
+
+# Sistema do processo do pool
+_sistema = None
+
+
+def iniciar():
+    """Inicializador do pool: abre a conexão deste processo"""
+    global _sistema
+    from rodamotriz.sistema import SistemaRodamotriz
+    _sistema = SistemaRodamotriz()
+
+
+def gerar(registro_id, sistema=None, renderizador=None):
+    """Gera um relatório; retorna (id, arquivo, erro) para não interromper o lote"""
+    try:
+        return registro_id, (sistema or _sistema).gerar_relatorio_pdf(registro_id, renderizador), None
+    except Exception as e:
+        return registro_id, None, str(e)
+
+
+def gerar_fatura(fatura_id, sistema=None):
+    """Gera o demonstrativo de uma fatura; retorna (id, arquivo, erro) como gerar"""
+    try:
+        return fatura_id, (sistema or _sistema).gerar_fatura_pdf(fatura_id), None
+    except Exception as e:
+        return fatura_id, None, str(e)
+
+
+def gerar_lote(funcao, ids, processos, sistema, **argumentos):
+    """Aplica gerar ou gerar_fatura aos ids, em sequência ou distribuídos entre processos"""
+    processos = min(processos, len(ids) // PDFS_POR_PROCESSO)
+    if processos <= 1:
+        return [funcao(i, sistema, **argumentos) for i in ids]
+
+    # Renderizar o PDF é trabalho de CPU; cada processo gera uma fatia dos ids
+    lote = max(1, len(ids) // (processos * 4))
+    with ProcessPoolExecutor(processos, initializer=iniciar) as pool:
+        return list(pool.map(functools.partial(funcao, **argumentos), ids, chunksize=lote))
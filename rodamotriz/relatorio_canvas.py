@@ -0,0 +1,281 @@
+"""
+Relatório PDF de hora máquina trabalhada desenhado direto no canvas
+
+O layout do relatório é fixo (cabeçalho, três tabelas chave/valor, alarmes,
+total e assinatura), então não precisa do motor de fluxo do platypus: as
+coordenadas de cada bloco são calculadas uma única vez, na importação, com o
+wrap() dos mesmos estilos, tabelas e espaços de relatorio_pdf.py, e cada
+relatório só desenha textos, retângulos e linhas. Uma mudança de estilo lá
+move os blocos aqui também. O resultado tem a mesma aparência, com bem menos
+trabalho por PDF (ver benchmark_relatorios.py).
+
+Textos com quebra de linha não cabem no layout fixo; nesses casos o relatório
+é montado pelo platypus.
+"""
+
+from datetime import datetime
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfgen.canvas import Canvas
+    from reportlab.platypus import Paragraph, Table, TableStyle
+except ImportError:
+    raise ImportError("ReportLab não está instalado. Execute: pip install reportlab")
+
+from rodamotriz import relatorio_pdf
+from rodamotriz.historico import LIMITES_ALARME
+
+LARGURA, ALTURA = A4
+
+# Área útil do SimpleDocTemplate: margens de 1 cm mais o recuo de 6 pt do frame
+ESQUERDA = cm + 6
+TOPO = ALTURA - cm - 6
+CENTRO = LARGURA / 2
+LARGURA_UTIL = LARGURA - 2 * ESQUERDA
+
+# Tabelas de 17 cm centralizadas na área útil
+TABELA_X = (LARGURA - 17 * cm) / 2
+COLUNAS_DADOS = relatorio_pdf.COLUNAS_DADOS
+COLUNAS_TOTAL = relatorio_pdf.COLUNAS_TOTAL
+COLUNAS_ASSINATURA = relatorio_pdf.COLUNAS_ASSINATURA
+
+ESTILOS = relatorio_pdf.estilos()
+
+
+def _comando(estilo_tabela, nome, padrao):
+    """Último valor de um comando de TableStyle (FONTSIZE, BOTTOMPADDING...)"""
+    valor = padrao
+    for comando in estilo_tabela:
+        if comando[0] == nome:
+            valor = comando[3]
+    return valor
+
+
+def _altura_linha(estilo_tabela, colunas):
+    """Altura de uma linha de texto da tabela, medida pelo wrap() do platypus"""
+    tabela = Table([['X'] * len(colunas)], colWidths=colunas, style=TableStyle(estilo_tabela))
+    return tabela.wrap(LARGURA_UTIL, ALTURA)[1]
+
+
+def _paragrafo(nome_estilo, texto):
+    """Bloco (altura, espaço antes, espaço depois) de um parágrafo de uma linha"""
+    estilo = ESTILOS[nome_estilo]
+    altura = Paragraph(texto, estilo).wrap(LARGURA_UTIL, ALTURA)[1]
+    return altura, estilo.spaceBefore, estilo.spaceAfter
+
+
+# Células: recuo horizontal de 6 pt e entrelinha de 12 pt, como nas tabelas do platypus
+RECUO = 6
+ENTRELINHA = 12
+LINHA_DADOS = _altura_linha(relatorio_pdf.ESTILO_TABELA_DADOS, COLUNAS_DADOS)
+LINHA_ALARME = _altura_linha(relatorio_pdf.ESTILO_TABELA_ALARMES, COLUNAS_TOTAL)
+LINHA_TOTAL = _altura_linha(relatorio_pdf.ESTILO_TABELA_TOTAL, COLUNAS_TOTAL)
+LINHA_ASSINATURA = _altura_linha(relatorio_pdf.ESTILO_TABELA_ASSINATURA, COLUNAS_ASSINATURA)
+
+AZUL_CLARO = colors.HexColor('#e3f2fd')
+AZUL_ESCURO = colors.HexColor('#1a237e')
+VERMELHO = colors.HexColor('#c62828')
+ROSA = colors.HexColor('#ffebee')
+
+_CABECALHO = _paragrafo('cabecalho_tabela', "DADOS DO CLIENTE")
+_NORMAL = _paragrafo('normal', "<b>Relatório Nº:</b> 00001")
+
+# Blocos na ordem do relatório: (nome, altura, espaço antes, espaço depois);
+# entre dois blocos vale o maior dos espaços, como no frame do platypus
+BLOCOS = [
+    ('titulo', *_paragrafo('titulo', "RODAMOTRIZ COM. DE MÁQUINAS E PEÇAS LTDA")),
+    ('subtitulo', *_paragrafo('subtitulo', "RELATÓRIO DE HORA MÁQUINA TRABALHADA")),
+    (None, relatorio_pdf.ESPACO_SECAO, 0, 0),
+    ('numero', *_NORMAL),
+    ('emissao', *_NORMAL),
+    (None, relatorio_pdf.ESPACO_SECAO, 0, 0),
+    ('cabecalho_cliente', *_CABECALHO),
+    ('cliente', 3 * LINHA_DADOS, 0, 0),
+    (None, relatorio_pdf.ESPACO_SECAO, 0, 0),
+    ('cabecalho_maquina', *_CABECALHO),
+    ('maquina', 3 * LINHA_DADOS, 0, 0),
+    (None, relatorio_pdf.ESPACO_SECAO, 0, 0),
+    ('cabecalho_trabalho', *_CABECALHO),
+    ('trabalho', 5 * LINHA_DADOS, 0, 0),
+    (None, relatorio_pdf.ESPACO_ALARMES, 0, 0),
+    ('cabecalho_alarmes', *_CABECALHO),
+    ('alarmes', len(LIMITES_ALARME) * LINHA_ALARME, 0, 0),
+    (None, relatorio_pdf.ESPACO_TOTAL, 0, 0),
+    ('total', LINHA_TOTAL, 0, 0),
+    (None, relatorio_pdf.ESPACO_ASSINATURA, 0, 0),
+    ('assinatura', LINHA_ASSINATURA, 0, 0),
+    ('rotulo_assinatura', *_paragrafo('assinatura', "Assinatura Autorizada (Rodamotriz)")),
+]
+
+
+def _calcular_topos():
+    """Topo (y) de cada bloco, descendo a página a partir da área útil"""
+    topos = {}
+    y = TOPO
+    espaco = 0
+    for nome, altura, antes, depois in BLOCOS:
+        y -= max(antes, espaco)
+        if nome:
+            topos[nome] = y
+        y -= altura
+        espaco = depois
+    return topos
+
+
+Y = _calcular_topos()
+
+
+def _tabela(c, topo, linhas, colunas, altura_linha, bordas, alinhamentos, fontes, tamanho,
+            fundos, cores, recuo_inferior):
+    """Desenha uma tabela de textos de uma linha
+
+    fundos, cores e fontes: {(coluna, linha): valor}, com (None, linha) e
+    (coluna, None) valendo para a linha ou a coluna inteira; alinhamentos por coluna.
+    """
+    xs = [TABELA_X]
+    for largura in colunas:
+        xs.append(xs[-1] + largura)
+    base = topo - altura_linha * len(linhas)
+
+    def valor_de(mapa, coluna, linha, padrao):
+        return mapa.get((coluna, linha), mapa.get((coluna, None), mapa.get((None, linha), padrao)))
+
+    # Cor e fonte só são trocadas quando mudam: cada troca vira operadores no PDF
+    cor_atual = fonte_atual = None
+    for i in range(len(linhas)):
+        y = topo - altura_linha * (i + 1)
+        for j, largura in enumerate(colunas):
+            fundo = valor_de(fundos, j, i, None)
+            if fundo is not None:
+                if fundo is not cor_atual:
+                    c.setFillColor(fundo)
+                    cor_atual = fundo
+                c.rect(xs[j], y, largura, altura_linha, stroke=0, fill=1)
+
+    for i, valores in enumerate(linhas):
+        y = topo - altura_linha * (i + 1) + recuo_inferior + ENTRELINHA - tamanho
+        for j, texto in enumerate(valores):
+            cor = valor_de(cores, j, i, colors.black)
+            if cor is not cor_atual:
+                c.setFillColor(cor)
+                cor_atual = cor
+            fonte = valor_de(fontes, j, i, 'Helvetica')
+            if fonte != fonte_atual:
+                c.setFont(fonte, tamanho, ENTRELINHA)
+                fonte_atual = fonte
+            if alinhamentos[j] == 'RIGHT':
+                c.drawRightString(xs[j + 1] - RECUO, y, str(texto))
+            elif alinhamentos[j] == 'CENTER':
+                c.drawCentredString((xs[j] + xs[j + 1]) / 2, y, str(texto))
+            else:
+                c.drawString(xs[j] + RECUO, y, str(texto))
+
+    if bordas:
+        espessura, cor = bordas
+        c.setLineWidth(espessura)
+        c.setStrokeColor(cor)
+        c.lines([(x, base, x, topo) for x in xs] +
+                [(xs[0], topo - altura_linha * i, xs[-1], topo - altura_linha * i)
+                 for i in range(len(linhas) + 1)])
+
+
+def _cabecalho_tabela(c, nome, texto):
+    estilo = ESTILOS['cabecalho_tabela']
+    c.setFillColor(estilo.textColor)
+    c.setFont(estilo.fontName, estilo.fontSize)
+    c.drawString(ESQUERDA, Y[nome] - estilo.fontSize, texto)
+
+
+def _dados(c, nome, linhas):
+    estilo = relatorio_pdf.ESTILO_TABELA_DADOS
+    _tabela(c, Y[nome], linhas, COLUNAS_DADOS, LINHA_DADOS, (0.5, colors.grey),
+            ('RIGHT', 'LEFT'), {(0, None): 'Helvetica-Bold'}, _comando(estilo, 'FONTSIZE', 10),
+            {(0, None): AZUL_CLARO}, {}, _comando(estilo, 'BOTTOMPADDING', 3))
+
+
+def gerar_pdf(nome_arquivo, dados, total_acumulado):
+    """Desenha o PDF do registro; mesmos parâmetros de relatorio_pdf.gerar_pdf"""
+    if any('\n' in str(valor) for valor in dados[1:10]):
+        return relatorio_pdf.gerar_pdf(nome_arquivo, dados, total_acumulado)
+
+    c = Canvas(nome_arquivo, pagesize=A4)
+    c.setLineCap(1)
+    c.setLineJoin(1)
+
+    # Cabeçalho
+    for nome, texto in (('titulo', "RODAMOTRIZ COM. DE MÁQUINAS E PEÇAS LTDA"),
+                        ('subtitulo', "RELATÓRIO DE HORA MÁQUINA TRABALHADA")):
+        estilo = ESTILOS[nome]
+        c.setFillColor(estilo.textColor)
+        c.setFont(estilo.fontName, estilo.fontSize)
+        c.drawCentredString(CENTRO, Y[nome] - estilo.fontSize, texto)
+
+    # Informações do relatório
+    tamanho = ESTILOS['normal'].fontSize
+    texto = c.beginText(ESQUERDA, Y['numero'] - tamanho)
+    texto.setFillColor(colors.black)
+    texto.setFont('Helvetica-Bold', tamanho)
+    texto.textOut("Relatório Nº:")
+    texto.setFont('Helvetica', tamanho)
+    texto.textOut(" ")
+    texto.setFillColor(VERMELHO)
+    texto.textOut(f"{dados[0]:05d}")
+    texto.setTextOrigin(ESQUERDA, Y['emissao'] - tamanho)
+    texto.setFillColor(colors.black)
+    texto.setFont('Helvetica-Bold', tamanho)
+    texto.textOut("Data de Emissão:")
+    texto.setFont('Helvetica', tamanho)
+    texto.textOut(f" {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    c.drawText(texto)
+
+    _cabecalho_tabela(c, 'cabecalho_cliente', "DADOS DO CLIENTE")
+    _dados(c, 'cliente', [['Nome:', dados[1]], ['CNPJ/CPF:', dados[2]], ['Endereço:', dados[3]]])
+
+    _cabecalho_tabela(c, 'cabecalho_maquina', "DADOS DA MÁQUINA")
+    _dados(c, 'maquina', [['Marca:', dados[4]], ['Modelo:', dados[5]], ['Ano:', str(dados[6])]])
+
+    _cabecalho_tabela(c, 'cabecalho_trabalho', "DADOS DO TRABALHO")
+    _dados(c, 'trabalho', [
+        ['Local de Trabalho:', dados[7]],
+        ['Data Início:', dados[8]],
+        ['Data Final:', dados[9]],
+        ['Horímetro Inicial:', f"{dados[10]:.2f} horas"],
+        ['Horímetro Final:', f"{dados[11]:.2f} horas"],
+    ])
+
+    # Alarmes: as linhas atendidas ficam em negrito, com o status em vermelho
+    _cabecalho_tabela(c, 'cabecalho_alarmes', 'ALARMES / MANUTENÇÃO (por modelo)')
+    atendidos = [i for i, t in enumerate(LIMITES_ALARME) if total_acumulado >= t]
+    fundos = {(None, i): colors.whitesmoke for i in range(len(LIMITES_ALARME))}
+    fundos.update({(0, i): ROSA for i in atendidos})
+    _tabela(c, Y['alarmes'],
+            [[f'{t} HORAS', 'ATENDIDO' if i in atendidos else 'PENDENTE']
+             for i, t in enumerate(LIMITES_ALARME)],
+            COLUNAS_TOTAL, LINHA_ALARME, (0.3, colors.grey), ('LEFT', 'LEFT'),
+            {(j, i): 'Helvetica-Bold' for i in atendidos for j in (0, 1)},
+            _comando(relatorio_pdf.ESTILO_TABELA_ALARMES, 'FONTSIZE', 10),
+            fundos, {(1, i): VERMELHO for i in atendidos},
+            _comando(relatorio_pdf.ESTILO_TABELA_ALARMES, 'BOTTOMPADDING', 3))
+
+    # Total de horas do modelo
+    _tabela(c, Y['total'],
+            [['TOTAL DE HORAS TRABALHADAS (modelo):', f"{total_acumulado:.2f} HORAS"]],
+            COLUNAS_TOTAL, LINHA_TOTAL, None, ('RIGHT', 'CENTER'),
+            {(None, 0): 'Helvetica-Bold'}, _comando(relatorio_pdf.ESTILO_TABELA_TOTAL, 'FONTSIZE', 10),
+            {(None, 0): AZUL_ESCURO}, {(None, 0): colors.white},
+            _comando(relatorio_pdf.ESTILO_TABELA_TOTAL, 'BOTTOMPADDING', 3))
+
+    # Assinatura
+    c.setLineWidth(0.5)
+    c.setStrokeColor(colors.black)
+    c.line(TABELA_X, Y['assinatura'] - LINHA_ASSINATURA,
+           TABELA_X + COLUNAS_ASSINATURA[0], Y['assinatura'] - LINHA_ASSINATURA)
+    c.setFillColor(colors.black)
+    c.setFont('Helvetica', ESTILOS['assinatura'].fontSize)
+    c.drawCentredString(CENTRO, Y['rotulo_assinatura'] - ESTILOS['assinatura'].fontSize, "Assinatura Autorizada (Rodamotriz)")
+
+    c.showPage()
+    c.save()
+    return nome_arquivo
@@ -0,0 +1,311 @@
+"""
+Geração do relatório PDF de hora máquina trabalhada
+
+Este módulo concentra as importações do ReportLab e só deve ser importado
+quando um relatório for gerado, para não pesar na inicialização do CLI e
+dos workers web.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+except ImportError:
+    raise ImportError("ReportLab não está instalado. Execute: pip install reportlab")
+
+from rodamotriz.historico import LIMITES_ALARME
+
+# Estilo comum das tabelas chave/valor (cliente, máquina e trabalho)
+ESTILO_TABELA_DADOS = [
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+]
+
+ESTILO_TABELA_ALARMES = [
+    ('BACKGROUND', (0, 0), (-1, -1), colors.whitesmoke),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 0.3, colors.grey),
+]
+
+ESTILO_TABELA_TOTAL = [
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#1a237e')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+    ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 14),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 14),
+    ('TOPPADDING', (0, 0), (-1, -1), 14),
+]
+
+ESTILO_TABELA_ASSINATURA = [
+    ('LINEBELOW', (0, 0), (0, 0), 0.5, colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('TOPPADDING', (0, 0), (-1, -1), 0),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0)
+]
+
+# Larguras das colunas e espaços verticais do relatório de hora máquina;
+# relatorio_canvas.py calcula o layout a partir deles e dos estilos acima
+COLUNAS_DADOS = [4*cm, 13*cm]
+COLUNAS_TOTAL = [11*cm, 6*cm]
+COLUNAS_ASSINATURA = [6*cm, 5*cm, 6*cm]
+ESPACO_SECAO = 0.5*cm
+ESPACO_ALARMES = 0.8*cm
+ESPACO_TOTAL = 0.6*cm
+ESPACO_ASSINATURA = 3*cm
+
+
+@lru_cache(maxsize=None)
+def estilos():
+    """Monta uma única vez os estilos de parágrafo usados nos relatórios"""
+    styles = getSampleStyleSheet()
+
+    # Estilo Título
+    estilo_titulo = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#0d47a1'),
+        spaceAfter=12,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    # Estilo Subtítulo
+    estilo_subtitulo = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Heading2'],
+        fontSize=12,
+        textColor=colors.HexColor('#1976d2'),
+        spaceAfter=16,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    estilo_cabecalho_tabela = ParagraphStyle(
+        'CabecalhoTabela',
+        parent=styles['Heading3'],
+        fontSize=11,
+        textColor=colors.HexColor('#1a237e'),
+        spaceAfter=6,
+        fontName='Helvetica-Bold'
+    )
+
+    estilo_assinatura = ParagraphStyle(
+        'Left', parent=styles['Normal'], alignment=TA_CENTER, spaceBefore=0)
+
+    return {
+        'normal': styles['Normal'],
+        'titulo': estilo_titulo,
+        'subtitulo': estilo_subtitulo,
+        'cabecalho_tabela': estilo_cabecalho_tabela,
+        'assinatura': estilo_assinatura,
+    }
+
+
+def gerar_pdf(nome_arquivo, dados, total_acumulado):
+    """Monta o PDF do registro com os alarmes pelo total acumulado do modelo
+
+    dados segue a ordem da consulta de gerar_relatorio_pdf: id, nome, cnpj_cpf,
+    endereco, marca, modelo, ano, local, data_inicio, data_final,
+    horimetro_inicial, horimetro_final, horas_trabalhadas, data_registro.
+    """
+    doc = SimpleDocTemplate(nome_arquivo, pagesize=A4,
+                            rightMargin=cm, leftMargin=cm,
+                            topMargin=cm, bottomMargin=cm)
+    elementos = []
+
+    # Estilos (compartilhados entre relatórios)
+    estilo = estilos()
+    estilo_titulo = estilo['titulo']
+    estilo_subtitulo = estilo['subtitulo']
+    estilo_cabecalho_tabela = estilo['cabecalho_tabela']
+
+    # Cabeçalho
+    elementos.append(
+        Paragraph("RODAMOTRIZ COM. DE MÁQUINAS E PEÇAS LTDA", estilo_titulo))
+    elementos.append(
+        Paragraph("RELATÓRIO DE HORA MÁQUINA TRABALHADA", estilo_subtitulo))
+    elementos.append(Spacer(1, ESPACO_SECAO))
+
+    # Informações do relatório
+    elementos.append(Paragraph(
+        f"<b>Relatório Nº:</b> <font color='#c62828'>{dados[0]:05d}</font>", estilo['normal']))
+    elementos.append(Paragraph(
+        f"<b>Data de Emissão:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}", estilo['normal']))
+    elementos.append(Spacer(1, ESPACO_SECAO))
+
+    # Dados do Cliente
+    elementos.append(
+        Paragraph("DADOS DO CLIENTE", estilo_cabecalho_tabela))
+    dados_cliente = [
+        ['Nome:', dados[1]],
+        ['CNPJ/CPF:', dados[2]],
+        ['Endereço:', dados[3]]
+    ]
+
+    tabela_cliente = Table(dados_cliente, colWidths=COLUNAS_DADOS)
+    tabela_cliente.setStyle(TableStyle(ESTILO_TABELA_DADOS))
+    elementos.append(tabela_cliente)
+    elementos.append(Spacer(1, ESPACO_SECAO))
+
+    # Dados da Máquina
+    elementos.append(
+        Paragraph("DADOS DA MÁQUINA", estilo_cabecalho_tabela))
+    dados_maquina = [
+        ['Marca:', dados[4]],
+        ['Modelo:', dados[5]],
+        ['Ano:', str(dados[6])]
+    ]
+
+    tabela_maquina = Table(dados_maquina, colWidths=COLUNAS_DADOS)
+    tabela_maquina.setStyle(TableStyle(ESTILO_TABELA_DADOS))
+    elementos.append(tabela_maquina)
+    elementos.append(Spacer(1, ESPACO_SECAO))
+
+    # Dados do Trabalho
+    elementos.append(
+        Paragraph("DADOS DO TRABALHO", estilo_cabecalho_tabela))
+    dados_trabalho = [
+        ['Local de Trabalho:', dados[7]],
+        ['Data Início:', dados[8]],
+        ['Data Final:', dados[9]],
+        ['Horímetro Inicial:', f"{dados[10]:.2f} horas"],
+        ['Horímetro Final:', f"{dados[11]:.2f} horas"]
+    ]
+
+    tabela_trabalho = Table(dados_trabalho, colWidths=COLUNAS_DADOS)
+    tabela_trabalho.setStyle(TableStyle(ESTILO_TABELA_DADOS))
+    elementos.append(tabela_trabalho)
+    elementos.append(Spacer(1, ESPACO_ALARMES))
+
+    # Gerar seção de alarmes (500,1000,1500,2000)
+    alarmes_reached = [t for t in LIMITES_ALARME if total_acumulado >= t]
+
+    elementos.append(Paragraph('ALARMES / MANUTENÇÃO (por modelo)', estilo_cabecalho_tabela))
+    alarm_rows = []
+    for t in LIMITES_ALARME:
+        status = 'ATENDIDO' if t in alarmes_reached else 'PENDENTE'
+        alarm_rows.append([f'{t} HORAS', status])
+
+    tabela_alarmes = Table(alarm_rows, colWidths=COLUNAS_TOTAL)
+    tabela_alarmes.setStyle(TableStyle(ESTILO_TABELA_ALARMES))
+
+    # Destacar em vermelho as linhas atendidas
+    for i, t in enumerate(LIMITES_ALARME):
+        if t in alarmes_reached:
+            tabela_alarmes.setStyle(TableStyle([
+                ('BACKGROUND', (0, i), (0, i), colors.HexColor('#ffebee')),
+                ('TEXTCOLOR', (1, i), (1, i), colors.HexColor('#c62828')),
+                ('FONTNAME', (0, i), (-1, i), 'Helvetica-Bold')
+            ]))
+
+    elementos.append(tabela_alarmes)
+    elementos.append(Spacer(1, ESPACO_TOTAL))
+
+    # Total de Horas (exibido abaixo dos alarmes)
+    dados_total = [
+        ['TOTAL DE HORAS TRABALHADAS (modelo):', f"{total_acumulado:.2f} HORAS"]
+    ]
+
+    tabela_total = Table(dados_total, colWidths=COLUNAS_TOTAL)
+    tabela_total.setStyle(TableStyle(ESTILO_TABELA_TOTAL))
+    elementos.append(tabela_total)
+
+    # Rodapé (Assinatura)
+    elementos.append(Spacer(1, ESPACO_ASSINATURA))
+    assinatura_data = [['', '', '']]
+    tabela_assinatura = Table(
+        assinatura_data, colWidths=COLUNAS_ASSINATURA)
+    tabela_assinatura.setStyle(TableStyle(ESTILO_TABELA_ASSINATURA))
+    elementos.append(tabela_assinatura)
+
+    elementos.append(Paragraph(
+        "Assinatura Autorizada (Rodamotriz)", estilo['assinatura']))
+
+    # Construir PDF
+    doc.build(elementos)
+    return nome_arquivo
+
+
+def gerar_fatura_pdf(nome_arquivo, fatura, itens, registros):
+    """Monta o demonstrativo mensal de um cliente
+
+    fatura: id, competencia, horas, valor, cliente_id, nome, cnpj_cpf, endereco;
+    itens: descrição, valor_hora, registros, horas, horas_faturadas, valor;
+    registros: id, data_inicio, data_final, máquina, local, horas.
+    """
+    from rodamotriz.faturamento import moeda
+
+    doc = SimpleDocTemplate(nome_arquivo, pagesize=A4,
+                            rightMargin=cm, leftMargin=cm,
+                            topMargin=cm, bottomMargin=cm)
+    estilo = estilos()
+    ano, mes = fatura[1].split('-')
+    elementos = [
+        Paragraph("RODAMOTRIZ COM. DE MÁQUINAS E PEÇAS LTDA", estilo['titulo']),
+        Paragraph(f"DEMONSTRATIVO DE FATURAMENTO - {mes}/{ano}", estilo['subtitulo']),
+        Paragraph(f"<b>Fatura Nº:</b> <font color='#c62828'>{fatura[0]:05d}</font>", estilo['normal']),
+        Paragraph(f"<b>Data de Emissão:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}", estilo['normal']),
+        Spacer(1, 0.5*cm),
+        Paragraph("DADOS DO CLIENTE", estilo['cabecalho_tabela']),
+    ]
+
+    tabela_cliente = Table([['Nome:', fatura[5]], ['CNPJ/CPF:', fatura[6]], ['Endereço:', fatura[7]]],
+                           colWidths=[4*cm, 13*cm])
+    tabela_cliente.setStyle(TableStyle(ESTILO_TABELA_DADOS))
+    elementos += [tabela_cliente, Spacer(1, 0.5*cm)]
+
+    # Um item por contrato: horas trabalhadas, horas faturadas (com o mínimo) e valor
+    elementos.append(Paragraph("ITENS", estilo['cabecalho_tabela']))
+    linhas = [['Máquina', 'Valor base/h', 'Registros', 'Horas', 'Faturadas', 'Valor']]
+    for descricao, valor_hora, quantidade, horas, faturadas, valor in itens:
+        linhas.append([descricao, moeda(valor_hora), quantidade, f'{horas:.2f}',
+                       f'{faturadas:.2f}', moeda(valor)])
+    linhas.append(['TOTAL', '', '', f'{fatura[2]:.2f}', '', moeda(fatura[3])])
+    tabela_itens = Table(linhas, colWidths=[5.5*cm, 2.5*cm, 2*cm, 2*cm, 2*cm, 3*cm], repeatRows=1)
+    tabela_itens.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e3f2fd')),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#1a237e')),
+        ('TEXTCOLOR', (0, -1), (-1, -1), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    elementos += [tabela_itens, Spacer(1, 0.5*cm)]
+
+    elementos.append(Paragraph("REGISTROS DO MÊS", estilo['cabecalho_tabela']))
+    linhas = [['Nº', 'Período', 'Máquina', 'Local', 'Horas']]
+    for registro_id, inicio, final, maquina, local, horas in registros:
+        linhas.append([f'{registro_id:05d}', f'{inicio} a {final}', maquina, local, f'{horas:.2f}'])
+    tabela_registros = Table(linhas, colWidths=[1.8*cm, 4.4*cm, 4.6*cm, 4.2*cm, 2*cm], repeatRows=1)
+    tabela_registros.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e3f2fd')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.3, colors.grey),
+    ]))
+    elementos.append(tabela_registros)
+
+    doc.build(elementos)
+    return nome_arquivo
@@ -0,0 +1,106 @@
+"""
+Reservas de máquinas para trabalhos futuros
+
+Cada reserva ocupa uma máquina do dia inicio ao dia fim (inclusive, datas
+AAAA-MM-DD). As reservas de uma mesma máquina nunca se sobrepõem (a gravação
+recusa conflitos), então, ordenadas por início, elas também ficam ordenadas
+por fim. Com isso os índices (maquina_id, fim) e (maquina_id, inicio) fazem o
+papel de uma árvore de intervalos:
+
+- a única reserva que pode conflitar com [a, b] é a primeira com fim >= a
+  (conflito se ela começa até b): uma busca no índice, O(log n);
+- as reservas que tocam [a, b] são as que começam entre o início dessa
+  primeira e b: uma busca e uma varredura de k linhas, O(log n + k);
+- uma máquina está livre em [a, b] se a primeira reserva com fim >= a começa
+  depois de b, o que vale para todas as máquinas com uma busca por máquina.
+"""
+
+from datetime import date
+
+# Colunas devolvidas nas listagens (com os nomes de máquina e cliente)
+COLUNAS = ('id', 'maquina_id', 'maquina', 'cliente_id', 'cliente', 'local', 'inicio', 'fim')
+
+_SELECT = '''
+    SELECT r.id, r.maquina_id, m.marca || ' ' || m.modelo, r.cliente_id, c.nome,
+           r.local_trabalho, r.inicio, r.fim
+    FROM reservas r
+    JOIN maquinas m ON m.id = r.maquina_id
+    JOIN clientes c ON c.id = r.cliente_id
+'''
+
+# Início da primeira reserva da máquina que termina em a ou depois
+_PRIMEIRA = '''
+    SELECT p.inicio FROM reservas p
+    WHERE p.maquina_id = {maquina} AND p.fim >= ?
+    ORDER BY p.fim LIMIT 1
+'''
+
+
+def criar_tabela(cursor):
+    """Cria a tabela de reservas e os índices por máquina"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reservas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            maquina_id INTEGER NOT NULL,
+            cliente_id INTEGER NOT NULL,
+            local_trabalho TEXT NOT NULL,
+            inicio TEXT NOT NULL,
+            fim TEXT NOT NULL,
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (maquina_id) REFERENCES maquinas(id),
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservas_fim ON reservas (maquina_id, fim)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservas_inicio ON reservas (maquina_id, inicio)')
+
+
+def periodo(inicio, fim):
+    """Converte as datas (date) do período para o formato gravado, validando a ordem"""
+    if not isinstance(inicio, date) or not isinstance(fim, date):
+        raise Exception("Informe as datas de início e fim da reserva.")
+    if fim < inicio:
+        raise Exception("A data final deve ser igual ou posterior à inicial!")
+    return inicio.isoformat(), fim.isoformat()
+
+
+def conflito(cursor, maquina_id, inicio, fim, ignorar=None):
+    """Reserva da máquina que se sobrepõe a [inicio, fim] (ou None)"""
+    cursor.execute(_SELECT + '''
+        WHERE r.maquina_id = ? AND r.fim >= ? AND r.id != ?
+        ORDER BY r.fim LIMIT 1
+    ''', (maquina_id, inicio, ignorar or 0))
+    reserva = cursor.fetchone()
+    if reserva is not None and reserva[6] <= fim:
+        return reserva
+    return None
+
+
+def reservas_periodo(cursor, inicio, fim, maquina_id=None):
+    """Reservas que tocam [inicio, fim], por máquina e data"""
+    filtro, parametros = '', [inicio, fim]
+    if maquina_id is not None:
+        filtro, parametros = 'WHERE m.id = ?', parametros + [maquina_id]
+    # Percorre as máquinas e, em cada uma, só a faixa do índice (maquina_id, inicio) que
+    # toca o período; o LEFT JOIN mantém clientes como a última tabela do laço
+    cursor.execute(f'''
+        SELECT r.id, r.maquina_id, m.marca || ' ' || m.modelo, r.cliente_id, c.nome,
+               r.local_trabalho, r.inicio, r.fim
+        FROM maquinas m
+        JOIN reservas r ON r.maquina_id = m.id
+             AND r.inicio >= ({_PRIMEIRA.format(maquina='m.id')}) AND r.inicio <= ?
+        LEFT JOIN clientes c ON c.id = r.cliente_id
+        {filtro}
+        ORDER BY r.maquina_id, r.inicio
+    ''', parametros)
+    return cursor.fetchall()
+
+
+def maquinas_livres(cursor, inicio, fim):
+    """Máquinas (id, marca, modelo, ano) sem reserva em nenhum dia de [inicio, fim]"""
+    cursor.execute(f'''
+        SELECT m.id, m.marca, m.modelo, m.ano FROM maquinas m
+        WHERE COALESCE(({_PRIMEIRA.format(maquina='m.id')}), '9999-12-31') > ?
+        ORDER BY m.marca, m.modelo, m.id
+    ''', (inicio, fim))
+    return cursor.fetchall()
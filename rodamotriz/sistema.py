@@ -0,0 +1,1038 @@
+"""
+Camada de dados do sistema Rodamotriz, usada pelo CLI (app.py) e pela web (app_web.py)
+
+Os métodos levantam Exception com mensagens prontas para o usuário; cada
+interface decide como exibi-las.
+"""
+
+import glob
+import importlib
+import os
+from datetime import datetime
+
+from rodamotriz import (alteracoes, analise, armazenamento, arquivamento, documentos, faturamento,
+                        historico, locais, manutencao, reservas, telemetria, validacao)
+from rodamotriz.caminhos import CAMINHO_ANALISE, DIRETORIO_RELATORIOS
+
+# Resultados padrão/máximo das buscas por prefixo
+LIMITE_BUSCA = 10
+LIMITE_BUSCA_MAXIMO = 50
+
+# Renderizadores do relatório de trabalho: módulo de cada um (mesma função gerar_pdf)
+RENDERIZADORES = {
+    'platypus': 'rodamotriz.relatorio_pdf',   # fluxo de parágrafos e tabelas
+    'canvas': 'rodamotriz.relatorio_canvas',  # layout fixo desenhado direto; mais rápido em lotes
+}
+RENDERIZADOR_PADRAO = os.environ.get('RODAMOTRIZ_RENDERIZADOR_PDF', 'platypus')
+
+# Buscas por prefixo do autocompletar: consulta base e colunas indexadas de cada cadastro
+BUSCAS = {
+    'clientes': ('SELECT id, nome, cnpj_cpf FROM clientes', ('nome', 'cnpj_cpf')),
+    'maquinas': ('SELECT id, marca, modelo, ano FROM maquinas', ('marca', 'modelo')),
+}
+
+# Colunas gravadas normalizadas: o texto buscado passa pela mesma limpeza
+NORMALIZACOES_BUSCA = {
+    'cnpj_cpf': validacao.limpar_documento,
+}
+
+# Colunas dos arquivos de importação/exportação (CSV) de cada cadastro
+COLUNAS_EXPORTACAO = {
+    'clientes': ('id', 'nome', 'cnpj_cpf', 'endereco'),
+    'maquinas': ('id', 'marca', 'modelo', 'ano'),
+    'trabalhos': tuple(arquivamento.COLUNAS_REGISTRO.split(', ')),
+}
+
+# Campos de um registro de trabalho que podem ser corrigidos (editar_trabalho)
+CAMPOS_TRABALHO = ('cliente_id', 'maquina_id', 'local_trabalho', 'data_inicio', 'data_final',
+                   'horimetro_inicial', 'horimetro_final')
+
+# (índice, tabela, coluna) usados pelas buscas por prefixo
+INDICES_BUSCA = [
+    ('idx_clientes_nome', 'clientes', 'nome'),
+    ('idx_clientes_cnpj_cpf', 'clientes', 'cnpj_cpf'),
+    ('idx_maquinas_marca', 'maquinas', 'marca'),
+    ('idx_maquinas_modelo', 'maquinas', 'modelo'),
+]
+
+
+class SistemaRodamotriz:
+    def __init__(self, backend=None):
+        # SQLite (padrão) ou PostgreSQL, conforme a configuração (ver armazenamento.py)
+        self.banco = backend or armazenamento.criar_backend()
+        self.conectar()
+        self.criar_tabelas()
+
+    def conectar(self):
+        """Abre a conexão/pool deste processo (chamado de novo em cada worker após o fork)"""
+        self.banco.conectar()
+
+    def criar_tabelas(self):
+        """Cria as tabelas necessárias no banco de dados"""
+        with self.banco.cursor() as cursor:
+            # Tabela de clientes
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS clientes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT NOT NULL,
+                    cnpj_cpf TEXT NOT NULL,
+                    endereco TEXT NOT NULL,
+                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Tabela de máquinas
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS maquinas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    marca TEXT NOT NULL,
+                    modelo TEXT NOT NULL,
+                    ano INTEGER NOT NULL,
+                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Locais de trabalho, apontados pelos registros (ver locais.py)
+            locais.criar_tabelas(cursor)
+
+            # Tabela de registros de trabalho
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS registros_trabalho (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cliente_id INTEGER NOT NULL,
+                    maquina_id INTEGER NOT NULL,
+                    local_id INTEGER NOT NULL,
+                    data_inicio TEXT NOT NULL, 
+                    data_final TEXT NOT NULL,
+                    horimetro_inicial REAL NOT NULL,
+                    horimetro_final REAL NOT NULL,
+                    horas_trabalhadas REAL NOT NULL,
+                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (cliente_id) REFERENCES clientes(id),
+                    FOREIGN KEY (maquina_id) REFERENCES maquinas(id),
+                    FOREIGN KEY (local_id) REFERENCES locais(id)
+                )
+            ''')
+
+            # Bancos antigos guardavam o nome do local em cada registro
+            locais.migrar(cursor)
+            locais.criar_visao_e_indice(cursor)
+
+            # Índices de cobertura das páginas de cliente e de máquina
+            historico.criar_indices(cursor)
+
+            # Totais por máquina dos anos movidos para arquivo
+            arquivamento.criar_tabela_totais(cursor)
+
+            # Reservas de máquinas para trabalhos futuros
+            reservas.criar_tabela(cursor)
+
+            # Contratos de valor por hora e faturas mensais
+            faturamento.criar_tabelas(cursor)
+
+            # Leituras de horímetro enviadas pelas máquinas
+            telemetria.criar_tabelas(cursor)
+
+            # Log de alterações para sincronização incremental (/changes)
+            alteracoes.criar_tabela(cursor, self.banco)
+
+            # Índices das buscas por prefixo (autocompletar do formulário de trabalho)
+            for nome, tabela, coluna in INDICES_BUSCA:
+                cursor.execute(self.banco.indice_prefixo(nome, tabela, coluna))
+
+            # CNPJ/CPF único; bancos antigos com documentos repetidos ficam sem o
+            # índice até a deduplicação (python app.py clientes dedup)
+            documentos.criar_indice(cursor, self.banco.erro_integridade)
+
+    def cadastrar_cliente(self, nome, cnpj_cpf, endereco, atualizar=False):
+        """Cadastra um novo cliente no banco de dados
+
+        O CNPJ/CPF é validado e gravado sem pontuação. Se já houver cliente com o
+        documento, levanta Exception; com atualizar, atualiza o nome e o endereço
+        dele. Retorna o id do cliente.
+        """
+        documento = validacao.normalizar_documento(cnpj_cpf)
+        try:
+            with self.banco.cursor() as cursor:
+                self.banco.travar(cursor, f'cliente_{documento}')
+                existente = documentos.ids_por_documento(cursor, [documento]).get(documento)
+                if existente is None:
+                    return self.banco.inserir(cursor, '''
+                        INSERT INTO clientes (nome, cnpj_cpf, endereco)
+                        VALUES (?, ?, ?)
+                    ''', (nome, documento, endereco))
+                if atualizar:
+                    cursor.execute('UPDATE clientes SET nome = ?, endereco = ? WHERE id = ?',
+                                   (nome, endereco, existente))
+                    return existente
+        except self.banco.erro_integridade as e:
+            raise Exception(f"Erro de integridade ao cadastrar cliente: {e}")
+        except Exception as e:
+            raise Exception(f"Erro inesperado ao cadastrar cliente: {e}")
+        raise Exception(f"Já existe um cliente com o CNPJ/CPF "
+                        f"{validacao.formatar_documento(documento)} (ID {existente}).")
+
+    def listar_clientes(self):
+        """Lista todos os clientes cadastrados"""
+        return list(self.banco.iterar(
+            'SELECT id, nome, cnpj_cpf, endereco FROM clientes ORDER BY id'))
+
+    def iterar_clientes(self, nome=None, cnpj_cpf=None, offset=0):
+        """Percorre os clientes por id, filtrando opcionalmente pelo início do nome/CNPJ/CPF"""
+        return self._iterar_por_id(
+            'SELECT id, nome, cnpj_cpf, endereco FROM clientes',
+            {'nome': nome, 'cnpj_cpf': validacao.limpar_documento(cnpj_cpf)}, {}, offset)
+
+    def cliente_por_documento(self, cnpj_cpf):
+        """Cliente (id, nome, cnpj_cpf, endereco) com o CNPJ/CPF, com ou sem pontuação, ou None"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('SELECT id, nome, cnpj_cpf, endereco FROM clientes WHERE cnpj_cpf = ?',
+                           (validacao.limpar_documento(cnpj_cpf),))
+            return cursor.fetchone()
+
+    def buscar_clientes(self, texto, limite=LIMITE_BUSCA):
+        """Clientes cujo nome ou CNPJ/CPF começa com o texto (busca indexada)"""
+        return self._buscar_prefixo('clientes', texto, limite)
+
+    def deletar_cliente(self, cliente_id):
+        """Remove um cliente"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('DELETE FROM clientes WHERE id = ?', (cliente_id,))
+
+    def cadastrar_maquina(self, marca, modelo, ano):
+        """Cadastra uma nova máquina no banco de dados"""
+        try:
+            with self.banco.cursor() as cursor:
+                return self.banco.inserir(cursor, '''
+                    INSERT INTO maquinas (marca, modelo, ano)
+                    VALUES (?, ?, ?)
+                ''', (marca, modelo, ano))
+        except self.banco.erro_integridade as e:
+            raise Exception(f"Erro de integridade ao cadastrar máquina: {e}")
+        except Exception as e:
+            raise Exception(f"Erro inesperado ao cadastrar máquina: {e}")
+
+    def listar_maquinas(self):
+        """Lista todas as máquinas cadastradas"""
+        return list(self.banco.iterar(
+            'SELECT id, marca, modelo, ano FROM maquinas ORDER BY id'))
+
+    def iterar_maquinas(self, marca=None, modelo=None, ano=None, offset=0):
+        """Percorre as máquinas por id, filtrando opcionalmente por marca/modelo (início) e ano"""
+        return self._iterar_por_id(
+            'SELECT id, marca, modelo, ano FROM maquinas',
+            {'marca': marca, 'modelo': modelo}, {'ano': ano}, offset)
+
+    def buscar_maquinas(self, texto, limite=LIMITE_BUSCA):
+        """Máquinas cuja marca ou modelo começa com o texto (busca indexada)"""
+        return self._buscar_prefixo('maquinas', texto, limite)
+
+    def _iterar_por_id(self, select, prefixos, iguais, offset=0,
+                       tamanho=armazenamento.TAMANHO_LOTE):
+        """Percorre o resultado em páginas ordenadas por id, uma consulta curta por página
+
+        Nenhuma transação fica aberta entre as páginas: quem consome (por exemplo o
+        paginador do terminal) pode pausar sem bloquear as gravações no banco.
+        """
+        condicoes = []
+        parametros = []
+        for coluna, texto in prefixos.items():
+            if texto:
+                condicoes.append(self.banco.filtro_prefixo(coluna)[0])
+                parametros.append(self.banco.padrao_prefixo(texto))
+        for coluna, valor in iguais.items():
+            if valor is not None:
+                condicoes.append(f'{coluna} = ?')
+                parametros.append(valor)
+
+        ultimo_id = None
+        while True:
+            where = condicoes + ([] if ultimo_id is None else ['id > ?'])
+            consulta = select + (' WHERE ' + ' AND '.join(where) if where else '')
+            with self.banco.cursor() as cursor:
+                cursor.execute(consulta + ' ORDER BY id LIMIT ? OFFSET ?',
+                               parametros + ([] if ultimo_id is None else [ultimo_id]) +
+                               [tamanho, offset if ultimo_id is None else 0])
+                lote = cursor.fetchmany(tamanho)
+            yield from lote
+            if len(lote) < tamanho:
+                return
+            ultimo_id = lote[-1][0]
+
+    def consulta_busca(self, cadastro, texto, limite=LIMITE_BUSCA):
+        """SQL (consulta, parâmetros) da busca por prefixo em BUSCAS, ou None sem texto
+
+        Une as buscas em cada coluna, cada uma limitada pelo próprio índice. Levanta
+        ValueError se o limite não for um número.
+        """
+        select, colunas = BUSCAS[cadastro]
+        texto = (texto or '').strip()
+        if not texto:
+            return None
+        limite = max(1, min(int(limite), LIMITE_BUSCA_MAXIMO))
+        partes = []
+        parametros = []
+        for i, coluna in enumerate(colunas):
+            prefixo = NORMALIZACOES_BUSCA.get(coluna, str)(texto)
+            if not prefixo:
+                continue
+            condicao, ordem = self.banco.filtro_prefixo(coluna)
+            partes.append(f'SELECT * FROM ({select} WHERE {condicao} ORDER BY {ordem} LIMIT ?) AS p{i}')
+            parametros += [self.banco.padrao_prefixo(prefixo), limite]
+        consulta = ' UNION '.join(partes) + ' ORDER BY 2, 1 LIMIT ?'
+        return consulta, parametros + [limite]
+
+    def _buscar_prefixo(self, cadastro, texto, limite):
+        busca = self.consulta_busca(cadastro, texto, limite)
+        if busca is None:
+            return []
+        with self.banco.cursor() as cursor:
+            cursor.execute(*busca)
+            return cursor.fetchall()
+
+    def deletar_maquina(self, maquina_id):
+        """Remove uma máquina"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('DELETE FROM maquinas WHERE id = ?', (maquina_id,))
+
+    def registrar_trabalho(self, cliente_id, maquina_id, local_trabalho,
+                           data_inicio, data_final, horimetro_inicial, horimetro_final):
+        """Registra um trabalho realizado"""
+        # Validação de Horímetro e Data
+        validacao.validar_trabalho(data_inicio, data_final, horimetro_inicial, horimetro_final)
+        if not locais.limpar(local_trabalho):
+            raise Exception("Informe o local de trabalho.")
+
+        # Validação de Cliente e Máquina
+        with self.banco.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM clientes WHERE id = ?', (cliente_id,))
+            if cursor.fetchone() is None:
+                raise Exception(f"Cliente com ID {cliente_id} não encontrado.")
+
+            cursor.execute('SELECT 1 FROM maquinas WHERE id = ?', (maquina_id,))
+            if cursor.fetchone() is None:
+                raise Exception(f"Máquina com ID {maquina_id} não encontrada.")
+
+        # Cálculo
+        horas_trabalhadas = horimetro_final - horimetro_inicial
+
+        try:
+            with self.banco.cursor() as cursor:
+                local_id = locais.internar(cursor, [local_trabalho])[local_trabalho]
+                return self.banco.inserir(cursor, '''
+                    INSERT INTO registros_trabalho 
+                    (cliente_id, maquina_id, local_id, data_inicio, data_final,
+                     horimetro_inicial, horimetro_final, horas_trabalhadas)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (cliente_id, maquina_id, local_id, data_inicio, data_final,
+                      horimetro_inicial, horimetro_final, horas_trabalhadas))
+        except self.banco.erro_integridade as e:
+            raise Exception(f"Erro de integridade: {e}")
+        except Exception as e:
+            raise Exception(f"Erro ao registrar trabalho: {e}")
+
+    def listar_trabalhos(self, desde=None, ate=None):
+        """Lista os registros de trabalho, incluindo os anos arquivados que o período exigir"""
+        clausula, parametros = arquivamento.filtro_periodo(desde, ate, 'r.')
+        with self.banco.cursor() as cursor:
+            anos = arquivamento.anos_no_periodo(cursor, desde, ate) if (desde or ate) else []
+            with arquivamento.anexar_arquivos(cursor, anos) as anexados:
+                tabelas = [locais.VISAO] + \
+                    [f'arq_{ano}.registros_trabalho' for ano in anexados]
+                consulta = ' UNION ALL '.join(f'''
+                    SELECT r.id, c.nome, m.marca, m.modelo, r.local_trabalho,
+                           r.data_inicio, r.data_final, r.horas_trabalhadas, r.data_registro
+                    FROM {tabela} r
+                    JOIN clientes c ON r.cliente_id = c.id
+                    JOIN maquinas m ON r.maquina_id = m.id
+                    {clausula}
+                ''' for tabela in tabelas)
+                cursor.execute(consulta + ' ORDER BY data_registro DESC',
+                               parametros * len(tabelas))
+                return cursor.fetchall()
+
+    def trabalhos_por_id(self, ids):
+        """Registros ativos pedidos, nas mesmas colunas de listar_trabalhos"""
+        if not ids:
+            return []
+        marcadores = ', '.join('?' * len(ids))
+        with self.banco.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT r.id, c.nome, m.marca, m.modelo, r.local_trabalho,
+                       r.data_inicio, r.data_final, r.horas_trabalhadas, r.data_registro
+                FROM {locais.VISAO} r
+                JOIN clientes c ON r.cliente_id = c.id
+                JOIN maquinas m ON r.maquina_id = m.id
+                WHERE r.id IN ({marcadores})
+            ''', list(ids))
+            return cursor.fetchall()
+
+    def horas_por_local(self):
+        """(id, nome, registros, horas) por local de trabalho, dos registros ativos"""
+        with self.banco.cursor() as cursor:
+            return locais.horas_por_local(cursor)
+
+    def historico_cliente(self, cliente_id, antes=None):
+        """Cliente, totais e uma página de registros (mais recentes primeiro; ver historico.py)"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('SELECT id, nome, cnpj_cpf, endereco FROM clientes WHERE id = ?', (cliente_id,))
+            cliente = cursor.fetchone()
+            if cliente is None:
+                raise Exception(f"Cliente {cliente_id} não encontrado.")
+            registros, horas = historico.totais_cliente(cursor, cliente_id)
+            pagina, proximo = historico.pagina(cursor, 'cliente_id', cliente_id, antes)
+        return {
+            'cliente': cliente,
+            'registros': registros,
+            'horas': horas,
+            'pagina': pagina,
+            'proximo': proximo,
+        }
+
+    def historico_maquina(self, maquina_id, antes=None):
+        """Máquina, totais, último horímetro, manutenção do modelo e uma página de registros"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('SELECT id, marca, modelo, ano FROM maquinas WHERE id = ?', (maquina_id,))
+            maquina = cursor.fetchone()
+            if maquina is None:
+                raise Exception(f"Máquina {maquina_id} não encontrada.")
+            registros, horas, horimetro = historico.totais_maquina(cursor, maquina_id)
+            leitura = historico.ultima_leitura(cursor, maquina_id)
+            horas_modelo = historico.horas_do_modelo(cursor, maquina[1], maquina[2])
+            pagina, proximo = historico.pagina(cursor, 'maquina_id', maquina_id, antes)
+        return {
+            'maquina': maquina,
+            'registros': registros,
+            'horas': horas,
+            'horimetro': horimetro,
+            'leitura': None if leitura is None else (datetime.fromtimestamp(leitura[0]), leitura[1]),
+            'horas_modelo': horas_modelo,
+            'manutencao': historico.manutencao(horas_modelo),
+            'pagina': pagina,
+            'proximo': proximo,
+        }
+
+    def estatisticas(self):
+        """Contagens e horas totais (incluindo anos arquivados) calculadas no banco"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('''
+                SELECT (SELECT COUNT(*) FROM clientes),
+                       (SELECT COUNT(*) FROM maquinas),
+                       (SELECT COUNT(*) FROM registros_trabalho),
+                       (SELECT COALESCE(SUM(horas_trabalhadas), 0) FROM registros_trabalho)
+            ''')
+            clientes, maquinas, trabalhos, horas = cursor.fetchone()
+            registros_arquivados, horas_arquivadas = arquivamento.totais_gerais(cursor)
+        return {
+            'clientes': clientes,
+            'maquinas': maquinas,
+            'trabalhos': trabalhos + registros_arquivados,
+            'horas': float(horas) + float(horas_arquivadas),
+        }
+
+    def registro_trabalho(self, registro_id):
+        """Campos editáveis (CAMPOS_TRABALHO), horas_trabalhadas e ano_arquivado (None se ativo)"""
+        consulta = f"SELECT {', '.join(CAMPOS_TRABALHO)}, horas_trabalhadas FROM {{tabela}} WHERE id = ?"
+        with self.banco.cursor() as cursor:
+            cursor.execute(consulta.format(tabela=locais.VISAO), (registro_id,))
+            dados = cursor.fetchone()
+            ano = None
+            if dados is None:
+                # Anos encerrados ficam nos bancos de arquivo
+                dados = arquivamento.buscar_registro(cursor, consulta, registro_id)
+                if dados is None:
+                    raise Exception(f"Registro {registro_id} não encontrado.")
+                ano = int(dados[CAMPOS_TRABALHO.index('data_final')][6:10])
+        registro = dict(zip(CAMPOS_TRABALHO + ('horas_trabalhadas',), dados))
+        registro['horas_trabalhadas'] = float(registro['horas_trabalhadas'])
+        registro['ano_arquivado'] = ano
+        return registro
+
+    def editar_trabalho(self, registro_id, **campos):
+        """Corrige um registro de trabalho no lugar, ativo ou de um ano arquivado
+
+        campos: só os que mudam (ver CAMPOS_TRABALHO). As horas são recalculadas
+        pelos horímetros e os PDFs já gerados do registro são apagados. Retorna
+        {'horas_antes', 'horas', 'ano_arquivado', 'pdfs_apagados'}.
+        """
+        desconhecidos = sorted(set(campos) - set(CAMPOS_TRABALHO))
+        if desconhecidos:
+            raise Exception(f"Campos que não podem ser editados: {', '.join(desconhecidos)}")
+
+        registro = self.registro_trabalho(registro_id)
+        ano = registro.pop('ano_arquivado')
+        horas_antes = registro.pop('horas_trabalhadas')
+        registro.update((campo, valor) for campo, valor in campos.items() if valor is not None)
+        registro['local_trabalho'] = locais.limpar(registro['local_trabalho'])
+        validacao.validar_trabalho(registro['data_inicio'], registro['data_final'],
+                                   registro['horimetro_inicial'], registro['horimetro_final'])
+        if not registro['local_trabalho']:
+            raise Exception("Informe o local de trabalho.")
+        if ano is not None and registro['data_final'][6:10] != str(ano):
+            raise Exception(f"O registro {registro_id} está arquivado em {ano}; "
+                            f"a data final precisa continuar nesse ano.")
+        registro['horas_trabalhadas'] = registro['horimetro_final'] - registro['horimetro_inicial']
+
+        with self.banco.cursor() as cursor:
+            if 'cliente_id' in campos:
+                cursor.execute('SELECT 1 FROM clientes WHERE id = ?', (registro['cliente_id'],))
+                if cursor.fetchone() is None:
+                    raise Exception(f"Cliente com ID {registro['cliente_id']} não encontrado.")
+            if 'maquina_id' in campos:
+                cursor.execute('SELECT 1 FROM maquinas WHERE id = ?', (registro['maquina_id'],))
+                if cursor.fetchone() is None:
+                    raise Exception(f"Máquina com ID {registro['maquina_id']} não encontrada.")
+
+        try:
+            if ano is None:
+                # As somas por máquina, modelo e local saem dos índices, que o
+                # próprio UPDATE mantém: nada a recalcular
+                with self.banco.cursor() as cursor:
+                    local_id = locais.internar(cursor, [registro['local_trabalho']])[registro['local_trabalho']]
+                    cursor.execute('''
+                        UPDATE registros_trabalho
+                        SET cliente_id = ?, maquina_id = ?, local_id = ?, data_inicio = ?, data_final = ?,
+                            horimetro_inicial = ?, horimetro_final = ?, horas_trabalhadas = ?
+                        WHERE id = ?
+                    ''', (registro['cliente_id'], registro['maquina_id'], local_id,
+                          registro['data_inicio'], registro['data_final'], registro['horimetro_inicial'],
+                          registro['horimetro_final'], registro['horas_trabalhadas'], registro_id))
+            else:
+                # O arquivo é anexado antes da transação (o SQLite não anexa durante uma)
+                with self.banco.conexao() as conn:
+                    cursor = conn.cursor()
+                    with arquivamento.anexar_arquivos(cursor, [ano]):
+                        try:
+                            horas_antes = arquivamento.atualizar_registro(cursor, ano, registro_id, registro)
+                            # Sem gatilho no arquivo: o log (/changes, /eventos) recebe os totais do ano
+                            alteracoes.registrar_ano_arquivado(cursor, ano)
+                            conn.commit()
+                        except Exception:
+                            conn.rollback()
+                            raise
+        except self.banco.erro_integridade as e:
+            raise Exception(f"Erro de integridade: {e}")
+        except Exception as e:
+            raise Exception(f"Erro ao editar trabalho: {e}")
+
+        # Só os PDFs deste registro ficaram desatualizados
+        apagados, _ = self.deletar_relatorios_pdf(registro_id)
+        return {
+            'horas_antes': horas_antes,
+            'horas': registro['horas_trabalhadas'],
+            'ano_arquivado': ano,
+            'pdfs_apagados': apagados,
+        }
+
+    def deletar_registro(self, registro_id):
+        """Remove um registro de trabalho"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('DELETE FROM registros_trabalho WHERE id = ?', (registro_id,))
+
+    def arquivar_ano(self, ano):
+        """Move os registros de um ano encerrado para o arquivo"""
+        if self.banco.tipo != 'sqlite':
+            raise Exception("O arquivamento anual só está disponível com o backend SQLite.")
+        with self.banco.conexao() as conn:
+            return arquivamento.arquivar_ano(conn, ano)
+
+    def importar_clientes(self, clientes, atualizar=False):
+        """Cadastra vários clientes (nome, cnpj_cpf, endereco) numa única transação
+
+        Documentos já cadastrados (ou repetidos no lote) são recusados; com
+        atualizar, o nome e o endereço do cliente existente são atualizados e,
+        dentro do lote, vale a última linha de cada documento.
+        """
+        por_documento = {}
+        for i, cliente in enumerate(clientes, 1):
+            nome, cnpj_cpf, endereco = cliente
+            if not validacao.campos_preenchidos(nome, cnpj_cpf, endereco):
+                raise Exception(f"Registro {i}: todos os campos são obrigatórios.")
+            try:
+                documento = validacao.normalizar_documento(cnpj_cpf)
+            except Exception as e:
+                raise Exception(f"Registro {i}: {e}")
+            if documento in por_documento and not atualizar:
+                raise Exception(f"Registro {i}: CNPJ/CPF {cnpj_cpf} repetido no arquivo.")
+            por_documento[documento] = (nome, documento, endereco)
+
+        try:
+            with self.banco.cursor() as cursor:
+                # Uma consulta pelo índice único para cada lote de documentos
+                existentes = documentos.ids_por_documento(cursor, por_documento)
+                if existentes and not atualizar:
+                    documento, cliente_id = next(iter(existentes.items()))
+                    raise Exception(f"{len(existentes)} CNPJ/CPF já cadastrado(s), como "
+                                    f"{validacao.formatar_documento(documento)} (ID {cliente_id}).")
+                cursor.executemany('UPDATE clientes SET nome = ?, endereco = ? WHERE id = ?', [
+                    (nome, endereco, existentes[documento])
+                    for nome, documento, endereco in por_documento.values() if documento in existentes])
+                cursor.executemany('INSERT INTO clientes (nome, cnpj_cpf, endereco) VALUES (?, ?, ?)', [
+                    linha for documento, linha in por_documento.items() if documento not in existentes])
+        except self.banco.erro_integridade as e:
+            raise Exception(f"Erro de integridade ao importar clientes: {e}")
+        return len(por_documento)
+
+    def deduplicar_clientes(self, simular=False):
+        """Mescla os clientes com o mesmo CNPJ/CPF e normaliza os documentos (ver documentos.py)"""
+        if self.banco.tipo != 'sqlite':
+            with self.banco.cursor() as cursor:
+                return documentos.deduplicar(cursor, self.banco.erro_integridade, simular=simular)
+
+        # Os arquivos anuais são anexados antes da transação (o SQLite não anexa
+        # durante uma) e desanexados depois do commit
+        with self.banco.conexao() as conn:
+            cursor = conn.cursor()
+            with arquivamento.anexar_arquivos(cursor, arquivamento.anos_arquivados(cursor)) as anos:
+                try:
+                    resumo = documentos.deduplicar(
+                        cursor, self.banco.erro_integridade,
+                        [f'arq_{ano}.registros_trabalho' for ano in anos], simular)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            return resumo
+
+    def importar_maquinas(self, maquinas):
+        """Cadastra várias máquinas (marca, modelo, ano) numa única transação"""
+        maquinas = [tuple(m) for m in maquinas]
+        for i, (marca, modelo, ano) in enumerate(maquinas, 1):
+            if not validacao.campos_preenchidos(marca, modelo):
+                raise Exception(f"Registro {i}: todos os campos são obrigatórios.")
+            if not validacao.validar_ano(ano):
+                raise Exception(f"Registro {i}: ano inválido ({ano}).")
+        try:
+            with self.banco.cursor() as cursor:
+                cursor.executemany(
+                    'INSERT INTO maquinas (marca, modelo, ano) VALUES (?, ?, ?)', maquinas)
+        except self.banco.erro_integridade as e:
+            raise Exception(f"Erro de integridade ao importar máquinas: {e}")
+        return len(maquinas)
+
+    def importar_trabalhos(self, trabalhos):
+        """Registra vários trabalhos numa única transação; nada é gravado se algum for inválido
+
+        Cada item segue a ordem de registrar_trabalho: (cliente_id, maquina_id,
+        local_trabalho, data_inicio, data_final, horimetro_inicial, horimetro_final).
+        """
+        linhas = []
+        for i, (cliente_id, maquina_id, local_trabalho, data_inicio, data_final,
+                horimetro_inicial, horimetro_final) in enumerate(trabalhos, 1):
+            try:
+                validacao.validar_trabalho(data_inicio, data_final, horimetro_inicial, horimetro_final)
+            except Exception as e:
+                raise Exception(f"Registro {i}: {e}")
+            if not locais.limpar(local_trabalho):
+                raise Exception(f"Registro {i}: informe o local de trabalho.")
+            linhas.append((cliente_id, maquina_id, local_trabalho, data_inicio, data_final,
+                           horimetro_inicial, horimetro_final, horimetro_final - horimetro_inicial))
+
+        try:
+            with self.banco.cursor() as cursor:
+                # Cada cliente/máquina é conferido uma única vez, não uma vez por linha
+                for tabela, indice, erro in (('clientes', 0, "Cliente com ID {} não encontrado."),
+                                             ('maquinas', 1, "Máquina com ID {} não encontrada.")):
+                    for id_ in sorted({linha[indice] for linha in linhas}):
+                        cursor.execute(f'SELECT 1 FROM {tabela} WHERE id = ?', (id_,))
+                        if cursor.fetchone() is None:
+                            raise Exception(erro.format(id_))
+
+                # Locais internados de uma vez para o lote todo
+                ids_locais = locais.internar(cursor, {linha[2] for linha in linhas})
+                cursor.executemany('''
+                    INSERT INTO registros_trabalho
+                    (cliente_id, maquina_id, local_id, data_inicio, data_final,
+                     horimetro_inicial, horimetro_final, horas_trabalhadas)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [linha[:2] + (ids_locais[linha[2]],) + linha[3:] for linha in linhas])
+        except self.banco.erro_integridade as e:
+            raise Exception(f"Erro de integridade ao importar trabalhos: {e}")
+        return len(linhas)
+
+    def exportar(self, tipo, desde=None, ate=None):
+        """Percorre as linhas de um cadastro na ordem de COLUNAS_EXPORTACAO[tipo]
+
+        Para trabalhos, o período (desde/ate) também alcança os anos arquivados.
+        """
+        colunas = ', '.join(COLUNAS_EXPORTACAO[tipo])
+        if tipo != 'trabalhos':
+            yield from self.banco.iterar(f'SELECT {colunas} FROM {tipo} ORDER BY id')
+            return
+
+        clausula, parametros = arquivamento.filtro_periodo(desde, ate)
+        with self.banco.cursor() as cursor:
+            anos = arquivamento.anos_no_periodo(cursor, desde, ate) if (desde or ate) else []
+            with arquivamento.anexar_arquivos(cursor, anos) as anexados:
+                tabelas = [locais.VISAO] + \
+                    [f'arq_{ano}.registros_trabalho' for ano in anexados]
+                consulta = ' UNION ALL '.join(
+                    f'SELECT {colunas} FROM {tabela} {clausula}' for tabela in tabelas)
+                cursor.execute(consulta + ' ORDER BY id', parametros * len(tabelas))
+                while True:
+                    lote = cursor.fetchmany(armazenamento.TAMANHO_LOTE)
+                    if not lote:
+                        break
+                    yield from lote
+
+    def reservar_maquina(self, maquina_id, cliente_id, local_trabalho, inicio, fim):
+        """Reserva a máquina de inicio a fim (date, inclusive); recusa sobreposições"""
+        if not validacao.campos_preenchidos(local_trabalho):
+            raise Exception("Informe o local de trabalho.")
+        inicio, fim = reservas.periodo(inicio, fim)
+
+        with self.banco.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM maquinas WHERE id = ?', (maquina_id,))
+            if cursor.fetchone() is None:
+                raise Exception("Máquina não encontrada!")
+            cursor.execute('SELECT 1 FROM clientes WHERE id = ?', (cliente_id,))
+            if cursor.fetchone() is None:
+                raise Exception("Cliente não encontrado!")
+
+            # Grava e só então confere: duas reservas simultâneas da máquina não
+            # passam ambas pela verificação (o erro desfaz a inclusão)
+            self.banco.travar(cursor, f'reserva_maquina_{maquina_id}')
+            reserva_id = self.banco.inserir(cursor, '''
+                INSERT INTO reservas (maquina_id, cliente_id, local_trabalho, inicio, fim)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (maquina_id, cliente_id, local_trabalho, inicio, fim))
+            existente = reservas.conflito(cursor, maquina_id, inicio, fim, ignorar=reserva_id)
+            if existente:
+                raise Exception(f"Máquina já reservada de {existente[6]} a {existente[7]} "
+                                f"para {existente[4]} (reserva {existente[0]}).")
+            return reserva_id
+
+    def cancelar_reserva(self, reserva_id):
+        """Remove uma reserva"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('DELETE FROM reservas WHERE id = ?', (reserva_id,))
+            if cursor.rowcount == 0:
+                raise Exception("Reserva não encontrada!")
+
+    def listar_reservas(self, inicio, fim, maquina_id=None):
+        """Reservas que tocam o período (date, inclusive), por máquina e data"""
+        inicio, fim = reservas.periodo(inicio, fim)
+        with self.banco.cursor() as cursor:
+            return reservas.reservas_periodo(cursor, inicio, fim, maquina_id)
+
+    def maquinas_livres(self, inicio, fim):
+        """Máquinas sem nenhuma reserva no período (date, inclusive)"""
+        inicio, fim = reservas.periodo(inicio, fim)
+        with self.banco.cursor() as cursor:
+            return reservas.maquinas_livres(cursor, inicio, fim)
+
+    def cadastrar_contrato(self, cliente_id, maquina_id, valor_hora, inicio,
+                           fim=None, horas_minimas=0, faixas=()):
+        """Cadastra um contrato (maquina_id None = todas as máquinas do cliente)"""
+        faturamento.validar_competencia(inicio)
+        if fim is not None:
+            faturamento.validar_competencia(fim)
+            if fim < inicio:
+                raise Exception("O fim do contrato deve ser igual ou posterior ao início.")
+        faixas = faturamento.validar_faixas(valor_hora, horas_minimas, faixas)
+
+        with self.banco.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM clientes WHERE id = ?', (cliente_id,))
+            if cursor.fetchone() is None:
+                raise Exception("Cliente não encontrado!")
+            if maquina_id is not None:
+                cursor.execute('SELECT 1 FROM maquinas WHERE id = ?', (maquina_id,))
+                if cursor.fetchone() is None:
+                    raise Exception("Máquina não encontrada!")
+            contrato_id = self.banco.inserir(cursor, '''
+                INSERT INTO contratos (cliente_id, maquina_id, valor_hora, horas_minimas, inicio, fim)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (cliente_id, maquina_id, valor_hora, horas_minimas, inicio, fim))
+            cursor.executemany('''
+                INSERT INTO faixas_contrato (contrato_id, a_partir_de, valor_hora) VALUES (?, ?, ?)
+            ''', [(contrato_id, a_partir_de, valor) for a_partir_de, valor in faixas])
+            return contrato_id
+
+    def listar_contratos(self, cliente_id=None):
+        """Contratos com cliente, máquina e faixas ('a partir de' horas: valor)"""
+        filtro = 'WHERE c.cliente_id = ?' if cliente_id is not None else ''
+        with self.banco.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT c.id, cl.nome, m.marca, m.modelo, c.valor_hora, c.horas_minimas,
+                       c.inicio, c.fim
+                FROM contratos c
+                JOIN clientes cl ON cl.id = c.cliente_id
+                LEFT JOIN maquinas m ON m.id = c.maquina_id
+                {filtro}
+                ORDER BY c.id
+            ''', (cliente_id,) if cliente_id is not None else ())
+            contratos = cursor.fetchall()
+            cursor.execute('SELECT contrato_id, a_partir_de, valor_hora FROM faixas_contrato '
+                           'ORDER BY contrato_id, a_partir_de')
+            faixas = {}
+            for contrato_id, a_partir_de, valor in cursor.fetchall():
+                faixas.setdefault(contrato_id, []).append((a_partir_de, valor))
+        return [contrato + (faixas.get(contrato[0], []),) for contrato in contratos]
+
+    def faturar_mes(self, competencia):
+        """Calcula as faturas do mês (AAAA-MM) numa única transação; retorna o resumo"""
+        faturamento.validar_competencia(competencia)
+        ano = int(competencia[:4])
+        with self.banco.cursor() as cursor:
+            arquivado = ano in arquivamento.anos_arquivados(cursor)
+        if not arquivado:
+            with self.banco.cursor() as cursor:
+                resumo = faturamento.faturar(cursor, competencia)
+        else:
+            # Ano arquivado: os registros do mês estão no arquivo do ano, anexado
+            # antes da transação (o SQLite não anexa nem desanexa durante uma)
+            with self.banco.conexao() as conn:
+                cursor = conn.cursor()
+                with arquivamento.anexar_arquivos(cursor, [ano]) as anexados:
+                    if not anexados:
+                        raise Exception(f"Banco do ano arquivado {ano} não encontrado; "
+                                        f"as faturas de {competencia} não foram alteradas.")
+                    try:
+                        resumo = faturamento.faturar(cursor, competencia, anexados)
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+        # Os demonstrativos já gerados eram das faturas substituídas
+        for arquivo in glob.glob(os.path.join(DIRETORIO_RELATORIOS, f'fatura_*_{competencia}.pdf')):
+            try:
+                os.remove(arquivo)
+            except OSError:
+                pass
+        return resumo
+
+    def registros_da_competencia(self, competencia):
+        """IDs dos registros ativos cuja data final cai no mês (AAAA-MM)"""
+        faturamento.validar_competencia(competencia)
+        with self.banco.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT r.id FROM registros_trabalho r
+                WHERE {faturamento.EXPR_COMPETENCIA} = ?
+                ORDER BY r.id
+            ''', (competencia,))
+            return [linha[0] for linha in cursor.fetchall()]
+
+    def listar_faturas(self, competencia=None):
+        """Faturas (id, competência, cliente, horas, valor), das mais recentes para as mais antigas"""
+        filtro = 'WHERE f.competencia = ?' if competencia else ''
+        with self.banco.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT f.id, f.competencia, c.nome, f.horas, f.valor, f.data_geracao
+                FROM faturas f
+                JOIN clientes c ON c.id = f.cliente_id
+                {filtro}
+                ORDER BY f.competencia DESC, c.nome
+            ''', (competencia,) if competencia else ())
+            return cursor.fetchall()
+
+    def gerar_fatura_pdf(self, fatura_id):
+        """Gera o demonstrativo em PDF da fatura, com os itens e os registros do mês"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('''
+                SELECT f.id, f.competencia, f.horas, f.valor, f.cliente_id,
+                       c.nome, c.cnpj_cpf, c.endereco
+                FROM faturas f
+                JOIN clientes c ON c.id = f.cliente_id
+                WHERE f.id = ?
+            ''', (fatura_id,))
+            fatura = cursor.fetchone()
+            if fatura is None:
+                raise Exception("Fatura não encontrada!")
+            cursor.execute('''
+                SELECT COALESCE(m.marca || ' ' || m.modelo, 'Todas as máquinas'),
+                       ct.valor_hora, i.registros, i.horas, i.horas_faturadas, i.valor
+                FROM itens_fatura i
+                JOIN contratos ct ON ct.id = i.contrato_id
+                LEFT JOIN maquinas m ON m.id = i.maquina_id
+                WHERE i.fatura_id = ?
+                ORDER BY i.id
+            ''', (fatura_id,))
+            itens = cursor.fetchall()
+            # Mês de ano arquivado: os registros estão no arquivo do ano
+            anos = [ano for ano in arquivamento.anos_arquivados(cursor) if ano == int(fatura[1][:4])]
+            with arquivamento.anexar_arquivos(cursor, anos) as anexados:
+                tabelas = [locais.VISAO] + [f'arq_{ano}.registros_trabalho' for ano in anexados]
+                consulta = ' UNION ALL '.join(f'''
+                    SELECT r.id, r.data_inicio, r.data_final, m.marca || ' ' || m.modelo,
+                           r.local_trabalho, r.horas_trabalhadas
+                    FROM {tabela} r
+                    JOIN maquinas m ON m.id = r.maquina_id
+                    WHERE r.cliente_id = ? AND {faturamento.EXPR_COMPETENCIA} = ?
+                ''' for tabela in tabelas)
+                cursor.execute(consulta + ' ORDER BY 1', (fatura[4], fatura[1]) * len(tabelas))
+                registros = cursor.fetchall()
+
+        os.makedirs(DIRETORIO_RELATORIOS, exist_ok=True)
+        nome_arquivo = os.path.join(DIRETORIO_RELATORIOS, f'fatura_{fatura_id}_{fatura[1]}.pdf')
+
+        # CNPJ/CPF com pontuação no documento impresso
+        fatura = fatura[:6] + (validacao.formatar_documento(fatura[6]),) + fatura[7:]
+
+        from rodamotriz import relatorio_pdf
+        return relatorio_pdf.gerar_fatura_pdf(nome_arquivo, fatura, itens, registros)
+
+    def ingerir_leituras(self, lotes):
+        """Grava lotes [{'maquina_id': N, 'leituras': [[instante, horimetro], ...]}]
+
+        Tudo numa única transação; retorna (recebidas, novas).
+        """
+        normalizados = []
+        for lote in lotes:
+            try:
+                maquina_id = int(lote['maquina_id'])
+                leituras = lote['leituras']
+            except (KeyError, TypeError, ValueError):
+                raise Exception("Cada lote precisa de maquina_id e leituras.")
+            normalizados.append((maquina_id, telemetria.normalizar(leituras)))
+        recebidas = sum(len(leituras) for _, leituras in normalizados)
+        if recebidas > telemetria.MAX_LEITURAS_LOTE:
+            raise Exception(f"Máximo de {telemetria.MAX_LEITURAS_LOTE} leituras por envio.")
+
+        novas = 0
+        with self.banco.cursor() as cursor:
+            for maquina_id in sorted({maquina_id for maquina_id, _ in normalizados}):
+                cursor.execute('SELECT 1 FROM maquinas WHERE id = ?', (maquina_id,))
+                if cursor.fetchone() is None:
+                    raise Exception(f"Máquina com ID {maquina_id} não encontrada.")
+            for maquina_id, leituras in normalizados:
+                novas += telemetria.gravar(cursor, maquina_id, leituras)
+        return recebidas, novas
+
+    def horimetros_telemetria(self, maquina_id, data_inicio, data_final):
+        """Horímetro inicial/final da máquina no período segundo a telemetria (ou None)"""
+        if not validacao.validar_data(data_inicio) or not validacao.validar_data(data_final):
+            raise Exception("Data inválida! Use o formato dd/mm/yyyy")
+        with self.banco.cursor() as cursor:
+            return telemetria.horimetro_periodo(cursor, maquina_id, data_inicio, data_final)
+
+    def conferir_trabalho_telemetria(self, registro_id):
+        """Compara os horímetros digitados num registro com os da telemetria"""
+        with self.banco.cursor() as cursor:
+            cursor.execute('''
+                SELECT maquina_id, data_inicio, data_final, horimetro_inicial, horimetro_final
+                FROM registros_trabalho WHERE id = ?
+            ''', (registro_id,))
+            registro = cursor.fetchone()
+            if registro is None:
+                raise Exception("Registro não encontrado!")
+            maquina_id, data_inicio, data_final, inicial, final = registro
+            medido = telemetria.horimetro_periodo(cursor, maquina_id, data_inicio, data_final)
+        if medido is None:
+            return {'registro_id': registro_id, 'telemetria': None, 'confere': None}
+        diferenca = (final - inicial) - (medido['horimetro_final'] - medido['horimetro_inicial'])
+        return {
+            'registro_id': registro_id,
+            'registrado': {'horimetro_inicial': inicial, 'horimetro_final': final},
+            'telemetria': medido,
+            'diferenca_horas': round(diferenca, 2),
+            'confere': abs(diferenca) <= telemetria.TOLERANCIA_HORAS,
+        }
+
+    def podar_leituras(self, dias=telemetria.RETENCAO_DIAS):
+        """Remove as leituras brutas mais antigas que a retenção"""
+        with self.banco.cursor() as cursor:
+            return telemetria.podar(cursor, dias)
+
+    def alteracoes_desde(self, desde, limite=alteracoes.LIMITE_PADRAO):
+        """Alterações posteriores ao seq informado; levanta alteracoes.LogTruncado se já podadas"""
+        limite = max(1, min(int(limite), alteracoes.LIMITE_MAXIMO))
+        with self.banco.cursor() as cursor:
+            return alteracoes.alteracoes_desde(cursor, int(desde), limite)
+
+    def copia_completa(self):
+        """Todos os cadastros atuais e o seq a partir do qual sincronizar depois"""
+        # O seq é lido antes das tabelas: o que mudar no meio volta como alteração
+        with self.banco.cursor() as cursor:
+            ultimo = alteracoes.ultimo_seq(cursor)
+        tabelas = {
+            tabela: [dict(zip(colunas, linha)) for linha in self.banco.iterar(
+                f'SELECT {", ".join(colunas)} FROM {alteracoes.ORIGENS.get(tabela, tabela)} ORDER BY id')]
+            for tabela, colunas in alteracoes.TABELAS.items()
+        }
+        return {'copia_completa': tabelas, 'ultimo': ultimo, 'mais': False}
+
+    def podar_alteracoes(self, dias=alteracoes.RETENCAO_DIAS):
+        """Remove do log as alterações mais antigas que a retenção"""
+        with self.banco.cursor() as cursor:
+            return alteracoes.podar(cursor, dias)
+
+    def executar_manutencao(self, completo=False, converter=False):
+        """Estatísticas, vacuum incremental, checkpoint e verificação de integridade"""
+        if self.banco.tipo != 'sqlite':
+            raise Exception("A manutenção só está disponível com o backend SQLite.")
+        with self.banco.conexao() as conn:
+            return manutencao.executar(conn, completo, converter)
+
+    def exportar_analise(self, destino=None, completa=False):
+        """Atualiza a cópia analítica (analise.db) com o que mudou desde a última exportação"""
+        if self.banco.tipo != 'sqlite':
+            raise Exception("A cópia analítica só está disponível com o backend SQLite.")
+        # Conexão própria com o arquivo, sem passar pelo lock da conexão do sistema
+        return analise.exportar(self.banco.caminho, destino or CAMINHO_ANALISE, completa)
+
+    def gerar_relatorio_pdf(self, registro_id, renderizador=None):
+        """Gera relatório em PDF do registro de trabalho (renderizador: ver RENDERIZADORES)"""
+        try:
+            modulo = RENDERIZADORES.get(renderizador or RENDERIZADOR_PADRAO)
+            if modulo is None:
+                raise Exception(f"Renderizador desconhecido: {renderizador} "
+                                f"(use {', '.join(RENDERIZADORES)})")
+
+            # Buscar dados do registro
+            consulta = '''
+                SELECT r.id, c.nome, c.cnpj_cpf, c.endereco,
+                       m.marca, m.modelo, m.ano,
+                       r.local_trabalho, r.data_inicio, r.data_final,
+                       r.horimetro_inicial, r.horimetro_final, r.horas_trabalhadas,
+                       r.data_registro
+                FROM {tabela} r
+                JOIN clientes c ON r.cliente_id = c.id
+                JOIN maquinas m ON r.maquina_id = m.id
+                WHERE r.id = ?
+            '''
+            with self.banco.cursor() as cursor:
+                cursor.execute(consulta.format(tabela=locais.VISAO), (registro_id,))
+                dados = cursor.fetchone()
+
+                # Registros de anos encerrados ficam nos bancos de arquivo
+                if not dados:
+                    dados = arquivamento.buscar_registro(
+                        cursor, consulta, registro_id)
+
+            if not dados:
+                raise Exception("Registro não encontrado!")
+            dados = dados[:2] + (validacao.formatar_documento(dados[2]),) + dados[3:]
+
+            # Criar diretório para relatórios se não existir
+            if not os.path.exists(DIRETORIO_RELATORIOS):
+                os.makedirs(DIRETORIO_RELATORIOS)
+
+            # Nome do arquivo PDF
+            nome_arquivo = f"{DIRETORIO_RELATORIOS}/relatorio_{registro_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+
+            # Horas totais acumuladas pelo modelo da máquina (inclusive anos arquivados) para os alarmes
+            with self.banco.cursor() as cursor:
+                total_acumulado = historico.horas_do_modelo(cursor, dados[4], dados[5])
+
+            # ReportLab só é carregado quando um relatório é gerado
+            return importlib.import_module(modulo).gerar_pdf(nome_arquivo, dados, total_acumulado)
+
+        except Exception as e:
+            raise Exception(f"Erro ao gerar relatório: {e}")
+
+    def deletar_relatorios_pdf(self, registro_id):
+        """Apaga os PDFs já gerados para o registro; retorna (deletados, erros)"""
+        padrao = os.path.join(DIRETORIO_RELATORIOS, f'relatorio_{registro_id}_*.pdf')
+        deletados = 0
+        erros = []
+        for arquivo in glob.glob(padrao):
+            try:
+                os.remove(arquivo)
+                deletados += 1
+            except OSError as e:
+                erros.append(f'{arquivo}: {e}')
+        return deletados, erros
+
+    def fechar(self):
+        """Fecha a conexão com o banco de dados"""
+        self.banco.fechar()
@@ -0,0 +1,245 @@
+"""
+Leituras de horímetro enviadas pelas máquinas (telemetria)
+
+As leituras chegam em lotes por máquina e são gravadas numa tabela apenas de
+inclusão, ordenada por (maquina_id, instante) e sem rowid, o que a mantém
+compacta. A cada lote, as horas afetadas são juntadas à tabela de resumo por
+hora (primeira/última leitura, horímetro inicial/final e quantidade), usada
+para preencher e conferir os registros de trabalho sem varrer as leituras.
+
+Leituras repetidas (mesma máquina e instante) são ignoradas, então reenviar um
+lote é seguro. O horímetro só avança: dentro de uma hora, o menor valor é o
+inicial e o maior é o final.
+
+A conferência de um período usa só o resumo nas horas inteiras dentro dele, então
+continua valendo depois que as leituras brutas são podadas.
+
+Poda das leituras brutas (o resumo por hora é mantido):
+    python -m rodamotriz.telemetria podar [DIAS]
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Leituras brutas mantidas; o resumo por hora não é podado
+RETENCAO_DIAS = int(os.environ.get('RODAMOTRIZ_RETENCAO_LEITURAS', 90))
+
+# Leituras por requisição de ingestão
+MAX_LEITURAS_LOTE = 20000
+
+# Tolerância (s) para relógios de máquinas adiantados
+TOLERANCIA_FUTURO = 300
+
+# Diferença (h) a partir da qual um registro diverge da telemetria
+TOLERANCIA_HORAS = 0.5
+
+SEGUNDOS_HORA = 3600
+
+
+def criar_tabelas(cursor):
+    """Cria as tabelas de leituras e do resumo por hora"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leituras_horimetro (
+            maquina_id INTEGER NOT NULL,
+            instante BIGINT NOT NULL,
+            horimetro REAL NOT NULL,
+            PRIMARY KEY (maquina_id, instante)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leituras_horimetro_hora (
+            maquina_id INTEGER NOT NULL,
+            hora BIGINT NOT NULL,
+            primeira BIGINT NOT NULL,
+            ultima BIGINT NOT NULL,
+            horimetro_inicial REAL NOT NULL,
+            horimetro_final REAL NOT NULL,
+            leituras INTEGER NOT NULL,
+            PRIMARY KEY (maquina_id, hora)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _instante(valor):
+    """Segundos desde 1970 (UTC) a partir de número ou data ISO 8601"""
+    if isinstance(valor, bool):
+        raise ValueError(valor)
+    if isinstance(valor, (int, float)):
+        return int(valor)
+    data = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    if data.tzinfo is None:
+        data = data.astimezone()
+    return int(data.timestamp())
+
+
+def normalizar(leituras):
+    """Converte [[instante, horimetro], ...] em tuplas (instante, horimetro) ordenadas"""
+    limite = int(datetime.now(timezone.utc).timestamp()) + TOLERANCIA_FUTURO
+    normalizadas = []
+    for i, leitura in enumerate(leituras, 1):
+        try:
+            instante, horimetro = leitura
+            instante = _instante(instante)
+            horimetro = float(horimetro)
+        except (TypeError, ValueError):
+            raise Exception(f"Leitura {i} inválida: use [instante, horimetro].")
+        if horimetro < 0:
+            raise Exception(f"Leitura {i}: horímetro negativo.")
+        if instante > limite:
+            raise Exception(f"Leitura {i}: instante no futuro.")
+        normalizadas.append((instante, horimetro))
+    normalizadas.sort()
+    return normalizadas
+
+
+def gravar(cursor, maquina_id, leituras):
+    """Grava as leituras normalizadas de uma máquina; retorna quantas eram novas"""
+    if not leituras:
+        return 0
+    inicio, fim = leituras[0][0], leituras[-1][0]
+    antes = _contagens(cursor, maquina_id, inicio, fim)
+    cursor.executemany('''
+        INSERT INTO leituras_horimetro (maquina_id, instante, horimetro)
+        VALUES (?, ?, ?)
+        ON CONFLICT DO NOTHING
+    ''', [(maquina_id, instante, horimetro) for instante, horimetro in leituras])
+    novas = cursor.rowcount
+    atualizar_resumo(cursor, maquina_id, inicio, fim, antes)
+    return novas
+
+
+def _horas(inicio, fim):
+    """Início da hora do instante inicio e fim (exclusivo) da hora do instante fim"""
+    return (inicio // SEGUNDOS_HORA * SEGUNDOS_HORA,
+            fim // SEGUNDOS_HORA * SEGUNDOS_HORA + SEGUNDOS_HORA)
+
+
+def _contagens(cursor, maquina_id, inicio, fim):
+    """{hora: leituras brutas guardadas} nas horas entre os instantes inicio e fim"""
+    cursor.execute(f'''
+        SELECT instante / {SEGUNDOS_HORA} * {SEGUNDOS_HORA}, COUNT(*)
+        FROM leituras_horimetro
+        WHERE maquina_id = ? AND instante >= ? AND instante < ?
+        GROUP BY instante / {SEGUNDOS_HORA} * {SEGUNDOS_HORA}
+    ''', (maquina_id, *_horas(inicio, fim)))
+    return dict(cursor.fetchall())
+
+
+def atualizar_resumo(cursor, maquina_id, inicio, fim, antes):
+    """Junta ao resumo as leituras das horas entre os instantes inicio e fim
+
+    antes: contagens (_contagens) de antes da gravação. O resumo de uma hora já
+    podada guarda leituras que não estão mais na tabela bruta, então a linha
+    existente é ampliada (extremos) e somada (leituras novas), nunca substituída.
+    """
+    cursor.execute(f'''
+        SELECT instante / {SEGUNDOS_HORA} * {SEGUNDOS_HORA},
+               MIN(instante), MAX(instante), MIN(horimetro), MAX(horimetro), COUNT(*)
+        FROM leituras_horimetro
+        WHERE maquina_id = ? AND instante >= ? AND instante < ?
+        GROUP BY instante / {SEGUNDOS_HORA} * {SEGUNDOS_HORA}
+    ''', (maquina_id, *_horas(inicio, fim)))
+    # CASE em vez de MIN/MAX escalares, que o PostgreSQL não tem
+    cursor.executemany('''
+        INSERT INTO leituras_horimetro_hora AS h
+            (maquina_id, hora, primeira, ultima, horimetro_inicial, horimetro_final, leituras)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (maquina_id, hora) DO UPDATE SET
+            primeira = CASE WHEN excluded.primeira < h.primeira THEN excluded.primeira ELSE h.primeira END,
+            ultima = CASE WHEN excluded.ultima > h.ultima THEN excluded.ultima ELSE h.ultima END,
+            horimetro_inicial = CASE WHEN excluded.horimetro_inicial < h.horimetro_inicial
+                                     THEN excluded.horimetro_inicial ELSE h.horimetro_inicial END,
+            horimetro_final = CASE WHEN excluded.horimetro_final > h.horimetro_final
+                                   THEN excluded.horimetro_final ELSE h.horimetro_final END,
+            leituras = h.leituras + ?
+    ''', [(maquina_id, hora, primeira, ultima, minimo, maximo, quantidade,
+           quantidade - antes.get(hora, 0))
+          for hora, primeira, ultima, minimo, maximo, quantidade in cursor.fetchall()])
+
+
+def _periodo(data_inicio, data_final):
+    """Instantes do início do primeiro dia ao fim do último (datas dd/mm/yyyy, hora local)"""
+    inicio = datetime.strptime(data_inicio, '%d/%m/%Y')
+    fim = datetime.strptime(data_final, '%d/%m/%Y') + timedelta(days=1)
+    return int(inicio.timestamp()), int(fim.timestamp())
+
+
+def horimetro_periodo(cursor, maquina_id, data_inicio, data_final):
+    """Horímetro inicial/final e leituras da máquina no período, pelo resumo por hora"""
+    inicio, fim = _periodo(data_inicio, data_final)
+    # Horas inteiras dentro do período: só o resumo, que não é podado
+    primeira_hora = -(-inicio // SEGUNDOS_HORA) * SEGUNDOS_HORA
+    ultima_hora = fim // SEGUNDOS_HORA * SEGUNDOS_HORA
+    cursor.execute('''
+        SELECT MIN(horimetro_inicial), MAX(horimetro_final), COALESCE(SUM(leituras), 0)
+        FROM leituras_horimetro_hora
+        WHERE maquina_id = ? AND hora >= ? AND hora < ?
+    ''', (maquina_id, primeira_hora, ultima_hora))
+    minimo, maximo, leituras = cursor.fetchone()
+    valores = [v for v in (minimo, maximo) if v is not None]
+
+    # Pedaços de hora nas pontas (fuso que não é de hora cheia): das leituras
+    # brutas ou, se já podadas, da primeira e da última leitura guardadas no resumo
+    for de, ate in ((inicio, primeira_hora), (ultima_hora, fim)):
+        if de >= ate:
+            continue
+        cursor.execute('''
+            SELECT MIN(horimetro), MAX(horimetro), COUNT(*)
+            FROM leituras_horimetro
+            WHERE maquina_id = ? AND instante >= ? AND instante < ?
+        ''', (maquina_id, de, ate))
+        minimo, maximo, quantidade = cursor.fetchone()
+        if quantidade:
+            valores += [minimo, maximo]
+            leituras += quantidade
+            continue
+        cursor.execute('''
+            SELECT primeira, horimetro_inicial, ultima, horimetro_final
+            FROM leituras_horimetro_hora
+            WHERE maquina_id = ? AND hora = ?
+        ''', (maquina_id, de // SEGUNDOS_HORA * SEGUNDOS_HORA))
+        linha = cursor.fetchone()
+        if linha:
+            extremas = {(linha[0], linha[1]), (linha[2], linha[3])}
+            dentro = [horimetro for instante, horimetro in extremas if de <= instante < ate]
+            valores += dentro
+            leituras += len(dentro)
+
+    if not leituras:
+        return None
+    return {
+        'horimetro_inicial': min(valores),
+        'horimetro_final': max(valores),
+        'leituras': leituras,
+    }
+
+
+def podar(cursor, dias=RETENCAO_DIAS):
+    """Remove leituras brutas mais antigas que a retenção; retorna quantas"""
+    limite = int((datetime.now(timezone.utc) - timedelta(days=dias)).timestamp())
+    cursor.execute('DELETE FROM leituras_horimetro WHERE instante < ?', (limite,))
+    return cursor.rowcount
+
+
+def main():
+    """Poda pela linha de comando: python -m rodamotriz.telemetria podar [DIAS]"""
+    if len(sys.argv) < 2 or sys.argv[1] != 'podar':
+        print("Uso: python -m rodamotriz.telemetria podar [DIAS]")
+        sys.exit(1)
+
+    from rodamotriz.sistema import SistemaRodamotriz
+    sistema = SistemaRodamotriz()
+    try:
+        dias = int(sys.argv[2]) if len(sys.argv) > 2 else RETENCAO_DIAS
+        removidas = sistema.podar_leituras(dias)
+        print(f"✅ {removidas} leitura(s) com mais de {dias} dia(s) removida(s)")
+    except ValueError:
+        print(f"❌ Número de dias inválido: {sys.argv[2]}")
+        sys.exit(1)
+    finally:
+        sistema.fechar()
+
+
+if __name__ == '__main__':
+    main()
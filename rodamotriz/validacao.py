@@ -0,0 +1,86 @@
+"""
+Validações de entrada compartilhadas pelo CLI e pela aplicação web
+"""
+
+import re
+from datetime import datetime, date
+
+ANO_MINIMO = 1900
+
+# Pesos dos dígitos verificadores (primeiro e segundo) do CPF e do CNPJ
+PESOS_CPF = (range(10, 1, -1), range(11, 1, -1))
+PESOS_CNPJ = ((5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2), (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2))
+
+
+def validar_data(data_str):
+    """Valida e converte data no formato dd/mm/yyyy"""
+    try:
+        datetime.strptime(data_str, '%d/%m/%Y')
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def validar_ano(ano):
+    """Ano de fabricação entre 1900 e o próximo ano"""
+    return ANO_MINIMO <= ano <= date.today().year + 1
+
+
+def campos_preenchidos(*valores):
+    """Todos os campos obrigatórios foram informados"""
+    return all(valores)
+
+
+def validar_trabalho(data_inicio, data_final, horimetro_inicial, horimetro_final):
+    """Valida os dados de um registro de trabalho, levantando Exception com a mensagem"""
+    if horimetro_final <= horimetro_inicial:
+        raise Exception("O horímetro final deve ser maior que o inicial!")
+
+    if not validar_data(data_inicio) or not validar_data(data_final):
+        raise Exception("Data inválida! Use o formato dd/mm/yyyy")
+
+
+def limpar_documento(texto):
+    """CNPJ/CPF sem pontuação nem espaços (letras em maiúsculas, para o CNPJ alfanumérico)"""
+    return re.sub(r'[^0-9A-Z]', '', str(texto or '').upper())
+
+
+def _digito_verificador(base, pesos):
+    # Cada caractere vale o código ASCII menos 48: dígitos valem eles mesmos e
+    # as letras do CNPJ alfanumérico valem de 17 (A) a 42 (Z)
+    resto = sum((ord(c) - 48) * peso for c, peso in zip(base, pesos)) % 11
+    return '0' if resto < 2 else str(11 - resto)
+
+
+def documento_valido(documento):
+    """CPF (11 dígitos) ou CNPJ (14 caracteres) já limpo, com os verificadores corretos"""
+    if len(documento) == 11 and documento.isdigit():
+        pesos = PESOS_CPF
+    elif len(documento) == 14 and documento[12:].isdigit():
+        pesos = PESOS_CNPJ
+    else:
+        return False
+    # Sequências repetidas (000.000.000-00 etc.) passam na conta, mas não existem
+    if len(set(documento)) == 1:
+        return False
+    base = len(documento) - 2
+    primeiro = _digito_verificador(documento[:base], pesos[0])
+    segundo = _digito_verificador(documento[:base] + primeiro, pesos[1])
+    return documento[base:] == primeiro + segundo
+
+
+def normalizar_documento(texto):
+    """CNPJ/CPF como é gravado (sem pontuação); levanta Exception se for inválido"""
+    documento = limpar_documento(texto)
+    if not documento_valido(documento):
+        raise Exception(f"CNPJ/CPF inválido: {texto}")
+    return documento
+
+
+def formatar_documento(documento):
+    """CNPJ/CPF normalizado com a pontuação usual; outros valores voltam como estão"""
+    if not documento or not documento_valido(documento):
+        return documento
+    if len(documento) == 11:
+        return f'{documento[:3]}.{documento[3:6]}.{documento[6:9]}-{documento[9:]}'
+    return f'{documento[:2]}.{documento[2:5]}.{documento[5:8]}/{documento[8:12]}-{documento[12:]}'